@@ -0,0 +1,193 @@
+import argparse
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+from datetime import datetime
+
+from dashboard_creation import BACKENDS, MAX_CHARTS, build_file, dashboard_path, refresh_file, start_of_today
+from frame_cache import DEFAULT_CACHE_DIR
+from instrumentation import instrumented
+from partitions import build_partitions
+from readers import EXTENSIONS
+
+DEFAULT_INPUT = "dummy_data_raw.xlsx"
+REPORT_SUFFIX = ".report.json"
+PROFILE_SUFFIX = ".pstats"
+# .xlsm is what we write, so directory scans never pick up a previous night's dashboards
+SCANNED_EXTENSIONS = {extension for extension in EXTENSIONS if extension != ".xlsm"}
+
+# Expand directories into the raw exports they hold (sorted, non-recursive); files are taken as given
+def collect_inputs(paths):
+    inputs = []
+    for path in paths:
+        if os.path.isdir(path):
+            inputs.extend(sorted(
+                entry.path for entry in os.scandir(path)
+                if entry.is_file() and os.path.splitext(entry.name)[1].lower() in SCANNED_EXTENSIONS
+            ))
+        else:
+            inputs.append(path)
+    return inputs
+
+# Build one dashboard and report how it went instead of raising, so one bad export can't take down the batch.
+# incremental refreshes an existing dashboard and also reports which sheets were rewritten.
+# report writes a per-stage timing report next to the dashboard, profile a cProfile dump as well
+def build_one(path, newfile, incremental=False, report=False, profile=False, **options):
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    result = {"input": path, "output": newfile, "ok": True, "error": None}
+    try:
+        if report or profile:
+            session = instrumented(path, newfile + REPORT_SUFFIX, newfile + PROFILE_SUFFIX if profile else None)
+        else:
+            session = nullcontext()
+        with session:
+            if incremental:
+                result["rewritten"] = refresh_file(path, newfile, **options)["rewritten"]
+            else:
+                build_file(path, newfile, **options)
+    except Exception as exc:
+        result.update(ok=False, error=f"{type(exc).__name__}: {exc}", traceback=traceback.format_exc())
+    result["seconds"] = time.perf_counter() - start
+    result["cpu_seconds"] = time.process_time() - cpu_start
+    return result
+
+# One dashboard per asset group of an export (see partitions.build_partitions), or a single failed result
+# if the export itself can't be read
+def partition_one(path, output_dir, workers, on_result=None, **options):
+    try:
+        return build_partitions(path, output_dir, workers, on_result=on_result, **options)
+    except Exception as exc:
+        result = {"input": path, "output": dashboard_path(path, output_dir), "ok": False, "error": f"{type(exc).__name__}: {exc}",
+                  "traceback": traceback.format_exc(), "seconds": None, "cpu_seconds": None}
+        if on_result is not None:
+            on_result(result)
+        return [result]
+
+# Build a dashboard for every raw export in paths (files or directories) on a pool of worker processes.
+# workers=None uses every core; workers=1 builds in this process. Results come back in input order,
+# one dict per file with input, output, ok, error, seconds and cpu_seconds.
+# partitioned builds one dashboard per asset group of each export instead, the exports one after another
+# and each one's partitions on the pool (one result per partition).
+# Exports are compared against today, by default the time the batch starts; start_of_day compares against
+# midnight instead, so every run on the same day reuses the frame cache
+def build_many(paths, output_dir=None, workers=None, source_file="./template.xlsm", today=None, fmt=None,
+               cache_dir=DEFAULT_CACHE_DIR, streaming=False, incremental=False, report=False, profile=False, max_charts=MAX_CHARTS,
+               backend="pandas", sheet_workers=1, chunk_size=None, history=None, native_pivots=False, compact=False, partitioned=False,
+               approximate=False, start_of_day=False, on_result=None):
+    inputs = collect_inputs(paths)
+    # every worker must agree on "today", even if the batch runs past midnight
+    if today is None:
+        today = start_of_today() if start_of_day else datetime.today()
+    if partitioned:
+        if incremental or chunk_size or report or profile:
+            raise ValueError("Partitioned builds don't refresh, read in chunks or write reports")
+        results = []
+        for path in inputs:
+            results += partition_one(path, output_dir, workers, on_result, source_file=source_file, today=today, fmt=fmt, cache_dir=cache_dir,
+                                     backend=backend, streaming=streaming, max_charts=max_charts, sheet_workers=sheet_workers, history=history,
+                                     native_pivots=native_pivots, compact=compact, approximate=approximate)
+        return results
+
+    # refreshes always stream their detail sheets, so streaming is allowed and changes nothing
+    if incremental and (sheet_workers > 1 or chunk_size or native_pivots or compact or approximate):
+        raise ValueError("Incremental builds refresh the plain dashboard only: no sheet workers, chunks, native pivots,"
+                         " compact or approximate dashboards")
+    outputs = [dashboard_path(path, output_dir) for path in inputs]
+    duplicates = sorted({output for output in outputs if outputs.count(output) > 1})
+    if duplicates:
+        raise ValueError(f"Several inputs would write the same dashboard: {', '.join(duplicates)}")
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+    options = dict(source_file=source_file, today=today, fmt=fmt, cache_dir=cache_dir,
+                   report=report, profile=profile, max_charts=max_charts, backend=backend, history=history)
+    if incremental:
+        options["incremental"] = True
+    else:
+        options.update(streaming=streaming, sheet_workers=sheet_workers, chunk_size=chunk_size, native_pivots=native_pivots,
+                       compact=compact, approximate=approximate)
+
+    workers = min(workers or os.cpu_count() or 1, len(inputs) or 1)
+    results = [None] * len(inputs)
+    if workers == 1:
+        for i, (path, newfile) in enumerate(zip(inputs, outputs)):
+            results[i] = build_one(path, newfile, **options)
+            if on_result is not None:
+                on_result(results[i])
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(build_one, path, newfile, **options): i for i, (path, newfile) in enumerate(zip(inputs, outputs))}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as exc:
+                # the worker itself died (e.g. killed for memory); build_one never raises
+                results[i] = {"input": inputs[i], "output": outputs[i], "ok": False, "error": f"{type(exc).__name__}: {exc}",
+                              "seconds": None, "cpu_seconds": None}
+            if on_result is not None:
+                on_result(results[i])
+    return results
+
+def print_result(result, file=sys.stdout):
+    seconds = "-" if result["seconds"] is None else f"{result['seconds']:.2f}s"
+    status = "ok" if result["ok"] else "FAILED " + result["error"].splitlines()[0]
+    if result.get("rewritten") is not None:
+        status += f" ({len(result['rewritten'])} sheets rewritten)"
+    print(f"{seconds:>9}  {result['input']} -> {result['output']}  {status}", file=file, flush=True)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build vulnerability dashboards from raw scan exports.")
+    parser.add_argument("inputs", nargs="*", default=[DEFAULT_INPUT], help=f"raw export files or directories of them (default: {DEFAULT_INPUT})")
+    parser.add_argument("-o", "--output-dir", help="where to write the dashboards (default: next to each input)")
+    parser.add_argument("-j", "--workers", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--template", default="./template.xlsm", help="macro-enabled template to copy (default: %(default)s)")
+    parser.add_argument("--format", dest="fmt", help="input format, overriding the file extension")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="parsed frame cache (default: %(default)s)")
+    parser.add_argument("--streaming", action="store_true", help="stream the detail sheets instead of building them in memory")
+    parser.add_argument("--sheet-workers", type=int, default=1,
+                        help="serialize the detail sheets of each dashboard on this many workers at once; implies --streaming (default: %(default)s)")
+    parser.add_argument("--chunk-rows", type=int, dest="chunk_size",
+                        help="read each export this many rows at a time, for exports larger than memory; streams the detail sheets, skips the frame cache")
+    parser.add_argument("--native-pivots", action="store_true",
+                        help="write the pivot sheets as native pivot tables that Excel computes on open, over a hidden sheet of the findings")
+    parser.add_argument("--compact", action="store_true",
+                        help="write every finding once, as an Excel table, with the overdue and severity sheets as index sheets linking into it")
+    parser.add_argument("--partitioned", action="store_true",
+                        help="write one dashboard per asset group of each export, <dashboard>_<asset group>.xlsm, reading the export once")
+    parser.add_argument("--approximate", action="store_true",
+                        help="estimate the Summary's counts with fixed-size sketches merged across chunks, and add distinct plugins per asset group")
+    parser.add_argument("--start-of-day", action="store_true",
+                        help="compare against the start of today instead of now, so re-runs on the same day reuse cached frames")
+    parser.add_argument("--incremental", action="store_true",
+                        help="refresh existing dashboards, rewriting only the sheets that changed since the last run")
+    parser.add_argument("--backend", choices=BACKENDS, default="pandas",
+                        help="how raw exports are read and derived; polars runs it as one lazy plan and needs polars installed (default: %(default)s)")
+    parser.add_argument("--max-charts", type=int, default=MAX_CHARTS,
+                        help="most bar charts per pivot sheet; larger tables chart only their largest rows, 0 for no limit (default: %(default)s)")
+    parser.add_argument("--history", help="SQLite history store to record every run in; adds a Trends sheet charting the last year of runs")
+    parser.add_argument("--report", action="store_true", help=f"write per-stage timings and memory to <dashboard>{REPORT_SUFFIX}")
+    parser.add_argument("--profile", action="store_true", help=f"also write a cProfile dump to <dashboard>{PROFILE_SUFFIX}")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    results = build_many(args.inputs, args.output_dir, args.workers, args.template, fmt=args.fmt, cache_dir=args.cache_dir,
+                         streaming=args.streaming, sheet_workers=args.sheet_workers, chunk_size=args.chunk_size, history=args.history,
+                         native_pivots=args.native_pivots, compact=args.compact, partitioned=args.partitioned,
+                         approximate=args.approximate, start_of_day=args.start_of_day, incremental=args.incremental,
+                         report=args.report, profile=args.profile, max_charts=args.max_charts or None, backend=args.backend, on_result=print_result)
+    failed = [result for result in results if not result["ok"]]
+    print(f"{len(results) - len(failed)}/{len(results)} dashboards built in {time.perf_counter() - start:.2f}s", flush=True)
+    for result in failed:
+        if result.get("traceback"):
+            print(f"\n{result['input']}:\n{result['traceback']}", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
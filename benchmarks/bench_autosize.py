@@ -0,0 +1,48 @@
+# Column autosizing for the seven detail sheets: the previous per-value str() loop against
+# the vectorized, memoized widths (exact, sampled, and sampled capped at a quantile).
+# Run from the repository root: python -m benchmarks.bench_autosize [rows]
+import sys
+import time
+from datetime import datetime
+
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+
+from dashboard_creation import autosize_df_columns, prepare_frames, view_frame
+from benchmarks.synthetic import make_raw_frame
+
+def per_value_autosize(ws, df, start_col=1):
+    for i, col in enumerate(df.columns, start=start_col):
+        max_length = len(str(col))
+        for val in df[col]:
+            if val is not None:
+                max_length = max(max_length, len(str(val)))
+        ws.column_dimensions[get_column_letter(i)].width = max_length + 2
+
+def time_all_sheets(detail_frames, autosize):
+    ws = Workbook().active
+    start = time.perf_counter()
+    for frame in detail_frames.values():
+        autosize(ws, frame)
+    return time.perf_counter() - start
+
+def main(n_rows):
+    df, detail_views, *_ = prepare_frames(make_raw_frame(n_rows), datetime(2026, 3, 1))
+    detail_frames = {sheet_name: view_frame(view) for sheet_name, view in detail_views.items()}
+    shared_cache = {}
+    sampled_cache = {}
+    capped_cache = {}
+    runs = [
+        ("per-value loop", per_value_autosize),
+        ("vectorized", autosize_df_columns),
+        ("vectorized + cache", lambda ws, frame: autosize_df_columns(ws, frame, width_cache=shared_cache, source=df)),
+        ("sampled + cache", lambda ws, frame: autosize_df_columns(ws, frame, width_cache=sampled_cache, source=df, sample_size=10000)),
+        ("sampled p99 + cache", lambda ws, frame: autosize_df_columns(ws, frame, width_cache=capped_cache, source=df, sample_size=10000,
+                                                                        quantile=0.99)),
+    ]
+    print(f"{n_rows} rows, {len(detail_frames)} detail sheets")
+    for label, autosize in runs:
+        print(f"{label:>20}: {time_all_sheets(detail_frames, autosize):8.3f} s")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500000)
@@ -0,0 +1,41 @@
+# Read + derive on the pandas backend against the lazy polars plan, per input format, checking that
+# both give identical frames. Needs polars installed.
+# Run from the repository root: python -m benchmarks.bench_backends [rows] [formats...]
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from dashboard_creation import derive_frame
+from lazy_backend import read_and_derive
+from readers import read_raw
+from benchmarks.synthetic import make_raw_frame, write_raw_frame
+
+TODAY = datetime(2026, 3, 1)
+EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow", "xlsx": ".xlsx"}
+
+def pandas_backend(path):
+    raw_df = read_raw(path)
+    return (raw_df, *derive_frame(raw_df, TODAY))
+
+def polars_backend(path):
+    return read_and_derive(path, TODAY)
+
+def main(n_rows, formats):
+    raw_df = make_raw_frame(n_rows, patch_null_rate=0.05)
+    with tempfile.TemporaryDirectory() as directory:
+        for fmt in formats:
+            path = write_raw_frame(raw_df, os.path.join(directory, f"bench_raw{EXTENSIONS[fmt]}"))
+            results = {}
+            for label, backend in [("pandas", pandas_backend), ("polars", polars_backend)]:
+                start = time.perf_counter()
+                results[label] = backend(path)
+                print(f"{fmt:>8} {label:>7}: {time.perf_counter() - start:8.3f} s", flush=True)
+            for expected, actual in zip(results["pandas"], results["polars"]):
+                pd.testing.assert_frame_equal(expected, actual, check_exact=True)
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000, sys.argv[2:] or ["csv", "parquet"])
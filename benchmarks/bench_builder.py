@@ -0,0 +1,31 @@
+# Compare the single-pass workbook build with the per-sheet load/save flow.
+# Run from the repository root: python -m benchmarks.bench_builder [rows ...]
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from dashboard_creation import build_dashboard
+from benchmarks.synthetic import make_raw_frame
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "template.xlsm")
+TODAY = datetime(2026, 3, 1)
+
+def time_build(raw_df, single_pass):
+    with tempfile.TemporaryDirectory() as tmp:
+        newfile = os.path.join(tmp, "bench.xlsm")
+        start = time.perf_counter()
+        build_dashboard(raw_df, newfile, TEMPLATE, today=TODAY, single_pass=single_pass)
+        return time.perf_counter() - start
+
+def main(sizes):
+    print(f"{'rows':>8} {'per-sheet (s)':>14} {'single-pass (s)':>16} {'speedup':>8}")
+    for n_rows in sizes:
+        raw_df = make_raw_frame(n_rows)
+        per_sheet = time_build(raw_df, single_pass=False)
+        single_pass = time_build(raw_df, single_pass=True)
+        print(f"{n_rows:>8} {per_sheet:>14.2f} {single_pass:>16.2f} {per_sheet / single_pass:>7.1f}x")
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 2000, 5000])
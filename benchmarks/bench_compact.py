@@ -0,0 +1,39 @@
+# Full detail sheets (every finding written in Original, in Overdue or Non-Overdue and in its severity's sheet)
+# against a compact dashboard (every finding written once, in the Findings table, with index sheets of links
+# into it): build time, file size and the bytes of the sheet parts, streamed or written through openpyxl.
+# Run from the repository root: python -m benchmarks.bench_compact [--rows 200000] [--streaming]
+import argparse
+import os
+import tempfile
+import time
+import zipfile
+from datetime import datetime
+
+from dashboard_creation import build_dashboard, derive_frame
+from benchmarks.synthetic import make_raw_frame
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "template.xlsm")
+TODAY = datetime(2026, 3, 1)
+
+def sheet_bytes(path):
+    with zipfile.ZipFile(path) as archive:
+        return sum(info.compress_size for info in archive.infolist() if info.filename.startswith("xl/worksheets/sheet"))
+
+def main(rows, streaming):
+    raw_df = make_raw_frame(rows)
+    derived = derive_frame(raw_df, TODAY)
+    print(f"{rows} rows, {'streamed' if streaming else 'through openpyxl'}")
+    with tempfile.TemporaryDirectory() as directory:
+        for label, compact in [("full", False), ("compact", True)]:
+            path = os.path.join(directory, f"{label}.xlsm")
+            start = time.perf_counter()
+            build_dashboard(raw_df, path, TEMPLATE, TODAY, streaming=streaming, derived=derived, compact=compact)
+            elapsed = time.perf_counter() - start
+            print(f"  {label:>8}: {elapsed:8.2f} s  {os.path.getsize(path) / 2**20:8.2f} MB  (sheets {sheet_bytes(path) / 2**20:8.2f} MB)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--streaming", action="store_true")
+    args = parser.parse_args()
+    main(args.rows, args.streaming)
@@ -0,0 +1,61 @@
+# Group banding on a tall, wide sheet: a fill assigned to every cell (the previous
+# apply_group_colors loop) against band_groups' conditional-formatting ranges.
+# Run from the repository root: python -m benchmarks.bench_group_colors [rows ...]
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from openpyxl import Workbook
+from openpyxl.styles import PatternFill
+
+from dashboard_creation import GROUP_COLORS, band_groups
+
+N_COLUMNS = 30
+N_GROUPS = 200
+
+def per_cell_fill(ws):
+    colors = [PatternFill(start_color=color, end_color=color, fill_type="solid") for color in GROUP_COLORS]
+    last_group = None
+    color_idx = -1
+    for row_num in range(2, ws.max_row + 1):
+        current_group = ws.cell(row=row_num, column=4).value
+        if current_group != last_group:
+            color_idx = (color_idx + 1) % len(colors)
+        for col_num in range(1, ws.max_column + 1):
+            ws.cell(row=row_num, column=col_num).fill = colors[color_idx]
+        last_group = current_group
+
+def make_sheet(n_rows):
+    wb = Workbook()
+    ws = wb.active
+    groups = np.sort(np.random.default_rng(0).integers(0, N_GROUPS, n_rows))
+    ws.append([f"col{i}" for i in range(N_COLUMNS)])
+    for i, group in enumerate(groups):
+        ws.append([i, i * 2, i * 3, f"group {group}"] + [i] * (N_COLUMNS - 4))
+    group_start_rows = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]]) + 2
+    return wb, ws, group_start_rows
+
+def run(n_rows, by_ranges, tmp):
+    wb, ws, group_start_rows = make_sheet(n_rows)
+    start = time.perf_counter()
+    if by_ranges:
+        band_groups(ws, group_start_rows, ws.max_row, ws.max_column)
+    else:
+        per_cell_fill(ws)
+    elapsed = time.perf_counter() - start
+    path = os.path.join(tmp, f"banding_{by_ranges}.xlsx")
+    wb.save(path)
+    return elapsed, os.path.getsize(path) / 2**20
+
+def main(sizes):
+    print(f"{'rows':>8} {'per-cell (s)':>13} {'size (MB)':>10} {'ranges (s)':>11} {'size (MB)':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_rows in sizes:
+            cell_time, cell_size = run(n_rows, False, tmp)
+            range_time, range_size = run(n_rows, True, tmp)
+            print(f"{n_rows:>8} {cell_time:>13.3f} {cell_size:>10.2f} {range_time:>11.3f} {range_size:>10.2f}")
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 50000])
@@ -0,0 +1,46 @@
+# The history store over a year of daily scans: time to record each scan (findings and aggregates) and to
+# query the trend the Trends sheet is built from, which should stay flat however much history there is.
+# Run from the repository root: python -m benchmarks.bench_history [--rows 5000] [--days 365]
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from dashboard_creation import derive_frame
+from history import record_frame, recording, trend_table
+from benchmarks.synthetic import make_raw_frame
+
+START = datetime(2025, 3, 1)
+
+def main(rows, days):
+    raw_df = make_raw_frame(rows, patch_null_rate=0.05)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "history.db")
+        record_seconds = 0.0
+        for day in range(days):
+            today = START + timedelta(days=day)
+            df, sla = derive_frame(raw_df, today)
+            start = time.perf_counter()
+            with recording(path, "bench", today) as recorder:
+                record_frame(recorder, df, sla)
+            record_seconds += time.perf_counter() - start
+        today = START + timedelta(days=days - 1)
+        start = time.perf_counter()
+        trend = trend_table(path, "bench", today)
+        query_seconds = time.perf_counter() - start
+        assert len(trend) == min(days, 365)
+        with sqlite3.connect(path) as conn:
+            plan = conn.execute("EXPLAIN QUERY PLAN SELECT SUM(findings) FROM aggregates WHERE source = ? AND scan_date BETWEEN ? AND ?",
+                                ("bench", "2025-01-01", "2026-01-01")).fetchall()
+        print(f"{days} scans of {rows} findings: store {os.path.getsize(path) / 2**20:.1f} MB")
+        print(f"  record  {record_seconds / days * 1000:8.1f} ms per scan")
+        print(f"  trend   {query_seconds * 1000:8.1f} ms for {len(trend)} scans  ({plan[0][-1]})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+    main(args.rows, args.days)
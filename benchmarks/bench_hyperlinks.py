@@ -0,0 +1,42 @@
+# Hyperlinks for the "Asset Grp & Family" sheet with many asset group x plugin family labels: the previous
+# dict comprehension + per-label excel_clickable_cell + per-cell named style against link_index,
+# hyperlink_formulas and the shared style array.
+# Run from the repository root: python -m benchmarks.bench_hyperlinks [rows] [asset groups] [families]
+import sys
+import time
+
+from openpyxl import Workbook
+
+from dashboard_creation import excel_clickable_cell, hyperlink_cell, hyperlink_formulas, link_index, link_rows
+from benchmarks.synthetic import make_raw_frame
+
+def per_label_links(keys, labels, ws):
+    boundaries = keys.index[keys.ne(keys.shift()).any(axis=1)]
+    links = {f"{keys.loc[idx, 'asset_group']} - {keys.loc[idx, 'plugin_family']}": idx+2 for idx in boundaries}
+    formulas = labels.apply(lambda x: excel_clickable_cell(x, sheet="Original Vulnerabilities", cell=f"A{links.get(x, 1)}"))
+    for row in range(1, len(formulas) + 1):
+        ws.cell(row=row, column=1).style = "Hyperlink"
+    return formulas
+
+def vectorized_links(keys, labels, ws):
+    links = link_index(keys, ["asset_group", "plugin_family"])
+    formulas = hyperlink_formulas(labels, "Original Vulnerabilities", link_rows(links, labels))
+    hyperlink_cell(ws, 1, len(formulas))
+    return formulas
+
+def main(n_rows, n_asset_groups, n_families):
+    raw_df = make_raw_frame(n_rows, n_asset_groups=n_asset_groups, n_families=n_families)
+    keys = raw_df[["asset_group", "plugin_family"]].sort_values(by=["asset_group", "plugin_family"]).reset_index(drop=True)
+    labels = (keys["asset_group"] + " - " + keys["plugin_family"]).drop_duplicates().reset_index(drop=True)
+    print(f"{n_rows} rows, {len(labels)} asset group - family labels")
+    results = []
+    for label, links in [("per-label", per_label_links), ("vectorized", vectorized_links)]:
+        ws = Workbook().active
+        start = time.perf_counter()
+        results.append(links(keys, labels, ws))
+        print(f"{label:>12}: {time.perf_counter() - start:8.3f} s")
+    assert (results[0] == results[1]).all()
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [1000000, 200, 300][len(args):]))
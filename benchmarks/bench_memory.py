@@ -0,0 +1,90 @@
+# Memory of the frame model: the original one (string columns, Y/N as str, float day counts and
+# seven materialized detail frames) against the compact one (categoricals, boolean/int32 derived
+# columns and detail sheets as row positions into df). Each model runs in a fresh process; peak is the
+# resident high-water mark above what the process held once the raw export was in memory.
+# Run from the repository root: python -m benchmarks.bench_memory [rows]
+import multiprocessing
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from dashboard_creation import DETAIL_SHEETS, derive_frame, split_frames, view_length
+from instrumentation import peak_rss, reset_peak_rss
+from benchmarks.synthetic import make_raw_frame
+
+TODAY = datetime(2026, 3, 1)
+THRESHOLDS = {"Critical": 60, "High": 60, "Medium": 90, "Low": 90}
+CATEGORY_COLUMNS = ["plugin_family", "severity", "asset_group"]
+
+def frame_mb(frames):
+    return sum(frame.memory_usage(deep=True).sum() for frame in frames) / 2**20
+
+# The pipeline as the original script ran it: a deep copy, string flags, float days and a copy per sheet
+def materialized_model(raw_df):
+    df = raw_df.copy()
+    df.insert(df.columns.get_loc("port") + 1, "scan", np.where(df["port"] != 0, "Network Scan", "Agent Scan"))
+    df["Days Discovered (Days)"] = (df["last_observed_date"] - df["first_observed_date"]).dt.days
+    thresholds = df["severity"].map(THRESHOLDS).astype("float64")
+    start_date = df["patch_publication_date"].fillna(df["first_observed_date"])
+    df["difference"] = (pd.Timestamp(TODAY) - start_date).dt.days.astype("float64")
+    df["overdue"] = np.where(df["difference"] > thresholds, "Y", "N")
+    overdue_mask = df["overdue"] == "Y"
+    overdue_df = df.loc[overdue_mask].reset_index(drop=True)
+    non_overdue_df = df.loc[~overdue_mask].reset_index(drop=True)
+    overdue_df["Days Overdued By (Days)"] = (df["difference"] - thresholds)[overdue_mask].to_numpy()
+    non_overdue_df["Days to Overdue (Days)"] = (thresholds - df["difference"])[~overdue_mask].to_numpy()
+    frames = [
+        overdue_df.drop("difference", axis=1),
+        non_overdue_df.drop("difference", axis=1),
+        raw_df.sort_values(by=["asset_group", "plugin_family"]).reset_index(drop=True),
+    ]
+    frames += [df.loc[df["severity"] == level].reset_index(drop=True) for level in ["Low", "Medium", "High", "Critical"]]
+    return [df, *frames], sum(len(frame) for frame in frames)
+
+def compact_model(raw_df):
+    df, sla = derive_frame(raw_df, TODAY, THRESHOLDS)
+    detail_views = split_frames(raw_df, df, sla)[0]
+    return [df, sla], sum(view_length(detail_views[sheet_name]) for sheet_name in DETAIL_SHEETS)
+
+MODELS = {
+    "materialized": (materialized_model, False),
+    "compact": (compact_model, True),
+}
+
+# Runs in the child
+def measure(model, n_rows):
+    run_model, categorical = MODELS[model]
+    raw_df = make_raw_frame(n_rows)
+    if categorical:
+        raw_df[CATEGORY_COLUMNS] = raw_df[CATEGORY_COLUMNS].astype("category")
+    else:
+        raw_df[CATEGORY_COLUMNS] = raw_df[CATEGORY_COLUMNS].astype(object)
+    resettable = reset_peak_rss()
+    baseline = peak_rss()
+    start = time.perf_counter()
+    frames, sheet_rows = run_model(raw_df)
+    seconds = time.perf_counter() - start
+    return {
+        "seconds": seconds,
+        "peak_mb": (peak_rss() - baseline) / 2**20 if resettable else None,
+        "process_peak_mb": peak_rss() / 2**20,
+        "raw_mb": frame_mb([raw_df]),
+        "frames_mb": frame_mb(frames),
+        "sheet_rows": sheet_rows,
+    }
+
+def main(n_rows):
+    context = multiprocessing.get_context("spawn")
+    print(f"{n_rows} rows")
+    for model in MODELS:
+        with context.Pool(1) as pool:
+            result = pool.apply(measure, (model, n_rows))
+        peak = f"{result['peak_mb']:8.1f} MB" if result["peak_mb"] is not None else "     n/a"
+        print(f"{model:>14}: {result['seconds']:7.2f} s  peak +{peak}  process peak {result['process_peak_mb']:8.1f} MB  "
+              f"raw {result['raw_mb']:7.1f} MB  frames {result['frames_mb']:7.1f} MB  ({result['sheet_rows']} sheet rows)", flush=True)
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,48 @@
+# Static pivot sheets (tables and bar charts written cell by cell) against native pivot tables over one shared
+# pivot cache: build time, file size and the size of the pivot sheets' own parts, as the number of distinct
+# plugin families and asset groups (the rows of the pivot views) grows. The native build adds the hidden
+# Pivot Data sheet, which is what it pays for the views.
+# Run from the repository root: python -m benchmarks.bench_native_pivots [--rows 100000] [--groups 10 50 200]
+import argparse
+import os
+import tempfile
+import time
+import zipfile
+from datetime import datetime
+
+from dashboard_creation import build_dashboard, derive_frame
+from benchmarks.synthetic import make_raw_frame
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "template.xlsm")
+TODAY = datetime(2026, 3, 1)
+# the parts of the pivot views: the four pivot sheets with their charts, or the pivot tables and their cache
+PIVOT_SHEET_PARTS = ("xl/worksheets/sheet9.xml", "xl/worksheets/sheet10.xml", "xl/worksheets/sheet11.xml", "xl/worksheets/sheet12.xml")
+
+def view_bytes(path, native):
+    with zipfile.ZipFile(path) as archive:
+        return sum(
+            info.compress_size for info in archive.infolist()
+            if info.filename.startswith(("xl/pivotTables/", "xl/pivotCache/")) or info.filename in PIVOT_SHEET_PARTS
+            or (not native and info.filename.startswith(("xl/charts/", "xl/drawings/")))
+        )
+
+def main(rows, group_counts):
+    print(f"{rows} rows")
+    with tempfile.TemporaryDirectory() as directory:
+        for groups in group_counts:
+            raw_df = make_raw_frame(rows, n_families=groups, n_asset_groups=groups)
+            derived = derive_frame(raw_df, TODAY)
+            for label, native in [("static", False), ("native", True)]:
+                path = os.path.join(directory, f"{label}{groups}.xlsm")
+                start = time.perf_counter()
+                build_dashboard(raw_df, path, TEMPLATE, TODAY, derived=derived, native_pivots=native)
+                elapsed = time.perf_counter() - start
+                print(f"  {groups:>4} families and groups, {label}: {elapsed:8.2f} s  {os.path.getsize(path) / 2**20:8.2f} MB"
+                      f"  (pivot views {view_bytes(path, native) / 2**10:8.1f} KB)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--groups", type=int, nargs="+", default=[10, 50, 200])
+    args = parser.parse_args()
+    main(args.rows, args.groups)
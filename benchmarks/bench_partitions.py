@@ -0,0 +1,52 @@
+# One dashboard per asset group: pre-splitting the export and building each part as its own export (every part
+# read and derived again) against a partitioned build (read, derived and aggregated once, partitions cut from
+# it and written on a pool), both from a CSV export and with an empty frame cache.
+# Run from the repository root: python -m benchmarks.bench_partitions [--rows 100000] [--groups 10] [--workers 1]
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from dashboard_creation import build_file
+from partitions import build_partitions
+from benchmarks.synthetic import make_raw_frame, write_raw_frame
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "template.xlsm")
+TODAY = datetime(2026, 3, 1)
+
+def main(rows, groups, workers):
+    raw_df = make_raw_frame(rows, n_asset_groups=groups)
+    with tempfile.TemporaryDirectory() as directory:
+        export = os.path.join(directory, "scan_raw.csv")
+        write_raw_frame(raw_df, export)
+        parts = []
+        for group, part in raw_df.groupby("asset_group"):
+            parts.append(os.path.join(directory, "split", f"{group}_raw.csv"))
+            os.makedirs(os.path.dirname(parts[-1]), exist_ok=True)
+            write_raw_frame(part, parts[-1])
+
+        start = time.perf_counter()
+        for part in parts:
+            build_file(part, source_file=TEMPLATE, today=TODAY, cache_dir=os.path.join(directory, "cache_split"))
+        split_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = build_partitions(export, os.path.join(directory, "partitioned"), workers, TEMPLATE, TODAY,
+                                   cache_dir=os.path.join(directory, "cache_partitioned"))
+        partitioned_seconds = time.perf_counter() - start
+        assert all(result["ok"] for result in results), [result["error"] for result in results if not result["ok"]]
+        write_seconds = sum(result["seconds"] for result in results)
+
+        print(f"{rows} rows, {len(parts)} asset groups, {workers} workers, {os.cpu_count()} cores")
+        print(f"  pre-split exports: {split_seconds:8.2f} s")
+        print(f"  partitioned:       {partitioned_seconds:8.2f} s  ({write_seconds:.2f} s writing partitions,"
+              f" {partitioned_seconds - write_seconds:.2f} s reading, deriving and aggregating once)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--groups", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+    main(args.rows, args.groups, args.workers)
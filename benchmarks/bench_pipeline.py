@@ -0,0 +1,154 @@
+# End-to-end benchmark: generate an export of each size, build its dashboard in a fresh process with
+# instrumentation on, and record rows/s, peak RSS, time to the first byte of output, bytes written and
+# output size for the whole run and for every stage.
+# Results go to one JSON file per run, named after the commit, so runs can be compared across commits.
+# Run from the repository root:
+#   python -m benchmarks.bench_pipeline [--sizes 10000 100000 1000000] [--streaming] [--chunk-rows N] [--format csv]
+#   python -m benchmarks.bench_pipeline --compare benchmarks/results/OLD.json benchmarks/results/NEW.json
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import openpyxl
+import pandas as pd
+
+from dashboard_creation import build_file
+from instrumentation import instrumented, session_report
+from benchmarks.synthetic import make_raw_frame, write_raw_frame
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+TEMPLATE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "template.xlsm")
+TODAY = datetime(2026, 3, 1)
+EXTENSIONS = {"xlsx": ".xlsx", "csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+
+def git_revision():
+    root = os.path.dirname(TEMPLATE)
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return commit + ("-dirty" if dirty else "")
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "openpyxl": openpyxl.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+# Runs in the child: one instrumented build, cold frame cache
+def timed_build(input_path, newfile, streaming, chunk_size=None):
+    with tempfile.TemporaryDirectory() as cache_dir, instrumented("build") as session:
+        build_file(input_path, newfile, TEMPLATE, TODAY, cache_dir=cache_dir, streaming=streaming, chunk_size=chunk_size)
+    return session_report(session)
+
+def throughput(rows, seconds):
+    return rows / seconds if rows and seconds else None
+
+def run_size(n_rows, directory, fmt, streaming, repeat, generator_options, chunk_size=None):
+    input_path = write_raw_frame(make_raw_frame(n_rows, **generator_options), os.path.join(directory, f"bench_{n_rows}_raw{EXTENSIONS[fmt]}"))
+    newfile = os.path.join(directory, f"bench_{n_rows}.xlsm")
+    context = multiprocessing.get_context("spawn")
+    best = None
+    for _ in range(repeat):
+        with context.Pool(1) as pool:
+            report = pool.apply(timed_build, (input_path, newfile, streaming, chunk_size))
+        if best is None or report["wall_s"] < best["wall_s"]:
+            best = report
+    stages = {
+        name: {**total, "rows_per_s": throughput(total["rows"], total["wall_s"])}
+        for name, total in best["totals"].items() if name != "build"
+    }
+    return {
+        "rows": n_rows,
+        "wall_s": best["wall_s"],
+        "rows_per_s": throughput(n_rows, best["wall_s"]),
+        "peak_rss_mb": best["peak_rss_mb"],
+        "first_byte_s": best["marks"].get("first byte"),
+        "written_mb": sum(best["totals"][name]["bytes"] or 0 for name in ("save", "stream") if name in best["totals"]) / 2**20,
+        "input_mb": os.path.getsize(input_path) / 2**20,
+        "output_mb": os.path.getsize(newfile) / 2**20,
+        "stages": stages,
+    }
+
+def print_run(result):
+    print(f"{result['rows']:>9} rows  {result['wall_s']:8.2f} s  {result['rows_per_s']:>10.0f} rows/s  "
+          f"peak {result['peak_rss_mb']:8.1f} MB  first byte {result['first_byte_s']:8.2f} s  "
+          f"written {result['written_mb']:7.1f} MB  output {result['output_mb']:7.1f} MB", flush=True)
+    for name, stage in sorted(result["stages"].items(), key=lambda item: -item[1]["wall_s"])[:8]:
+        rate = f"{stage['rows_per_s']:>10.0f} rows/s" if stage["rows_per_s"] else " " * 17
+        print(f"    {name:<34} {stage['wall_s']:8.3f} s  {rate}  peak {stage['peak_rss_mb']:8.1f} MB", flush=True)
+
+def run(sizes, fmt, streaming, repeat, generator_options, results_dir, chunk_size=None):
+    results = {
+        "revision": git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "environment": environment(),
+        "options": {"format": fmt, "streaming": streaming, "chunk_rows": chunk_size, "repeat": repeat, **generator_options},
+        "runs": [],
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for n_rows in sizes:
+            result = run_size(n_rows, directory, fmt, streaming, repeat, generator_options, chunk_size)
+            print_run(result)
+            results["runs"].append(result)
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, f"{results['revision']}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {path}")
+    return path
+
+# Side by side wall time and peak memory of two result files, for the sizes both ran
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{old['revision']} -> {new['revision']}")
+    old_runs = {run["rows"]: run for run in old["runs"]}
+    for new_run in new["runs"]:
+        old_run = old_runs.get(new_run["rows"])
+        if old_run is None:
+            continue
+        print(f"{new_run['rows']:>9} rows  {old_run['wall_s']:8.2f} s -> {new_run['wall_s']:8.2f} s ({new_run['wall_s'] / old_run['wall_s']:5.2f}x)  "
+              f"peak {old_run['peak_rss_mb']:8.1f} -> {new_run['peak_rss_mb']:8.1f} MB  "
+              f"output {old_run['output_mb']:.1f} -> {new_run['output_mb']:.1f} MB")
+        for name in sorted(set(old_run["stages"]) & set(new_run["stages"]), key=lambda name: -new_run["stages"][name]["wall_s"]):
+            before, after = old_run["stages"][name]["wall_s"], new_run["stages"][name]["wall_s"]
+            ratio = f"{after / before:5.2f}x" if before else "     -"
+            print(f"    {name:<34} {before:8.3f} s -> {after:8.3f} s ({ratio})")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard pipeline on synthetic exports.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--format", dest="fmt", choices=sorted(EXTENSIONS), default="csv", help="raw export format (default: %(default)s)")
+    parser.add_argument("--streaming", action="store_true")
+    parser.add_argument("--chunk-rows", type=int, dest="chunk_size", help="build out of core, reading this many rows at a time")
+    parser.add_argument("--repeat", type=int, default=1, help="builds per size; the fastest is kept")
+    parser.add_argument("--families", type=int)
+    parser.add_argument("--asset-groups", type=int)
+    parser.add_argument("--patch-null-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--results-dir", default=RESULTS_DIR)
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files instead of running")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+    generator_options = {"seed": args.seed, "n_families": args.families, "n_asset_groups": args.asset_groups, "patch_null_rate": args.patch_null_rate}
+    run(args.sizes, args.fmt, args.streaming, args.repeat, generator_options, args.results_dir, args.chunk_size)
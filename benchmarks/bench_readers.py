@@ -0,0 +1,63 @@
+# Load time and peak memory of read_raw for the same generated export saved as xlsx, CSV,
+# Parquet and Arrow IPC. Each load runs in a fresh process so peak RSS is per format.
+# Run from the repository root: python -m benchmarks.bench_readers [rows]
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from readers import DATE_FORMAT, read_raw
+from benchmarks.synthetic import make_raw_frame
+
+def write_inputs(raw_df, directory):
+    paths = {}
+    raw_df.to_csv(os.path.join(directory, "raw.csv"), index=False, date_format=DATE_FORMAT)
+    paths["csv"] = os.path.join(directory, "raw.csv")
+    try:
+        raw_df.to_parquet(os.path.join(directory, "raw.parquet"))
+        paths["parquet"] = os.path.join(directory, "raw.parquet")
+        raw_df.to_feather(os.path.join(directory, "raw.arrow"))
+        paths["arrow"] = os.path.join(directory, "raw.arrow")
+    except ImportError:
+        print("pyarrow is not installed, skipping parquet and arrow")
+    raw_df.to_excel(os.path.join(directory, "raw.xlsx"), index=False)
+    paths["xlsx"] = os.path.join(directory, "raw.xlsx")
+    return paths
+
+# VmRSS/VmHWM in MB from /proc; ru_maxrss survives exec, so a spawned child would report its parent's peak
+def proc_status_mb(field):
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+# Runs in the child: seconds to load, RSS before the load, peak RSS during it, and the frame's own size
+def timed_load(path):
+    baseline = proc_status_mb("VmRSS")
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")  # reset VmHWM to the current RSS
+    except OSError:
+        pass
+    start = time.perf_counter()
+    df = read_raw(path)
+    elapsed = time.perf_counter() - start
+    peak = proc_status_mb("VmHWM")
+    return elapsed, baseline, peak, df.memory_usage(deep=True).sum() / 2**20
+
+def main(n_rows):
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_inputs(make_raw_frame(n_rows), tmp)
+        print(f"{n_rows} rows")
+        print(f"{'format':>8} {'file (MB)':>10} {'load (s)':>9} {'RSS before (MB)':>16} {'peak RSS (MB)':>14} {'frame (MB)':>11}")
+        for fmt, path in paths.items():
+            with context.Pool(1) as pool:
+                elapsed, baseline_mb, peak_mb, frame_mb = pool.apply(timed_load, (path,))
+            print(f"{fmt:>8} {os.path.getsize(path) / 2**20:>10.1f} {elapsed:>9.2f} {baseline_mb:>16.1f} {peak_mb:>14.1f} {frame_mb:>11.1f}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,38 @@
+# Wall time of refreshing a dashboard against building it from scratch: the first refresh (no snapshot
+# yet), a refresh with nothing changed, and one after a single finding's port changed, which rewrites
+# the detail sheets that list it.
+# Run from the repository root: python -m benchmarks.bench_refresh [rows ...]
+import argparse
+import os
+import tempfile
+import time
+
+from dashboard_creation import build_dashboard, refresh_dashboard
+from benchmarks.bench_streaming import TEMPLATE, TODAY
+from benchmarks.synthetic import make_raw_frame
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sizes", nargs="*", type=int, default=[10000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'build (s)':>10} {'first refresh (s)':>18} {'unchanged (s)':>14} {'one row (s)':>12}  rewritten")
+    for n_rows in args.sizes:
+        raw_df = make_raw_frame(n_rows)
+        with tempfile.TemporaryDirectory() as tmp:
+            build_time, _ = timed(build_dashboard, raw_df, os.path.join(tmp, "built.xlsm"), TEMPLATE, today=TODAY)
+            newfile = os.path.join(tmp, "refreshed.xlsm")
+            first_time, _ = timed(refresh_dashboard, raw_df, newfile, TEMPLATE, today=TODAY)
+            unchanged_time, _ = timed(refresh_dashboard, raw_df, newfile, TEMPLATE, today=TODAY)
+            changed_df = raw_df.copy()
+            changed_df.loc[0, "port"] = changed_df["port"].max() + 1
+            changed_time, report = timed(refresh_dashboard, changed_df, newfile, TEMPLATE, today=TODAY)
+        print(f"{n_rows:>8} {build_time:>10.2f} {first_time:>18.2f} {unchanged_time:>14.2f} {changed_time:>12.2f}  {', '.join(report['rewritten'])}")
+
+if __name__ == "__main__":
+    main()
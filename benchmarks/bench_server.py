@@ -0,0 +1,71 @@
+# The job server under concurrent load, all on this machine: start it in-process, upload a mix of distinct
+# and repeated synthetic exports from concurrent clients, and report per-request latency, how many builds
+# the deduplication saved and how many uploads backpressure turned away.
+# Run from the repository root: python -m benchmarks.bench_server [--rows 20000] [--clients 8] [--distinct 3]
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from server import percentile, start_server, stop_server
+from benchmarks.synthetic import make_raw_frame, write_raw_frame
+
+def post_dashboard(url, path):
+    with open(path, "rb") as f:
+        body = f.read()
+    request = urllib.request.Request(f"{url}/dashboards?filename={os.path.basename(path)}", data=body, method="POST")
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request) as response:
+            size = len(response.read())
+            status = response.status
+    except urllib.error.HTTPError as exc:
+        size, status = 0, exc.code
+    return status, time.perf_counter() - start, size
+
+def get_json(url):
+    with urllib.request.urlopen(url) as response:
+        return json.load(response)
+
+async def run(rows, clients, distinct, workers, queue_size, executor):
+    with tempfile.TemporaryDirectory() as directory:
+        inputs = [write_raw_frame(make_raw_frame(rows, seed=seed), os.path.join(directory, f"export{seed}_raw.csv")) for seed in range(distinct)]
+        server, state = await start_server(port=0, work_dir=os.path.join(directory, "jobs"), workers=workers, queue_size=queue_size,
+                                           cache_dir=os.path.join(directory, "cache"), executor=executor)
+        url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+        try:
+            start = time.perf_counter()
+            results = await asyncio.gather(*[asyncio.to_thread(post_dashboard, url, inputs[i % distinct]) for i in range(clients)])
+            wall = time.perf_counter() - start
+            metrics = await asyncio.to_thread(get_json, f"{url}/metrics")
+        finally:
+            await stop_server(server, state)
+
+    latencies = [seconds for status, seconds, _ in results if status == 200]
+    statuses = {}
+    for status, _, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    print(f"{clients} requests for {distinct} distinct {rows}-row exports, {workers} {executor} workers: {wall:.2f} s")
+    print(f"  responses {statuses}")
+    if latencies:
+        print(f"  request latency  p50 {percentile(latencies, 0.5):.2f} s  p95 {percentile(latencies, 0.95):.2f} s  max {max(latencies):.2f} s")
+    print(f"  builds {metrics['counts']['done'] + metrics['counts']['failed']}  deduplicated {metrics['counts']['deduplicated']}  "
+          f"rejected {metrics['counts']['rejected']}  server p50 {metrics['latency_s']['p50']:.2f} s")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the dashboard job server locally.")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--distinct", type=int, default=3, help="different exports among the uploads; the rest are repeats")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--queue-size", type=int, default=16)
+    parser.add_argument("--executor", choices=["process", "thread"], default="process")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    asyncio.run(run(args.rows, args.clients, args.distinct, args.workers, args.queue_size, args.executor))
@@ -0,0 +1,49 @@
+# Wall time of the detail-sheet write phase (stubs saved, then the rows streamed into the package) with the
+# sheet parts serialized on 1, 2, ... workers, checking that every worker count writes the same package.
+# The speedup is bounded by the core count and by the largest sheet (Original holds every row).
+# Run from the repository root: python -m benchmarks.bench_sheet_workers [--rows 200000] [--workers 1 2 4]
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from datetime import datetime
+
+from dashboard_creation import dashboard_sheets, stream_details, write_dashboard
+from benchmarks.synthetic import make_raw_frame
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "template.xlsm")
+TODAY = datetime(2026, 3, 1)
+
+# Every part but the document properties, which carry the save time
+def package_parts(path):
+    with zipfile.ZipFile(path) as archive:
+        return [(name, archive.read(name)) for name in archive.namelist() if not name.startswith("docProps/")]
+
+def main(rows, worker_counts):
+    raw_df = make_raw_frame(rows)
+    sheets, detail_frames = dashboard_sheets(raw_df, TODAY, streaming=True)
+    with tempfile.TemporaryDirectory() as directory:
+        stubs = os.path.join(directory, "stubs.xlsm")
+        write_dashboard(stubs, TEMPLATE, sheets, detail_frames)
+        expected = None
+        print(f"{rows} rows, {os.cpu_count()} cores")
+        for workers in worker_counts:
+            path = os.path.join(directory, f"workers{workers}.xlsm")
+            shutil.copy(stubs, path)
+            start = time.perf_counter()
+            stream_details(path, detail_frames, workers)
+            elapsed = time.perf_counter() - start
+            parts = package_parts(path)
+            if expected is None:
+                expected = parts
+            assert parts == expected, f"{workers} workers wrote a different package"
+            print(f"  {workers:>3} workers: {elapsed:8.2f} s  {os.path.getsize(path) / 2**20:8.1f} MB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+    main(args.rows, args.workers)
@@ -0,0 +1,51 @@
+# Sketched Summary counts against exact ones: the largest error of each sketched column's estimated counts
+# next to its guaranteed bound, the distinct plugin ids per asset group against the exact counts, and the
+# time and size of a sketch built chunk by chunk and merged, against the cube the exact tables come from.
+# With more asset groups than the sketch keeps counters for, only the kept groups have their distinct counts.
+# Run from the repository root: python -m benchmarks.bench_sketches [--rows 1000000] [--chunk-rows 100000] [--asset-groups 50]
+import argparse
+import pickle
+import time
+from datetime import datetime
+
+from dashboard_creation import aggregate_cube, derive_frame
+from sketches import DEFAULT_COUNTERS, DEFAULT_EPSILON, DISTINCT_BY, DISTINCT_OF, SKETCHED, distinct_table, frame_sketch, merge_sketches, sketch_counts
+from benchmarks.synthetic import make_raw_frame
+
+TODAY = datetime(2026, 3, 1)
+
+def main(rows, chunk_rows, asset_groups):
+    df, _ = derive_frame(make_raw_frame(rows, n_asset_groups=asset_groups), TODAY)
+    start = time.perf_counter()
+    cube = aggregate_cube(df)
+    cube_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    sketch = None
+    for offset in range(0, len(df), chunk_rows):
+        chunk_sketch = frame_sketch(df.iloc[offset:offset + chunk_rows])
+        sketch = chunk_sketch if sketch is None else merge_sketches(sketch, chunk_sketch)
+    sketch_seconds = time.perf_counter() - start
+
+    print(f"{rows} rows in chunks of {chunk_rows}")
+    print(f"  cube:   {cube_seconds:8.2f} s  {len(pickle.dumps(cube)) / 2**10:10.1f} KB")
+    print(f"  sketch: {sketch_seconds:8.2f} s  {len(pickle.dumps(sketch)) / 2**10:10.1f} KB")
+    for col in SKETCHED:
+        exact = df[col].value_counts()
+        estimated = sketch_counts(sketch, col)
+        error = (estimated - exact.reindex(estimated.index, fill_value=0)).abs().max()
+        total = int(exact.sum())
+        print(f"  {col:>14}: {exact.size:6} values, largest error {error:8}  (bounds: Space-Saving {total // DEFAULT_COUNTERS},"
+              f" Count-Min {int(DEFAULT_EPSILON * total)})")
+    exact = df.groupby(DISTINCT_BY, observed=True)[DISTINCT_OF].nunique()
+    approx = distinct_table(sketch, list(exact.index)).set_index(DISTINCT_BY).iloc[:, 0]
+    errors = ((approx.reindex(exact.index) - exact).abs() / exact).dropna()
+    print(f"  distinct {DISTINCT_OF} per {DISTINCT_BY}: {len(errors)} of {len(exact)} groups kept, largest relative error {errors.max():.2%}, "
+          f"overall {approx['All'] / df[DISTINCT_OF].nunique() - 1:+.2%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--chunk-rows", type=int, default=100000)
+    parser.add_argument("--asset-groups", type=int, default=50)
+    args = parser.parse_args()
+    main(args.rows, args.chunk_rows, args.asset_groups)
@@ -0,0 +1,49 @@
+# Peak traced memory and wall time of a dashboard build with and without the streaming
+# detail-sheet export. --max-peak-mb turns the streaming run into a pass/fail check.
+# Run from the repository root: python -m benchmarks.bench_streaming [--max-peak-mb N] [rows ...]
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from dashboard_creation import build_dashboard
+from benchmarks.synthetic import make_raw_frame
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "template.xlsm")
+TODAY = datetime(2026, 3, 1)
+
+# Returns (seconds, peak MB traced while fn ran)
+def measure_peak(fn, *args, **kwargs):
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        fn(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+def build_peak(raw_df, streaming):
+    with tempfile.TemporaryDirectory() as tmp:
+        return measure_peak(build_dashboard, raw_df, os.path.join(tmp, "bench.xlsm"), TEMPLATE, today=TODAY, streaming=streaming)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sizes", nargs="*", type=int, default=[2000, 10000])
+    parser.add_argument("--max-peak-mb", type=float, default=None)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'in-memory (s)':>14} {'peak (MB)':>10} {'streaming (s)':>14} {'peak (MB)':>10}")
+    for n_rows in args.sizes:
+        raw_df = make_raw_frame(n_rows)
+        mem_time, mem_peak = build_peak(raw_df, streaming=False)
+        stream_time, stream_peak = build_peak(raw_df, streaming=True)
+        print(f"{n_rows:>8} {mem_time:>14.2f} {mem_peak:>10.1f} {stream_time:>14.2f} {stream_peak:>10.1f}")
+        if args.max_peak_mb is not None:
+            assert stream_peak <= args.max_peak_mb, f"streaming peak {stream_peak:.1f} MB exceeds {args.max_peak_mb} MB at {n_rows} rows"
+
+if __name__ == "__main__":
+    main()
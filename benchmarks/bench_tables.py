@@ -0,0 +1,29 @@
+# Summary and pivot tables: eight separate scans of the frame against roll-ups of one aggregation cube.
+# Run from the repository root: python -m benchmarks.bench_tables [rows]
+import sys
+import time
+from datetime import datetime
+
+from dashboard_creation import aggregate_cube, derive_frame, pivot_table_wide, univariate_table
+from benchmarks.synthetic import make_raw_frame
+
+UNIVARIATE = ["plugin_family", "severity", "asset_group", "overdue"]
+PIVOTS = ["plugin_family", "asset_group", "overdue", ["asset_group", "plugin_family"]]
+
+def build_all(df, use_cube):
+    cube = aggregate_cube(df) if use_cube else None
+    for variable in UNIVARIATE:
+        univariate_table(df, variable, cube=cube)
+    for index_col in PIVOTS:
+        pivot_table_wide(df, index_col, "severity", "plugin_id", cube=cube)
+
+def main(n_rows):
+    df, _ = derive_frame(make_raw_frame(n_rows), datetime(2026, 3, 1))
+    print(f"{n_rows} rows")
+    for label, use_cube in [("separate scans", False), ("aggregation cube", True)]:
+        start = time.perf_counter()
+        build_all(df, use_cube)
+        print(f"{label:>18}: {time.perf_counter() - start:8.3f} s")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,69 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from readers import DATE_FORMAT, input_format
+
+PLUGIN_FAMILIES = ["Database", "Network", "Linux", "Windows", "Oracle", "Cisco", "VMware", "Web Servers"]
+ASSET_GROUPS = ["Infra", "DB", "Web Servers", "Storage", "App", "Network", "Web", "Cloud", "App Servers", "DB Servers", "Security"]
+SEVERITIES = ["Critical", "High", "Medium", "Low"]
+PORTS = [0, 22, 80, 443, 8080]
+
+# names for n categories: the built-in ones first, then numbered extras ("Family 9", ...)
+def category_names(base, n, prefix):
+    if n is None:
+        return list(base)
+    return list(base[:n]) + [f"{prefix} {i}" for i in range(len(base) + 1, n + 1)]
+
+# Raw scan export with the same columns as dummy_data_raw.xlsx. n_families and n_asset_groups set the
+# number of distinct plugin families and asset groups; patch_null_rate is the share of findings with no
+# patch publication date (the SLA then counts from first observed)
+def make_raw_frame(n_rows, seed=0, start="2025-10-01", n_families=None, n_asset_groups=None, patch_null_rate=0.0):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp(start)
+    first_observed = start + pd.to_timedelta(rng.integers(0, 120 * 86400, n_rows), unit="s")
+    last_observed = first_observed + pd.to_timedelta(rng.integers(0, 90 * 86400, n_rows), unit="s")
+    patch_published = first_observed - pd.to_timedelta(rng.integers(0, 60, n_rows), unit="D")
+    df = pd.DataFrame({
+        "plugin_id": rng.integers(1000, 5000, n_rows),
+        "plugin_family": rng.choice(category_names(PLUGIN_FAMILIES, n_families, "Family"), n_rows),
+        "severity": rng.choice(SEVERITIES, n_rows),
+        "asset_group": rng.choice(category_names(ASSET_GROUPS, n_asset_groups, "Group"), n_rows),
+        "port": rng.choice(PORTS, n_rows),
+        "patch_publication_date": patch_published.floor("D"),
+        "first_observed_date": first_observed.floor("D"),
+        "last_observed_date": last_observed,
+    })
+    if patch_null_rate:
+        df.loc[rng.random(n_rows) < patch_null_rate, "patch_publication_date"] = pd.NaT
+    return df
+
+# Save a generated export in the format its extension names (.xlsx, .csv, .parquet, .arrow/.feather)
+def write_raw_frame(df, path):
+    fmt = input_format(path)
+    if fmt == "csv":
+        df.to_csv(path, index=False, date_format=DATE_FORMAT)
+    elif fmt == "parquet":
+        df.to_parquet(path)
+    elif fmt == "arrow":
+        df.to_feather(path)
+    else:
+        df.to_excel(path, index=False)
+    return path
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic raw scan export.")
+    parser.add_argument("rows", type=int)
+    parser.add_argument("path", help="output file; the extension picks the format")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--families", type=int, help=f"distinct plugin families (default: {len(PLUGIN_FAMILIES)})")
+    parser.add_argument("--asset-groups", type=int, help=f"distinct asset groups (default: {len(ASSET_GROUPS)})")
+    parser.add_argument("--patch-null-rate", type=float, default=0.0, help="share of findings without a patch publication date")
+    return parser.parse_args(argv)
+
+# python -m benchmarks.synthetic 100000 bu1_raw.csv --asset-groups 40 --patch-null-rate 0.1
+if __name__ == "__main__":
+    args = parse_args()
+    write_raw_frame(make_raw_frame(args.rows, args.seed, n_families=args.families, n_asset_groups=args.asset_groups,
+                                   patch_null_rate=args.patch_null_rate), args.path)
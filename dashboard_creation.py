@@ -1,90 +1,204 @@
 import pandas as pd
 import numpy as np
+import math
 import os
 import shutil
 from openpyxl.utils import get_column_letter, column_index_from_string
 from openpyxl import load_workbook
-from openpyxl.chart import BarChart, Reference, PieChart
+from openpyxl.chart import BarChart, LineChart, Reference, PieChart
 from openpyxl.chart.label import DataLabelList
 from openpyxl.chart.series import SeriesLabel
-from openpyxl.styles import Alignment, PatternFill, Font, Border, Side
-from datetime import datetime
+from openpyxl.styles import Alignment, PatternFill, Font
+from openpyxl.formatting.rule import FormulaRule
+from openpyxl.worksheet.filters import AutoFilter
+from openpyxl.worksheet.table import Table, TableColumn, TableStyleInfo
+from datetime import date, datetime, timedelta
 from contextlib import contextmanager
-
+from copy import copy, deepcopy
+from functools import partial
+from types import SimpleNamespace
+from streaming_export import CHUNK_SIZE, EXCEL_DATETIME_FORMAT, splice_sheets, stream_detail_sheets
+from readers import parse_dates, read_raw
+from frame_cache import DEFAULT_CACHE_DIR, cache_key, load_or_compute
+from instrumentation import mark, stage
+from snapshot import column_hash, content_digest, load_snapshot, row_changes, row_hashes, save_snapshot
+from templates import atomic_output, template_copy, template_digest
+from history import DEFAULT_HISTORY_DAYS, history_source, record_frame, recording, trend_table
+from native_pivots import PIVOT_FIELDS, pivot_cache, pivot_table_definition, row_count, shared_values
+from sketches import distinct_table, frame_sketch, sketch_counts, sketch_total
+
+# Writer over an existing workbook file, or over book (a workbook already in memory, see
+# templates.template_copy), in which case file is only where it gets saved. The writer's book is the
+# openpyxl workbook the steps write into (frames through write_frame); it is saved only if they all succeed
 @contextmanager
-def excel_writer(file):
-    writer = pd.ExcelWriter(
-        file,
-        engine="openpyxl",
-        mode="a",
-        if_sheet_exists="overlay",
-        engine_kwargs={"keep_vba": True}
-    )
-    try:
-        yield writer
-    finally:
-        writer.close()
+def excel_writer(file, book=None):
+    with stage("open"):
+        if book is None:
+            book = load_workbook(file, keep_vba=True)
+    writer = SimpleNamespace(book=book)
+    yield writer
+    with stage("save") as record:
+        mark("first byte")
+        book.save(file)
+        record["bytes"] = os.path.getsize(file)
+
+# A value as DataFrame.to_excel writes it, with the number format it gets: missing values as empty strings,
+# infinities as text, numpy scalars as Python ones, dates in pandas' default formats and anything else as str
+EXCEL_DATE_FORMAT = "YYYY-MM-DD"
+
+def excel_value(val):
+    if pd.api.types.is_scalar(val) and pd.isna(val):
+        return "", None
+    if isinstance(val, (bool, np.bool_)):
+        return bool(val), None
+    if isinstance(val, (int, np.integer)):
+        return int(val), None
+    if isinstance(val, (float, np.floating)):
+        if math.isinf(val):
+            return ("inf" if val > 0 else "-inf"), None
+        return float(val), None
+    if isinstance(val, datetime):
+        return val, EXCEL_DATETIME_FORMAT
+    if isinstance(val, date):
+        return val, EXCEL_DATE_FORMAT
+    if isinstance(val, timedelta):
+        return val.total_seconds() / 86400, "0"
+    return (val if isinstance(val, str) else str(val)), None
+
+# Write df (without its index) into sheet_name of the writer's book, creating the sheet if it isn't there,
+# with its top left cell startrow/startcol cells from A1: laid out as DataFrame.to_excel lays it out
+def write_frame(writer, df, sheet_name, startrow=0, startcol=0, header=True):
+    book = writer.book
+    ws = book[sheet_name] if sheet_name in book.sheetnames else book.create_sheet(sheet_name)
+    first_row = startrow + 1
+    if header:
+        for j, col in enumerate(df.columns, start=startcol + 1):
+            ws.cell(row=first_row, column=j).value = excel_value(col)[0]
+        first_row += 1
+    for j in range(df.shape[1]):
+        column = startcol + j + 1
+        for i, val in enumerate(df.iloc[:, j].tolist(), start=first_row):
+            cell = ws.cell(row=i, column=column)
+            cell.value, number_format = excel_value(val)
+            if number_format:
+                cell.number_format = number_format
+    return ws
 
 ############################
 ### Function Definitions ###
 ############################
-def autosize_df_columns(ws, df, start_col=1):
-    for i, col in enumerate(df.columns, start=start_col):
-        max_length = len(str(col))
-        for val in df[col]:
-            if val is not None:
-                max_length = max(max_length, len(str(val)))
-        ws.column_dimensions[get_column_letter(i)].width = max_length + 2
+# Length of the longest value of a column as str() would print it, vectorized by dtype.
+# With sample_size, string/float columns longer than that are measured on a fixed random sample
+# and the result is capped at the given quantile of the sampled lengths
+def column_width(series, sample_size=None, quantile=1.0):
+    values = series.dropna()
+    if values.empty:
+        return len(str(series.name)) + 2
+    if pd.api.types.is_bool_dtype(values):
+        max_length = max(len(str(v)) for v in values.unique())
+    elif pd.api.types.is_integer_dtype(values) or pd.api.types.is_datetime64_any_dtype(values):
+        # fixed-width once formatted, so the extremes are enough
+        max_length = max(len(str(values.min())), len(str(values.max())))
+        if pd.api.types.is_datetime64_any_dtype(values) and (values.dt.microsecond != 0).any():
+            max_length = max(max_length, len(str(values[values.dt.microsecond != 0].iloc[0])))
+    else:
+        if sample_size is not None and len(values) > sample_size:
+            values = values.sample(sample_size, random_state=0)
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = pd.Series(values.unique().astype(object))
+        lengths = values.map(str).str.len() if values.dtype == object else values.astype(str).str.len()
+        max_length = int(lengths.quantile(quantile, interpolation="higher")) if quantile < 1.0 else int(lengths.max())
+    return max(len(str(series.name)), max_length) + 2
+
+# Key of a column's width in a width cache: the frame, the column and how it was measured, so sampled and
+# exact widths of the same column don't overwrite each other
+def width_key(df, col, sample_size=None, quantile=1.0):
+    return (id(df), col, sample_size, quantile)
+
+# Memoized column_width keyed by width_key; the frame is kept in the cache so its id stays unique
+def cached_column_width(width_cache, df, col, sample_size=None, quantile=1.0):
+    key = width_key(df, col, sample_size, quantile)
+    if key not in width_cache:
+        width_cache[key] = (df, column_width(df[col], sample_size, quantile))
+    return width_cache[key][1]
+
+# source: a frame the sheet was filtered from; columns it shares with df take their width
+# from it, so every sheet cut from the same frame reuses one measurement per column.
+# sample_size and quantile are column_width's
+def column_widths(df, width_cache=None, source=None, sample_size=None, quantile=1.0):
+    if width_cache is None:
+        width_cache = {}
+    return [
+        cached_column_width(width_cache, source if source is not None and col in source.columns else df, col, sample_size, quantile)
+        for col in df.columns
+    ]
+
+def autosize_df_columns(ws, df, start_col=1, width_cache=None, source=None, sample_size=None, quantile=1.0):
+    with stage("styling"):
+        for i, width in enumerate(column_widths(df, width_cache, source, sample_size, quantile), start=start_col):
+            ws.column_dimensions[get_column_letter(i)].width = width
 
 # Excel Generation function
-def generate_excel(destination, excel_sheet_name, df, header_row):
-    book = load_workbook(destination, keep_vba=True)
-    with excel_writer(destination) as writer:
-        sheet = excel_sheet_name
-        df.to_excel(writer, sheet_name=sheet, index=False)
-        ws = writer.sheets[sheet]
+def write_df_sheet(writer, excel_sheet_name, df, header_row, width_cache=None, source=None):
+    sheet = excel_sheet_name
+    ws = write_frame(writer, df, sheet)
 
-        header_row = header_row
-        first_data_row = header_row + 1
-        last_data_row = ws.max_row
-        start_col = 1
-        last_col = df.shape[1]
+    last_data_row = ws.max_row
+    start_col = 1
+    last_col = df.shape[1]
 
-        ws.auto_filter.ref = f"{get_column_letter(start_col)}{header_row}:{get_column_letter(last_col)}{last_data_row}"
+    ws.auto_filter.ref = f"{get_column_letter(start_col)}{header_row}:{get_column_letter(last_col)}{last_data_row}"
+    autosize_df_columns(ws, df, width_cache=width_cache, source=source)
+    return ws
 
-        wb = writer.book
-        ws = wb[sheet]
-        autosize_df_columns(ws, df)
+def generate_excel(destination, excel_sheet_name, df, header_row):
+    with excel_writer(destination) as writer:
+        write_df_sheet(writer, excel_sheet_name, df, header_row)
 
 # delete sheet in excel sheet function
-def delete_excel_sheet(destination, excel_sheet_name):
-    wb = load_workbook(destination, keep_vba=True)
+def remove_sheet(wb, excel_sheet_name):
     if excel_sheet_name in wb.sheetnames:
         del wb[excel_sheet_name]
+
+def delete_excel_sheet(destination, excel_sheet_name):
+    wb = load_workbook(destination, keep_vba=True)
+    remove_sheet(wb, excel_sheet_name)
     wb.save(destination)
 
 # Apply color to the different groups for differentiation
+GROUP_COLORS = ["FFCCCC", "CCE5FF", "E2EFDA", "FFF2CC"]
+
+# Banding is applied as conditional formatting ranges, one rule per color, rather than a fill
+# on every cell. group_start_rows are the sheet rows where a new group begins
+def band_groups(ws, group_start_rows, last_row, last_col):
+    with stage("styling"):
+        last_col_letter = get_column_letter(last_col)
+        ranges = [[] for _ in GROUP_COLORS]
+        group_end_rows = list(group_start_rows[1:]) + [last_row + 1]
+        for i, (start, end) in enumerate(zip(group_start_rows, group_end_rows)):
+            ranges[i % len(GROUP_COLORS)].append(f"A{start}:{last_col_letter}{end - 1}")
+        for color, color_ranges in zip(GROUP_COLORS, ranges):
+            if color_ranges:
+                fill = PatternFill(start_color=color, end_color=color, fill_type="solid")
+                ws.conditional_formatting.add(" ".join(color_ranges), FormulaRule(formula=["TRUE"], fill=fill))
+
+# Whether each of a column of group values starts a group: the first row and every change of value, with
+# consecutive missing values one group, as blank cells are
+def group_starts(groups):
+    previous = groups.shift()
+    starts = ~(groups.eq(previous) | (groups.isna() & previous.isna())).to_numpy()
+    starts[:1] = True
+    return starts
+
+# Group boundaries read from column 4 of an already written sheet
+def color_groups(ws):
+    groups = pd.Series([row[0] for row in ws.iter_rows(min_row=2, min_col=4, max_col=4, values_only=True)], dtype=object)
+    group_start_rows = np.flatnonzero(group_starts(groups)) + 2
+    band_groups(ws, group_start_rows, ws.max_row, ws.max_column)
+
 def apply_group_colors(destination, sheet_name):
     wb = load_workbook(destination, keep_vba=True)
-    ws = wb[sheet_name]
-    colors = [
-        PatternFill(start_color="FFCCCC", end_color="FFCCCC", fill_type="solid"),
-        PatternFill(start_color="CCE5FF", end_color="CCE5FF", fill_type="solid"),
-        PatternFill(start_color="E2EFDA", end_color="E2EFDA", fill_type="solid"),
-        PatternFill(start_color="FFF2CC", end_color="FFF2CC", fill_type="solid")
-    ]
-    last_group = None
-    color_idx = -1
-    for row_num in range(2, ws.max_row + 1):
-        current_group = ws.cell(row=row_num, column=4).value
-        
-        if current_group != last_group:
-            color_idx = (color_idx + 1) % len(colors)
-            
-        for col_num in range(1, ws.max_column + 1):
-            ws.cell(row=row_num, column=col_num).fill = colors[color_idx]
-            
-        last_group = current_group
+    color_groups(wb[sheet_name])
     wb.save(destination)
 
 # Excel Clickable Link function (for clicking and changing to the relevant sheet)
@@ -93,6 +207,38 @@ def excel_clickable_cell(val, sheet, cell="A1"):
         return val
     return f'=HYPERLINK("#\'{sheet}\'!{cell}", "{val}")'
 
+# Link targets for the groups of a frame sorted by columns: the sheet row where each group starts,
+# indexed by its label (the value, or the values joined with " - "). One pass over the group boundaries;
+# a label that occurs in several places keeps its last start, as a dict built over the rows would
+def link_index(sorted_keys, columns, header_rows=1):
+    keys = sorted_keys[columns].reset_index(drop=True)
+    starts = np.flatnonzero(keys.ne(keys.shift()).any(axis=1).to_numpy())
+    return group_links(keys.iloc[starts], starts, columns, header_rows)
+
+# link_index from the keys each group starts with (firsts) and the positions it starts at
+def group_links(firsts, starts, columns, header_rows=1):
+    labels = firsts[columns[0]].astype(str)
+    for col in columns[1:]:
+        labels = labels + " - " + firsts[col].astype(str)
+    links = pd.Series(starts + header_rows + 1, index=pd.Index(labels.to_numpy(dtype=object)))
+    return links[~links.index.duplicated(keep="last")]
+
+# Sheet rows of labels in a link_index, 1 (the top of the sheet) for labels it doesn't know
+def link_rows(links, labels):
+    rows = links.reindex(pd.Index(labels.to_numpy(dtype=object))).fillna(1).astype("int64")
+    return pd.Series(rows.to_numpy(), index=labels.index)
+
+# excel_clickable_cell over a whole column as string operations: sheets is one sheet name or one per
+# label, rows the target row in column A per label (A1 when None)
+def hyperlink_formulas(labels, sheets, rows=None):
+    text = labels.astype(str)
+    blank = labels.isna() | text.str.strip().eq("")
+    cells = "A1" if rows is None else "A" + rows.astype(str)
+    formulas = "=HYPERLINK(\"#'" + pd.Series(sheets, index=labels.index).astype(str) + "'!" + cells + "\", \"" + text + "\")"
+    if blank.any():
+        formulas = formulas.astype(object).mask(blank, labels.astype(object))
+    return formulas
+
 # Chart functions
 def merge_cells_title(sheet, cell1, cell2, row_no, col, val, horizontal_val, vertical_val, color="00FFFF00", font_size=11, bold=False):
     sheet.merge_cells(f'{cell1}:{cell2}')
@@ -102,12 +248,66 @@ def merge_cells_title(sheet, cell1, cell2, row_no, col, val, horizontal_val, ver
     cell.fill = PatternFill(start_color=color, end_color=color, fill_type="solid")
     cell.font = Font(size=font_size, bold=bold)
 
+# The "Hyperlink" named style on a column range: looked up once, then its style array is shared by every cell
 def hyperlink_cell(ws, first_data_row, last_data_row, column_no=1):
-    for row in range(first_data_row, last_data_row + 1):
-        ws.cell(row=row, column=column_no).style = "Hyperlink"
+    if last_data_row < first_data_row:
+        return
+    first = ws.cell(row=first_data_row, column=column_no)
+    first.style = "Hyperlink"
+    for row in range(first_data_row + 1, last_data_row + 1):
+        ws.cell(row=row, column=column_no)._style = copy(first._style)
+
+# Aggregation cube: one groupby over the findings, counted per (asset_group, plugin_family, severity,
+# overdue). rows counts findings, plugin_id counts non-null plugin ids (what the pivot tables count)
+# and first_row is the position of the cell's first finding, so roll-ups can order ties as value_counts does.
+# offset is the position of df's first row among all findings, when df is one chunk of them
+CUBE_KEYS = ["asset_group", "plugin_family", "severity", "overdue"]
+
+def aggregate_cube(df, offset=0):
+    keyed = pd.DataFrame({key: df[key] for key in CUBE_KEYS})
+    keyed["plugin_id"] = df["plugin_id"]
+    keyed["row"] = np.arange(offset, offset + len(df))
+    return (
+        keyed
+        .groupby(CUBE_KEYS, dropna=False, observed=True, sort=False)
+        .agg(rows=("row", "size"), plugin_id=("plugin_id", "count"), first_row=("row", "min"))
+        .reset_index()
+    )
+
+# One cube from the cubes of several chunks of the findings: the counts add up, first_row is the earliest
+def merge_cubes(cubes):
+    return (
+        pd.concat(cubes, ignore_index=True)
+        .groupby(CUBE_KEYS, dropna=False, observed=True, sort=False)
+        .agg(rows=("rows", "sum"), plugin_id=("plugin_id", "sum"), first_row=("first_row", "min"))
+        .reset_index()
+    )
 
-def univariate_table(df, variable, top_n=5):
-    counts = df[variable].value_counts().reset_index()
+# Finding counts per value of one cube key: most frequent first, ties in order of first appearance
+def cube_counts(cube, variable):
+    rolled = cube.dropna(subset=[variable]).groupby(variable, observed=True, sort=False).agg(count=("rows", "sum"), first_row=("first_row", "min"))
+    return rolled.sort_values("first_row")["count"].sort_values(ascending=False, kind="stable")
+
+# Wide index_col x col table of a cube measure, laid out like pd.pivot_table(..., aggfunc="count")
+def cube_pivot(cube, index_col, col, val):
+    index_cols = index_col if isinstance(index_col, list) else [index_col]
+    keys = index_cols + [col]
+    cells = cube.dropna(subset=keys).groupby(keys, observed=True)[val].sum()
+    return cells.unstack(col, fill_value=0)
+
+# sketch: approximate counts from the sketch of the findings (see sketches.frame_sketch) instead; Misc is then
+# every counted value not in the table, whether or not the sketch kept it (never below 0, as the table's
+# estimates can add up to more than were counted), and equal counts come in value order (a sketch merged from
+# chunks doesn't know which value appeared first)
+def univariate_table(df, variable, top_n=5, cube=None, sketch=None):
+    if sketch is not None:
+        counts = sketch_counts(sketch, variable).reset_index()
+    elif cube is not None:
+        counts = cube_counts(cube, variable).reset_index()
+    else:
+        values = df[variable].dropna()
+        # most frequent first, ties in order of first appearance whether or not the column is categorical
+        counts = values.value_counts(sort=False).reindex(pd.unique(values)).sort_values(ascending=False, kind="stable").reset_index()
     counts.columns = [variable, 'count']
     if variable == 'severity':
         severity_order = ['Critical', 'High', 'Medium', 'Low']
@@ -115,7 +315,7 @@ def univariate_table(df, variable, top_n=5):
         counts = counts.sort_values(by=variable)
     if len(counts) > top_n:
         sub_df = counts.head(top_n).copy()
-        misc_count = counts.iloc[top_n:]['count'].sum()
+        misc_count = counts.iloc[top_n:]['count'].sum() if sketch is None else max(sketch_total(sketch, variable) - sub_df['count'].sum(), 0)
         misc_row = pd.DataFrame({variable: ['Misc'], 'count': [misc_count]})
         sub_df = pd.concat([sub_df, misc_row], ignore_index=True)
     else:
@@ -125,7 +325,7 @@ def univariate_table(df, variable, top_n=5):
     return sub_df, sub_df_rows, sub_df_columns
 
 def pivot_table(df, index_col, col, val):
-    pivot_table_df = pd.pivot_table(df, index=index_col, columns=col, values=val, aggfunc="count", fill_value=0).stack().reset_index()
+    pivot_table_df = pd.pivot_table(df, index=index_col, columns=col, values=val, aggfunc="count", fill_value=0, observed=True).stack().reset_index()
     if isinstance(index_col, list):
         new_cols = index_col + [col, "count"]
     else:
@@ -133,14 +333,17 @@ def pivot_table(df, index_col, col, val):
     pivot_table_df.columns = new_cols
     return pivot_table_df
 
-def pivot_table_wide(df, index_col, col, val, sheet=None, cell=None):
+def pivot_table_wide(df, index_col, col, val, sheet=None, cell=None, cube=None):
     column_order = ["Critical", "High", "Medium", "Low"]
-    pivot_df = pivot_table(df, index_col, col, val)
-    pivot_df_wide = (
-        pivot_df
-        .pivot(index=index_col, columns=col, values="count")
-        .fillna(0)
-    )
+    if cube is not None:
+        pivot_df_wide = cube_pivot(cube, index_col, col, val)
+    else:
+        pivot_df = pivot_table(df, index_col, col, val)
+        pivot_df_wide = (
+            pivot_df
+            .pivot(index=index_col, columns=col, values="count")
+            .fillna(0)
+        )
     existing_cols = [c for c in column_order if c in pivot_df_wide.columns]
     pivot_df_wide = pivot_df_wide.reindex(columns=existing_cols)
     pivot_df_wide = pivot_df_wide.reset_index()
@@ -154,7 +357,9 @@ def pivot_table_wide(df, index_col, col, val, sheet=None, cell=None):
     pivot_df_wide_columns = pivot_df_wide.shape[1]
     return pivot_df_wide, pivot_df_wide_rows, pivot_df_wide_columns
 
-def barchart_creation(sheet, chartType, variable, x_title, y_title, min_col, max_col, min_row, max_row, showVal, showSerName, showCatName, showLeaderLines, cell, chartStyle=None, chartGrouping=None, chartOverlap=None, shape=None, header_row=None):
+# Everything a run of bar charts shares (type, style, titles, axes, data labels), configured once;
+# barchart_clone copies it for each chart and adds that chart's data
+def barchart_template(chartType, variable, x_title, y_title, showVal, showSerName, showCatName, showLeaderLines, chartStyle=None, chartGrouping=None, chartOverlap=None, shape=None):
     chart = BarChart()
     chart.type = chartType
     if chartStyle is not None:
@@ -165,11 +370,6 @@ def barchart_creation(sheet, chartType, variable, x_title, y_title, min_col, max
         chart.overlap = chartOverlap
     chart.title = f"Vulnerabilities by {variable}"
 
-    if header_row is None:
-        header_row = min_row
-    data_start_row = min_row + 1
-    num_categories = max_row - data_start_row + 1
-
     chart.x_axis.title = x_title
     chart.y_axis.title = y_title
     chart.y_axis.majorGridlines = None
@@ -178,16 +378,6 @@ def barchart_creation(sheet, chartType, variable, x_title, y_title, min_col, max
     chart.legend.overlay = False
     chart.title.overlay = False
 
-    data = Reference(sheet, min_col=min_col, min_row=data_start_row, max_row=max_row, max_col=max_col)
-    cats = Reference(sheet, min_col=min_col - 1, min_row=data_start_row, max_row=max_row)
-
-    chart.add_data(data, titles_from_data=False)
-    chart.set_categories(cats)
-
-    for i, series in enumerate(chart.series):
-        header_cell = sheet.cell(row=header_row, column=min_col + i)
-        series.title = SeriesLabel(strRef=None, v=str(header_cell.value))
-
     chart.dataLabels = DataLabelList()
     chart.dataLabels.showVal = showVal
     chart.dataLabels.showSerName = showSerName
@@ -205,6 +395,25 @@ def barchart_creation(sheet, chartType, variable, x_title, y_title, min_col, max
         chart.x_axis.crosses = "min"
         chart.x_axis.tickLblSkip = 1
         chart.x_axis.tickMarkSkip = 1
+    return chart
+
+# Series names for columns min_col..max_col, read once from the header row
+def series_titles(sheet, header_row, min_col, max_col):
+    return [str(sheet.cell(row=header_row, column=col).value) for col in range(min_col, max_col + 1)]
+
+# A copy of template charting rows min_row+1..max_row of columns min_col..max_col, with the categories
+# in the column to their left, anchored at cell
+def barchart_clone(template, sheet, min_col, max_col, min_row, max_row, cell, titles):
+    chart = deepcopy(template)
+    data_start_row = min_row + 1
+    num_categories = max_row - data_start_row + 1
+
+    data = Reference(sheet, min_col=min_col, min_row=data_start_row, max_row=max_row, max_col=max_col)
+    cats = Reference(sheet, min_col=min_col - 1, min_row=data_start_row, max_row=max_row)
+    chart.add_data(data, titles_from_data=False)
+    chart.set_categories(cats)
+    for series, title in zip(chart.series, titles):
+        series.title = SeriesLabel(strRef=None, v=title)
 
     chart.width = 6 + (num_categories * 2)
     chart.height = 7 + (num_categories * 0.1)
@@ -212,35 +421,67 @@ def barchart_creation(sheet, chartType, variable, x_title, y_title, min_col, max
     sheet.add_chart(chart, cell)
     return chart
 
-def batch_barchart(sheet, batch_size=5, **kwargs):
+def barchart_creation(sheet, chartType, variable, x_title, y_title, min_col, max_col, min_row, max_row, showVal, showSerName, showCatName, showLeaderLines, cell, chartStyle=None, chartGrouping=None, chartOverlap=None, shape=None, header_row=None):
+    template = barchart_template(chartType, variable, x_title, y_title, showVal, showSerName, showCatName, showLeaderLines, chartStyle, chartGrouping, chartOverlap)
+    if header_row is None:
+        header_row = min_row
+    return barchart_clone(template, sheet, min_col, max_col, min_row, max_row, cell, series_titles(sheet, header_row, min_col, max_col))
+
+# Most bar charts batch_barchart puts on one sheet by default; see top_categories
+MAX_CHARTS = 20
+# columns between the first batch chart and the top categories block, enough to clear the charts
+TOP_CATEGORIES_OFFSET = 10
+
+# Copy the limit rows of a table with the largest totals (over min_col..max_col, ties in table order) into a
+# block starting at column block_col, largest first, for charting in place of the whole table. Categories are
+# formulas pointing at the table's cells, so they show what the table shows; the table keeps every row.
+# Returns the block's header row, last row and value columns
+def top_categories(sheet, header_row, max_row, min_col, max_col, limit, block_col, note_cell):
+    rows = list(sheet.iter_rows(min_row=header_row + 1, max_row=max_row, min_col=min_col, max_col=max_col, values_only=True))
+    totals = np.array([sum(value or 0 for value in row) for row in rows])
+    top = np.argsort(-totals, kind="stable")[:limit]
+
+    category_col = get_column_letter(min_col - 1)
+    sheet.cell(row=header_row, column=block_col, value=sheet.cell(row=header_row, column=min_col - 1).value)
+    for offset, col in enumerate(range(min_col, max_col + 1), start=1):
+        sheet.cell(row=header_row, column=block_col + offset, value=sheet.cell(row=header_row, column=col).value)
+    for block_row, i in enumerate(top, start=header_row + 1):
+        sheet.cell(row=block_row, column=block_col, value=f"={category_col}{header_row + 1 + i}")
+        for offset, value in enumerate(rows[i], start=1):
+            sheet.cell(row=block_row, column=block_col + offset, value=value)
+    sheet[note_cell] = f"Charts show the {len(top)} largest of {len(rows)} rows by total; the table has every row"
+    return header_row, header_row + len(top), block_col + 1, block_col + max_col - min_col + 1
+
+# Bar charts of batch_size categories each, stacked down the sheet to the right of the table. With
+# max_charts, a table needing more charts than that is charted as its max_charts * batch_size largest
+# rows (see top_categories), so chart count and build time stay bounded for any number of categories
+def batch_barchart(sheet, batch_size=5, max_charts=None, **kwargs):
     header_row = kwargs["min_row"]
     max_row = kwargs["max_row"]
-    first_data_row = header_row + 1
     num_categories = max_row - header_row
 
     if num_categories <= batch_size:
         return [barchart_creation(sheet=sheet, header_row=header_row, **kwargs)]
 
-    start_col = kwargs["max_col"] + 3
-    charts = []
-    batch_index = 0
+    min_col = kwargs["min_col"]
+    max_col = kwargs["max_col"]
+    start_col = max_col + 3
+    template = barchart_template(**{k: v for k, v in kwargs.items() if k not in ["min_col", "max_col", "min_row", "max_row", "cell"]})
+    # fixed original header row for legend names
+    titles = series_titles(sheet, header_row, min_col, max_col)
+    if max_charts is not None and num_categories > max_charts * batch_size:
+        header_row, max_row, min_col, max_col = top_categories(
+            sheet, header_row, max_row, min_col, max_col, max_charts * batch_size,
+            block_col=start_col + TOP_CATEGORIES_OFFSET, note_cell=f"{get_column_letter(start_col)}{header_row - 1}"
+        )
+    first_data_row = header_row + 1
 
-    for start in range(first_data_row, max_row + 1, batch_size):
+    charts = []
+    for batch_index, start in enumerate(range(first_data_row, max_row + 1, batch_size)):
         end = min(start + batch_size - 1, max_row)
         cell_position = f"{get_column_letter(start_col)}{4 + batch_index * 20}"
-
-        chart = barchart_creation(
-            sheet=sheet,
-            min_row=start - 1,      # header for this batch = row just above batch
-            max_row=end,
-            cell=cell_position,
-            header_row=header_row,  # fixed original header row for legend names
-            **{k: v for k, v in kwargs.items() if k not in ["min_row", "max_row", "cell"]}
-        )
-
-        charts.append(chart)
-        batch_index += 1
-
+        # header for this batch = row just above batch
+        charts.append(barchart_clone(template, sheet, min_col, max_col, start - 1, end, cell_position, titles))
     return charts
 
 def piechart_creation(sheet, shape, variable, min_col, min_row, max_row, max_col, showVal, showSerName, showCatName, showPercent, cell):
@@ -264,455 +505,773 @@ def piechart_creation(sheet, shape, variable, min_col, min_row, max_row, max_col
     chart.height = 7 + (num_categories * 0.1)
     sheet.add_chart(chart, cell)
     return chart
+
+# Columns min_col..max_col over time: one line per column, the header row naming them and the dates
+# in column A
+def linechart_creation(sheet, title, y_title, min_col, max_col, header_row, max_row, cell):
+    chart = LineChart()
+    chart.title = title
+    chart.x_axis.title = "Scan Date"
+    chart.y_axis.title = y_title
+    chart.x_axis.number_format = "yyyy-mm-dd"
+    chart.x_axis.delete = False
+    chart.y_axis.delete = False
+    chart.x_axis.title.overlay = False
+    chart.y_axis.title.overlay = False
+    chart.legend.overlay = False
+    chart.title.overlay = False
+
+    data = Reference(sheet, min_col=min_col, min_row=header_row, max_row=max_row, max_col=max_col)
+    cats = Reference(sheet, min_col=1, min_row=header_row + 1, max_row=max_row)
+    chart.add_data(data, titles_from_data=True)
+    chart.set_categories(cats)
+    chart.width = 24
+    chart.height = 8
+    sheet.add_chart(chart, cell)
+    return chart
 ############################
 
-today = datetime.today()
-new_file_name = "dummy_data"
-raw_df = pd.read_excel(f"{new_file_name}_raw.xlsx")
-df = raw_df.copy()
-
-# insert 'scan' column defined based on the value in 'port'
-target_position = df.columns.get_loc('port') + 1
-target_values = np.where(df['port'] != 0, 'Network Scan', 'Agent Scan')
-df.insert(loc=target_position, column='scan', value=target_values)
-
-newfile = f"{new_file_name}.xlsm"
-if os.path.exists(newfile):
-    os.remove(newfile)
-source_file = "./template.xlsm"
-shutil.copy(source_file, newfile)
-severity_thresholds = {"Critical": 60, "High": 60, "Medium": 90, "Low": 90}
-
-# time columns conversion
-df['patch_publication_date'] = pd.to_datetime(df['patch_publication_date'], format = "%d/%m/%Y %H:%M:%S")
-df['first_observed_date'] = pd.to_datetime(df['first_observed_date'], format="%d/%m/%Y %H:%M:%S")
-df['last_observed_date'] = pd.to_datetime(df['last_observed_date'], format="%d/%m/%Y %H:%M:%S")
-df['Days Discovered (Days)'] = (df['last_observed_date'] - df['first_observed_date']).dt.days
-
-# create a new column for today's date
-df['comparison_date'] = pd.to_datetime(today, format="%d/%m/%Y %H:%M:%S")
-
-# create a new column to calculate the difference in days
-for idx, row in df.iterrows():
-    if pd.isnull(row['patch_publication_date']):
-        df.at[idx, "difference"] = (row['comparison_date'] - row['first_observed_date']).days
-    else:
-        df.at[idx, "difference"] = (row['comparison_date'] - row['patch_publication_date']).days
-
-# create a new column to apply the overdue flah (Y or N)
-df["overdue"] = df.apply(
-    lambda row: "Y" if row["difference"] > severity_thresholds[row["severity"]] else "N",
-    axis=1
-)
-
-df = df.drop('comparison_date', axis=1)
-
-overdue_df = df.loc[df['overdue'] == 'Y'].reset_index(drop=True)
-non_overdue_df = df.loc[df['overdue'] == 'N'].reset_index(drop=True)
-
-low_df = df.loc[df['severity']=='Low'].reset_index(drop=True)
-medium_df = df.loc[df['severity']=='Medium'].reset_index(drop=True)
-high_df = df.loc[df['severity']=='High'].reset_index(drop=True)
-critical_df = df.loc[df['severity']=='Critical'].reset_index(drop=True)
-
-# create a column to calculate the number of days overdue/days to overdue
-overdue_df["Days Overdued By (Days)"] = overdue_df['difference'] - overdue_df['severity'].map(severity_thresholds)
-non_overdue_df["Days to Overdue (Days)"] = non_overdue_df['severity'].map(severity_thresholds) - non_overdue_df['difference']
-overdue_df = overdue_df.drop('difference', axis=1)
-non_overdue_df = non_overdue_df.drop('difference', axis=1)
-
-raw_df = raw_df.sort_values(by=["asset_group", "plugin_family"]).reset_index(drop=True)
-asset_group_rows = raw_df.index[raw_df["asset_group"].ne(raw_df["asset_group"].shift())]
-# print(asset_group_rows)
-asset_group_family_rows = raw_df.index[raw_df[["asset_group", "plugin_family"]].ne(raw_df[["asset_group", "plugin_family"]].shift()).any(axis=1)]
-# print(asset_group_family_rows)
-asset_group_dict = {raw_df.loc[idx, "asset_group"]: idx+2 for idx in asset_group_rows} # retrieve the rows that the new asset_group start at in the table for hyperlink later on, +2 because of pandas indexing and header row
-# print(asset_group_dict)
-asset_group_family_dict = {f"{raw_df.loc[idx, 'asset_group']} - {raw_df.loc[idx, 'plugin_family']}": idx+2 for idx in asset_group_family_rows}
-# print(asset_group_family_dict)
-
-# place this new table with additional columns into a new sheet
-sheet_name = "Overdue Vulnerabilities"
-generate_excel(newfile, sheet_name, overdue_df, 1)
-sheet_name = "Non-Overdue Vulnerabilities"
-generate_excel(newfile, sheet_name, non_overdue_df, 1)
-sheet_name = "Original Vulnerabilities"
-generate_excel(newfile, sheet_name, raw_df, 1)
-apply_group_colors(newfile, sheet_name)
-sheet_name = "Low Vulnerabilities"
-generate_excel(newfile, sheet_name, low_df, 1)
-sheet_name = "Medium Vulnerabilities"
-generate_excel(newfile, sheet_name, medium_df, 1)
-sheet_name = "High Vulnerabilities"
-generate_excel(newfile, sheet_name, high_df, 1)
-sheet_name = "Critical Vulnerabilities"
-generate_excel(newfile, sheet_name, critical_df, 1)
-delete_excel_sheet(newfile, "Sheet1")
-
-family_vul, family_vul_rows, family_vul_columns = univariate_table(df, 'plugin_family')
-severity_vul, severity_vul_rows, severity_vul_columns = univariate_table(df, 'severity')
-critical_value = severity_vul.loc[severity_vul['Vulnerabilities by severity'] == 'Critical', 'Total Findings'].iloc[0]
-severity_vul[severity_vul.columns[0]] = severity_vul[severity_vul.columns[0]].apply(lambda x: excel_clickable_cell(x, sheet=f"{x} Vulnerabilities"))
-asset_group_vul, asset_group_vul_rows, asset_group_vul_columns = univariate_table(df, 'asset_group')
-asset_group_vul[asset_group_vul.columns[0]] = asset_group_vul[asset_group_vul.columns[0]].apply(lambda x: excel_clickable_cell(x, sheet="Original Vulnerabilities", cell=f"A{asset_group_dict.get(x, 1)}"))
-overdue_vul, overdue_vul_rows, overdue_vul_columns = univariate_table(df, 'overdue')
-overdue_vul[overdue_vul.columns[0]] = np.where(overdue_vul[overdue_vul.columns[0]] == "Y", overdue_vul[overdue_vul.columns[0]].apply(excel_clickable_cell, sheet="Overdue Vulnerabilities"), overdue_vul[overdue_vul.columns[0]].apply(excel_clickable_cell, sheet="Non-Overdue Vulnerabilities"))
-# barchart_start_column_value = family_vul_columns+2
-# barchart_start_column = get_column_letter(barchart_start_column_value)
-pivot_table_1_wide, pivot_table_1_wide_rows, pivot_table_1_wide_columns = pivot_table_wide(df, "plugin_family", "severity", "plugin_id")
-pivot_table_2_wide, pivot_table_2_wide_rows, pivot_table_2_wide_columns = pivot_table_wide(df, "asset_group", "severity", "plugin_id")
-pivot_table_2_wide['asset_group'] = pivot_table_2_wide['asset_group'].apply(lambda x: excel_clickable_cell(x, sheet="Original Vulnerabilities", cell=f"A{asset_group_dict.get(x, 1)}"))
-pivot_table_3_wide, pivot_table_3_wide_rows, pivot_table_3_wide_columns = pivot_table_wide(df, "overdue", "severity", "plugin_id")
-pivot_table_3_wide['overdue'] = np.where(pivot_table_3_wide['overdue'] == "Y", pivot_table_3_wide['overdue'].apply(excel_clickable_cell, sheet="Overdue Vulnerabilities"), pivot_table_3_wide['overdue'].apply(excel_clickable_cell, sheet="Non-Overdue Vulnerabilities"))
-pivot_table_4_wide, pivot_table_4_wide_rows, pivot_table_4_wide_columns = pivot_table_wide(df, ["asset_group", "plugin_family"], "severity", "plugin_id")
-pivot_table_4_wide['Label'] = pivot_table_4_wide['Label'].apply(lambda x: excel_clickable_cell(x, sheet="Original Vulnerabilities", cell=f"A{asset_group_family_dict.get(x, 1)}"))
-
-sheet_name = "Summary"
-book = load_workbook(newfile, keep_vba=True)
-with excel_writer(newfile) as writer:
-    sheet = sheet_name
+
+##########################
+### Dashboard Pipeline ###
+##########################
+SEVERITY_THRESHOLDS = {"Critical": 60, "High": 60, "Medium": 90, "Low": 90}
+# bump when derive_frame changes what it produces, so old cache entries are not reused
+FRAME_CACHE_VERSION = 2
+BACKENDS = ("pandas", "polars")
+DETAIL_SHEETS = [
+    "Overdue Vulnerabilities",
+    "Non-Overdue Vulnerabilities",
+    "Original Vulnerabilities",
+    "Low Vulnerabilities",
+    "Medium Vulnerabilities",
+    "High Vulnerabilities",
+    "Critical Vulnerabilities",
+]
+
+# Whole-day counts as int32, or nullable Int32 when some are missing; left as they are if not whole
+def day_counts(days):
+    values = days.to_numpy(dtype="float64", na_value=np.nan)
+    present = values[~np.isnan(values)]
+    if not np.array_equal(present, np.floor(present)):
+        return days
+    return days.astype("int32" if len(present) == len(values) else "Int32")
+
+# Y/N as a two-category column: one byte per finding instead of a Python string
+def yes_no(flags):
+    return pd.Categorical.from_codes(np.asarray(flags, dtype="int8"), categories=["N", "Y"])
+
+# Threshold (days) for every finding's severity; KeyError naming any severity without one
+def severity_days(severity, severity_thresholds=SEVERITY_THRESHOLDS):
+    thresholds = severity.map(severity_thresholds).astype("float64")
+    unknown = severity[thresholds.isna()].unique()
+    if len(unknown):
+        raise KeyError(f"No severity threshold for {list(unknown)}")
+    return thresholds
+
+# SLA engine: days since the patch was published (falling back to the first observed date when
+# there is no patch date) against the severity threshold, computed column-wise over the whole frame.
+# overdue is a boolean mask; the day columns are NA outside the rows they describe
+def compute_sla(df, reference_date, severity_thresholds=SEVERITY_THRESHOLDS):
+    thresholds = severity_days(df['severity'], severity_thresholds)
+    start_date = df['patch_publication_date'].fillna(df['first_observed_date'])
+    difference = (pd.Timestamp(reference_date) - start_date).dt.days.astype("float64")
+    return sla_frame(difference, thresholds)
+
+# The SLA columns from the days elapsed and the thresholds (both float64, aligned)
+def sla_frame(difference, thresholds):
+    is_overdue = difference > thresholds
+    sla = pd.DataFrame(index=difference.index)
+    sla["difference"] = day_counts(difference)
+    sla["overdue"] = is_overdue
+    sla["Days Overdued By (Days)"] = day_counts((difference - thresholds).where(is_overdue))
+    sla["Days to Overdue (Days)"] = day_counts((thresholds - difference).where(~is_overdue))
+    return sla
+
+# Working frame with the derived columns (scan, Days Discovered, difference, overdue) and the SLA columns.
+# df shares the raw columns with raw_df (a shallow copy under copy-on-write) rather than duplicating them
+def derive_frame(raw_df, today, severity_thresholds=SEVERITY_THRESHOLDS):
+    df = raw_df.copy(deep=False)
+    # time columns conversion (a no-op for frames that came through read_raw)
+    parse_dates(df)
+    # days since the patch was published (or first observed) and the overdue flag (Y or N)
+    sla = compute_sla(df, today, severity_thresholds)
+    days_discovered = (df['last_observed_date'] - df['first_observed_date']).dt.days
+    return add_derived_columns(df, df['port'] != 0, days_discovered, sla), sla
+
+SCAN_TYPES = ['Agent Scan', 'Network Scan']
+
+# Add the derived columns to df in sheet order: 'scan' (from network_scan, True where the finding came
+# from a network scan) right after 'port', then Days Discovered, difference and overdue at the end
+def add_derived_columns(df, network_scan, days_discovered, sla):
+    target_position = df.columns.get_loc('port') + 1
+    df.insert(loc=target_position, column='scan', value=pd.Categorical.from_codes(np.asarray(network_scan, dtype="int8"), categories=SCAN_TYPES))
+    df['Days Discovered (Days)'] = day_counts(days_discovered)
+    df["difference"] = sla["difference"]
+    df["overdue"] = yes_no(sla["overdue"])
+    return df
+
+# A detail sheet as positions into frames that already exist, so no per-sheet copy is made.
+# columns maps each sheet column, in sheet order, to the frame holding it (frames aligned by
+# position); rows are the positions to write, in order, or None for every row
+def detail_view(columns, rows=None):
+    return {"columns": columns, "rows": rows}
+
+def view_length(view):
+    if view["rows"] is not None:
+        return len(view["rows"])
+    return len(next(iter(view["columns"].values())))
+
+def view_width(view):
+    return len(view["columns"])
+
+# Rows start:stop of a view as a DataFrame; only this slice is ever materialized
+def view_frame(view, start=0, stop=None):
+    positions = slice(start, stop) if view["rows"] is None else view["rows"][start:stop]
+    return pd.DataFrame({col: frame[col].iloc[positions].reset_index(drop=True) for col, frame in view["columns"].items()})
+
+def view_chunks(view, chunk_size=CHUNK_SIZE, start=0):
+    for chunk_start in range(start, view_length(view), chunk_size):
+        yield view_frame(view, chunk_start, chunk_start + chunk_size)
+
+# Column widths of a view, each measured on the whole column of the frame it comes from, so
+# every sheet cut from the same frame shares one measurement per column
+def view_widths(view, width_cache=None):
+    if width_cache is None:
+        width_cache = {}
+    return [cached_column_width(width_cache, frame, col) for col, frame in view["columns"].items()]
+
+# The per-sheet detail views, the group banding rows and the hyperlink row lookups
+def split_frames(raw_df, df, sla):
+    is_overdue = sla["overdue"].to_numpy()
+    overdue_rows = np.flatnonzero(is_overdue)
+    non_overdue_rows = np.flatnonzero(~is_overdue)
+    severity = df['severity']
+
+    # the overdue sheets drop difference for their own day count column, which comes from sla
+    shared_columns = {col: df for col in df.columns if col != 'difference'}
+    views = {
+        "Overdue Vulnerabilities": detail_view({**shared_columns, "Days Overdued By (Days)": sla}, overdue_rows),
+        "Non-Overdue Vulnerabilities": detail_view({**shared_columns, "Days to Overdue (Days)": sla}, non_overdue_rows),
+    }
+
+    # Original is raw_df sorted by asset group and family; columns derive_frame left alone are read from df,
+    # which holds the same data, so their widths are measured once for all sheets
+    keys = raw_df[["asset_group", "plugin_family"]].reset_index(drop=True).sort_values(by=["asset_group", "plugin_family"])
+    original_rows = keys.index.to_numpy()
+    keys = keys.reset_index(drop=True)
+    views["Original Vulnerabilities"] = detail_view(
+        {col: df if df[col].dtype == raw_df[col].dtype else raw_df for col in raw_df.columns}, original_rows
+    )
+    # rows each asset group (and asset group - family) starts at in Original, for the hyperlinks
+    asset_group_links = link_index(keys, ["asset_group"])
+    asset_group_family_links = link_index(keys, ["asset_group", "plugin_family"])
+
+    group_start_rows = np.flatnonzero(group_starts(keys["asset_group"])) + 2
+
+    all_columns = {col: df for col in df.columns}
+    for level in ["Low", "Medium", "High", "Critical"]:
+        views[f"{level} Vulnerabilities"] = detail_view(all_columns, np.flatnonzero((severity == level).to_numpy()))
+
+    detail_frames = {sheet_name: views[sheet_name] for sheet_name in DETAIL_SHEETS}
+    return detail_frames, group_start_rows, asset_group_links, asset_group_family_links
+
+# Compact dashboards write every finding once, in the Findings table: all of df's columns and both SLA day
+# counts, in Original's order. The overdue and severity sheets become index sheets listing, for each of
+# their findings, a link to its row of Findings
+FINDINGS = "Findings"
+FINDINGS_ROW = "Findings Row"
+INDEX_SHEETS = [sheet_name for sheet_name in DETAIL_SHEETS if sheet_name != "Original Vulnerabilities"]
+
+# The Findings view and the index views, from the detail views of split_frames. width_cache gets the index
+# column's width, measured on the row numbers it shows rather than on the link formulas
+def compact_frames(df, sla, detail_frames, width_cache):
+    original_rows = detail_frames["Original Vulnerabilities"]["rows"]
+    views = {FINDINGS: detail_view({**{col: df for col in df.columns}, "Days Overdued By (Days)": sla, "Days to Overdue (Days)": sla}, original_rows)}
+    finding_rows = np.empty(len(df), dtype="int64")
+    finding_rows[original_rows] = np.arange(2, len(df) + 2)
+    rows = pd.Series(finding_rows, name=FINDINGS_ROW)
+    links = pd.DataFrame({FINDINGS_ROW: hyperlink_formulas(rows, FINDINGS, rows)})
+    width_cache[width_key(links, FINDINGS_ROW)] = (links, column_width(rows))
+    for sheet_name in INDEX_SHEETS:
+        views[sheet_name] = detail_view({FINDINGS_ROW: links}, detail_frames[sheet_name]["rows"])
+    return views
+
+def prepare_frames(raw_df, today, severity_thresholds=SEVERITY_THRESHOLDS):
+    df, sla = derive_frame(raw_df, today, severity_thresholds)
+    return (df, *split_frames(raw_df, df, sla))
+
+# Read and derive a raw export through the on-disk frame cache, keyed by the file's content,
+# the thresholds and the comparison instant (today). refresh=True forces the entry to be rebuilt.
+# backend="polars" reads and derives as one lazy polars plan (see lazy_backend); both backends give the
+# same frames, so they share cache entries
+def load_frames(path, today, severity_thresholds=SEVERITY_THRESHOLDS, fmt=None, cache_dir=DEFAULT_CACHE_DIR, refresh=False, backend="pandas"):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}; expected one of {BACKENDS}")
+    def compute():
+        if backend == "polars":
+            from lazy_backend import read_and_derive
+            with stage("read and derive") as record:
+                raw_df, df, sla = read_and_derive(path, today, severity_thresholds, fmt)
+                record["rows"] = len(raw_df)
+            return list(raw_df.columns), df, sla
+        with stage("read") as record:
+            raw_df = read_raw(path, fmt)
+            record["rows"] = len(raw_df)
+        with stage("derive", rows=len(raw_df)):
+            return (list(raw_df.columns), *derive_frame(raw_df, today, severity_thresholds))
+    with stage("load") as record:
+        key = cache_key(path, fmt=fmt, today=pd.Timestamp(today).isoformat(), severity_thresholds=severity_thresholds, version=FRAME_CACHE_VERSION)
+        # the raw columns are stored once, inside df, and raw_df is rebuilt as a selection of them
+        raw_columns, df, sla = load_or_compute(key, compute, cache_dir, refresh=refresh)
+        record["rows"] = len(df)
+    return df[raw_columns], df, sla
+
+# Detail sheet an overdue flag links to
+def overdue_sheets(flags):
+    return np.where(flags == "Y", "Overdue Vulnerabilities", "Non-Overdue Vulnerabilities")
+
+# Summary (univariate) and pivot tables, with the first column turned into sheet links.
+# cube: the aggregation cube of df, when it was built some other way (df is then not read).
+# pivots=False leaves out the pivot tables, for dashboards whose pivot sheets are native pivot tables.
+# link_sheet: the sheet the asset group links point into, Original or (compact dashboards) Findings.
+# sketch: the sketch of the findings, for approximate Summary tables, plus a table of distinct plugin ids per asset group
+def build_tables(df, asset_group_links, asset_group_family_links, cube=None, pivots=True, link_sheet="Original Vulnerabilities", sketch=None):
+    # every table below is a roll-up of this one pass over df
+    if cube is None:
+        cube = aggregate_cube(df)
+    tables = {}
+    tables["family_vul"] = univariate_table(df, 'plugin_family', cube=cube, sketch=sketch)
+    tables["severity_vul"] = univariate_table(df, 'severity', cube=cube, sketch=sketch)
+    severity_vul = tables["severity_vul"][0]
+    critical_value = severity_vul.loc[severity_vul['severity'] == 'Critical', 'count'].sum()
+    severity = severity_vul[severity_vul.columns[0]]
+    severity_vul[severity_vul.columns[0]] = hyperlink_formulas(severity, severity.astype(str) + " Vulnerabilities")
+    tables["asset_group_vul"] = univariate_table(df, 'asset_group', cube=cube, sketch=sketch)
+    asset_group_vul = tables["asset_group_vul"][0]
+    asset_group = asset_group_vul[asset_group_vul.columns[0]]
+    if sketch is not None:
+        distinct_vul = distinct_table(sketch, [group for group in asset_group if group != "Misc"])
+        tables["distinct_vul"] = (distinct_vul, *distinct_vul.shape)
+    asset_group_vul[asset_group_vul.columns[0]] = hyperlink_formulas(asset_group, link_sheet, link_rows(asset_group_links, asset_group))
+    tables["overdue_vul"] = univariate_table(df, 'overdue', cube=cube, sketch=sketch)
+    overdue_vul = tables["overdue_vul"][0]
+    overdue_vul[overdue_vul.columns[0]] = hyperlink_formulas(overdue_vul[overdue_vul.columns[0]], overdue_sheets(overdue_vul[overdue_vul.columns[0]]))
+    if not pivots:
+        return tables, critical_value
+
+    tables["pivot_table_1_wide"] = pivot_table_wide(df, "plugin_family", "severity", "plugin_id", cube=cube)
+    tables["pivot_table_2_wide"] = pivot_table_wide(df, "asset_group", "severity", "plugin_id", cube=cube)
+    pivot_table_2_wide = tables["pivot_table_2_wide"][0]
+    pivot_table_2_wide['asset_group'] = hyperlink_formulas(pivot_table_2_wide['asset_group'], link_sheet, link_rows(asset_group_links, pivot_table_2_wide['asset_group']))
+    tables["pivot_table_3_wide"] = pivot_table_wide(df, "overdue", "severity", "plugin_id", cube=cube)
+    pivot_table_3_wide = tables["pivot_table_3_wide"][0]
+    pivot_table_3_wide['overdue'] = hyperlink_formulas(pivot_table_3_wide['overdue'], overdue_sheets(pivot_table_3_wide['overdue']))
+    tables["pivot_table_4_wide"] = pivot_table_wide(df, ["asset_group", "plugin_family"], "severity", "plugin_id", cube=cube)
+    pivot_table_4_wide = tables["pivot_table_4_wide"][0]
+    pivot_table_4_wide['Label'] = hyperlink_formulas(pivot_table_4_wide['Label'], link_sheet, link_rows(asset_group_family_links, pivot_table_4_wide['Label']))
+    return tables, critical_value
+
+# The Summary's big numbers (findings, overdue, non-overdue, critical) as a sketch of the findings estimates them;
+# critical_value is the Critical count of the Summary's severity table, already estimated from it
+def sketch_headline(sketch, critical_value):
+    overdue = sketch_counts(sketch, "overdue")
+    return (sketch["rows"], int(overdue.get("Y", 0)), int(overdue.get("N", 0)), critical_value)
+
+# A detail view written chunk by chunk, so at most one chunk of the sheet exists as a DataFrame at a time
+def write_detail_sheet(writer, sheet_name, view, group_start_rows=None, width_cache=None):
+    for start in range(0, max(view_length(view), 1), CHUNK_SIZE):
+        chunk = view_frame(view, start, start + CHUNK_SIZE)
+        ws = write_frame(writer, chunk, sheet_name, startrow=start + 1 if start else 0, header=start == 0)
+    last_col = view_width(view)
+    ws.auto_filter.ref = f"A1:{get_column_letter(last_col)}{ws.max_row}"
+    with stage("styling"):
+        for i, width in enumerate(view_widths(view, width_cache), start=1):
+            ws.column_dimensions[get_column_letter(i)].width = width
+    if group_start_rows is not None:
+        band_groups(ws, group_start_rows, view_length(view) + 1, last_col)
+
+# Header and first data row only; the remaining rows are streamed into the saved package by
+# stream_detail_sheets, so the full detail sheet never exists as openpyxl cells
+def write_detail_stub(writer, sheet_name, view, group_start_rows=None, width_cache=None):
+    write_stub(writer, sheet_name, view_frame(view, 0, 1), view_length(view), view_widths(view, width_cache), group_start_rows)
+
+# The stub of an n_rows detail sheet from its first row (first_rows: the header and at most one row)
+# and its column widths
+def write_stub(writer, sheet_name, first_rows, n_rows, widths, group_start_rows=None):
+    ws = write_frame(writer, first_rows, sheet_name)
+    last_row = n_rows + 1
+    last_col = first_rows.shape[1]
+    ws.auto_filter.ref = f"A1:{get_column_letter(last_col)}{last_row}"
+    with stage("styling"):
+        for i, width in enumerate(widths, start=1):
+            ws.column_dimensions[get_column_letter(i)].width = width
+    if group_start_rows is not None:
+        band_groups(ws, group_start_rows, last_row, last_col)
+
+def write_summary_sheet(writer, tables, headline_values):
+    overdue_vul, overdue_vul_rows, overdue_vul_columns = tables["overdue_vul"]
+    severity_vul, severity_vul_rows, severity_vul_columns = tables["severity_vul"]
+    asset_group_vul, asset_group_vul_rows, asset_group_vul_columns = tables["asset_group_vul"]
+    family_vul, family_vul_rows, family_vul_columns = tables["family_vul"]
+
+    sheet_name = "Summary"
     new_row = 3
-    overdue_vul.to_excel(writer, sheet_name=sheet, startrow=new_row, startcol=0, index=False)
-    ws = writer.sheets[sheet]
+    ws = write_frame(writer, overdue_vul, sheet_name, startrow=new_row, startcol=0)
     header_row = new_row+1
     first_data_row = header_row+1
     last_data_row = header_row+overdue_vul_rows
     hyperlink_cell(ws, first_data_row, last_data_row)
     new_row = new_row + overdue_vul_rows + 2
-    severity_vul.to_excel(writer, sheet_name=sheet, startrow=new_row, startcol=0, index=False)
+    write_frame(writer, severity_vul, sheet_name, startrow=new_row, startcol=0)
     header_row = new_row+1
     first_data_row = header_row+1
     last_data_row = header_row+severity_vul_rows
     hyperlink_cell(ws, first_data_row, last_data_row)
     new_row = new_row + severity_vul_rows + 2
-    asset_group_vul.to_excel(writer, sheet_name=sheet, startrow=new_row, startcol=0, index=False)
+    write_frame(writer, asset_group_vul, sheet_name, startrow=new_row, startcol=0)
     header_row = new_row+1
     first_data_row = header_row+1
     last_data_row = header_row+asset_group_vul_rows
     hyperlink_cell(ws, first_data_row, last_data_row)
     new_row = new_row + asset_group_vul_rows + 2
-    family_vul.to_excel(writer, sheet_name=sheet, startrow=new_row, startcol=0, index=False)
+    write_frame(writer, family_vul, sheet_name, startrow=new_row, startcol=0)
 
     wb = writer.book
-    ws = wb[sheet]
-    autosize_df_columns(ws, family_vul)
-    wb.move_sheet(ws, offset=-wb.sheetnames.index(sheet))
-
-wb = load_workbook(newfile, keep_vba=True)
-sheet = wb[sheet_name]
-
-charts_length = []
-
-min_row_table = 4
-max_row_table = min_row_table + overdue_vul_rows
-overdue_vul_chart = batch_barchart(
-    sheet=sheet,
-    batch_size=5,
-    chartType="col",
-    variable="Overdue",
-    x_title="Overdue",
-    y_title="Count",
-    min_col=2,
-    max_col=overdue_vul_columns,
-    min_row=min_row_table,
-    max_row=max_row_table,
-    showVal=True,
-    showSerName=False,
-    showCatName=False,
-    showLeaderLines=False,
-    cell="D4",
-    chartStyle=10,
-    shape=4
-)
-overdue_vul_piechart = piechart_creation(sheet, 4, "Overdue", 2, min_row_table, max_row_table, overdue_vul_columns, False, False, False, True, "N4")
-# charts_length.append(barchart_start_column_value + round(overdue_vul_chart.width / 1.7)+1+round(overdue_vul_piechart.width / 1.7))
-min_row_table = min_row_table + overdue_vul_rows + 2
-max_row_table = max_row_table + 2 + severity_vul_rows
-severity_vul_chart = batch_barchart(
-    sheet=sheet,
-    batch_size=5,
-    chartType="col",
-    variable="Severity",
-    x_title="Severity",
-    y_title="Count",
-    min_col=2,
-    max_col=severity_vul_columns,
-    min_row=min_row_table,
-    max_row=max_row_table,
-    showVal=True,
-    showSerName=False,
-    showCatName=False,
-    showLeaderLines=False,
-    cell="D21",
-    chartStyle=10,
-    shape=4
-)
-severity_vul_piechart = piechart_creation(sheet, 4, "Severity", 2, min_row_table, max_row_table, severity_vul_columns, False, False, False, True, "N21")
-# charts_length.append(barchart_start_column_value + round(severity_vul_chart.width / 1.7)+1+round(severity_vul_piechart.width / 1.7))
-min_row_table = min_row_table + severity_vul_rows + 2
-max_row_table = max_row_table + 2 + asset_group_vul_rows
-asset_group_vul_chart = batch_barchart(
-    sheet=sheet,
-    batch_size=6,
-    chartType="col",
-    variable="Asset Group",
-    x_title="Asset Group",
-    y_title="Count",
-    min_col=2,
-    max_col=asset_group_vul_columns,
-    min_row=min_row_table,
-    max_row=max_row_table,
-    showVal=True,
-    showSerName=False,
-    showCatName=False,
-    showLeaderLines=False,
-    cell="D38",
-    chartStyle=10,
-    shape=4
-)
-asset_group_vul_piechart = piechart_creation(sheet, 4, "Asset Group", 2, min_row_table, max_row_table, asset_group_vul_columns, False, False, False, True, "N38")
-# charts_length.append(barchart_start_column_value + round(asset_group_vul_chart.width / 1.7)+1+round(asset_group_vul_piechart.width / 1.7))
-min_row_table = min_row_table + asset_group_vul_rows + 2
-max_row_table = max_row_table + 2 + family_vul_rows
-family_vul_chart = batch_barchart(
-    sheet=sheet,
-    batch_size=6,
-    chartType="col",
-    variable="Family",
-    x_title="Family",
-    y_title="Count",
-    min_col=2,
-    max_col=family_vul_columns,
-    min_row=min_row_table,
-    max_row=max_row_table,
-    showVal=True,
-    showSerName=False,
-    showCatName=False,
-    showLeaderLines=False,
-    cell="D55",
-    chartStyle=10,
-    shape=4
-)
-family_vul_piechart = piechart_creation(sheet, 4, "Family", 2, min_row_table, max_row_table, family_vul_columns, False, False, False, True, "N55")
-# charts_length.append(barchart_start_column_value + round(family_vul_chart.width / 1.7)+1+round(family_vul_piechart.width / 1.7))
-
-thin = Side(style="thin", color="000000")
-no_border = Side(style=None)
-title_border = Border(left=thin, right=no_border, top=thin, bottom=no_border)
-status_border = Border(left=no_border, right=no_border, top=thin, bottom=no_border)
-closing_border = Border(left=no_border, right=thin, top=thin, bottom=no_border)
-
-merge_cells_title(sheet, "A1", "B2", 1, column_index_from_string("A"), "Summary Table", "center", "center")
-merge_cells_title(sheet, "D1", "O2", 1, column_index_from_string("D"), "Summary Table Charts", "center", "center")
-merge_cells_title(sheet, "D6", "F8", 6, column_index_from_string("D"), len(df), "center", "center", color="FFFFFF", font_size=20, bold=True)
-merge_cells_title(sheet, "G6", "I8", 6, column_index_from_string("G"), len(overdue_df), "center", "center", color="FFFFFF", font_size=20, bold=True)
-merge_cells_title(sheet, "J6", "L8", 6, column_index_from_string("J"), len(non_overdue_df), "center", "center", color="FFFFFF", font_size=20, bold=True)
-merge_cells_title(sheet, "M6", "O8", 6, column_index_from_string("M"), critical_value, "center", "center", color="FFFFFF", font_size=20, bold=True)
-merge_cells_title(sheet, "A36", "B37", 36, column_index_from_string("A"), "Click here to see all variables", "center", "center", "FFCCCC")
-
-sheet.sheet_view.showGridLines = False
-
-wb.save(newfile)
-
-sheet_name = "Plugin Family"
-book = load_workbook(newfile, keep_vba=True)
-with excel_writer(newfile) as writer:
-    sheet = sheet_name
-    new_row = 3
-    pivot_table_1_wide.to_excel(writer, sheet_name=sheet, startrow=new_row, startcol=0, index=False)
-    ws = writer.sheets[sheet]
-
-    header_row = new_row+1
-    first_data_row = header_row+1
-    last_data_row = ws.max_row
-    start_col = 1
-    last_col = pivot_table_1_wide_columns
-
-    ws.auto_filter.ref = f"{get_column_letter(start_col)}{header_row}:{get_column_letter(last_col)}{last_data_row}"
-
-    wb = writer.book
-    ws = wb[sheet]
-    autosize_df_columns(ws, pivot_table_1_wide)
-
-wb = load_workbook(newfile, keep_vba=True)
-sheet = wb[sheet_name]
-
-min_row_table = 4
-max_row_table = min_row_table + pivot_table_1_wide_rows
-pivot_table_1_wide_chart = batch_barchart(
-    sheet=sheet,
-    batch_size=5,
-    chartType="col",
-    variable="Severity and Plugin Family",
-    x_title="Family",
-    y_title="Count",
-    min_col=2,
-    max_col=pivot_table_1_wide_columns,
-    min_row=min_row_table,
-    max_row=max_row_table,
-    showVal=True,
-    showSerName=False,
-    showCatName=False,
-    showLeaderLines=False,
-    cell=f"{get_column_letter(pivot_table_1_wide_columns+3)}4",
-    chartGrouping="percentStacked",
-    chartOverlap=100
-)
-
-merge_cells_title(sheet, "A1", f"{get_column_letter(pivot_table_1_wide_columns)}2", 1, 1, f"{sheet_name} Table - Breakdown by Severity", "center", "center", "00FFFF00")
-# merge_cells_title(sheet, f"{get_column_letter(pivot_table_1_wide_columns+3)}1", f"{get_column_letter(pivot_table_1_wide_columns+3+round(pivot_table_1_wide_chart.width / 1.7))}2", 1, pivot_table_1_wide_columns+3, "Summary Table Charts", "center", "center", '0000FF00')
-
-wb.save(newfile)
-
-sheet_name = "Asset Group"
-book = load_workbook(newfile, keep_vba=True)
-with excel_writer(newfile) as writer:
-    sheet = sheet_name
+    sheet = wb[sheet_name]
+    autosize_df_columns(sheet, family_vul)
+    wb.move_sheet(sheet, offset=-wb.sheetnames.index(sheet_name))
+
+    summary_charts = [
+        ("Overdue", overdue_vul_rows, overdue_vul_columns, 5, 4),
+        ("Severity", severity_vul_rows, severity_vul_columns, 5, 21),
+        ("Asset Group", asset_group_vul_rows, asset_group_vul_columns, 6, 38),
+        ("Family", family_vul_rows, family_vul_columns, 6, 55),
+    ]
+    min_row_table = 4
+    with stage("charts"):
+        for variable, table_rows, table_columns, batch_size, anchor_row in summary_charts:
+            max_row_table = min_row_table + table_rows
+            batch_barchart(
+                sheet=sheet,
+                batch_size=batch_size,
+                chartType="col",
+                variable=variable,
+                x_title=variable,
+                y_title="Count",
+                min_col=2,
+                max_col=table_columns,
+                min_row=min_row_table,
+                max_row=max_row_table,
+                showVal=True,
+                showSerName=False,
+                showCatName=False,
+                showLeaderLines=False,
+                cell=f"D{anchor_row}",
+                chartStyle=10,
+                shape=4
+            )
+            piechart_creation(sheet, 4, variable, 2, min_row_table, max_row_table, table_columns, False, False, False, True, f"N{anchor_row}")
+            min_row_table = max_row_table + 2
+
+    total_value, overdue_value, non_overdue_value, critical_value = headline_values
+    merge_cells_title(sheet, "A1", "B2", 1, column_index_from_string("A"), "Summary Table", "center", "center")
+    merge_cells_title(sheet, "D1", "O2", 1, column_index_from_string("D"), "Summary Table Charts", "center", "center")
+    merge_cells_title(sheet, "D6", "F8", 6, column_index_from_string("D"), total_value, "center", "center", color="FFFFFF", font_size=20, bold=True)
+    merge_cells_title(sheet, "G6", "I8", 6, column_index_from_string("G"), overdue_value, "center", "center", color="FFFFFF", font_size=20, bold=True)
+    merge_cells_title(sheet, "J6", "L8", 6, column_index_from_string("J"), non_overdue_value, "center", "center", color="FFFFFF", font_size=20, bold=True)
+    merge_cells_title(sheet, "M6", "O8", 6, column_index_from_string("M"), critical_value, "center", "center", color="FFFFFF", font_size=20, bold=True)
+    merge_cells_title(sheet, "A36", "B37", 36, column_index_from_string("A"), "Click here to see all variables", "center", "center", "FFCCCC")
+    if "distinct_vul" in tables:
+        # approximate dashboards: distinct plugin ids per asset group, below the tables
+        write_frame(writer, tables["distinct_vul"][0], sheet_name, startrow=38, startcol=0)
+
+    sheet.sheet_view.showGridLines = False
+
+# sheet name, table key, chart variable, x axis title, hyperlink column, first chart data column, "Summary Table Charts" banner
+PIVOT_SHEETS = [
+    ("Plugin Family", "pivot_table_1_wide", "Severity and Plugin Family", "Family", None, 2, False),
+    ("Asset Group", "pivot_table_2_wide", "Severity and Asset Group", "Asset Group", 1, 2, True),
+    ("Overdue", "pivot_table_3_wide", "Overdue and Plugin Family", "Overdue", 1, 2, False),
+    ("Asset Grp & Family", "pivot_table_4_wide", "Asset Group, Plugin Family and Severity", "Asset Group - Plugin Family", 3, 4, False),
+]
+
+def write_pivot_sheet(writer, sheet_name, table, variable, x_title, hyperlink_column=None, chart_min_col=2, charts_banner=False, max_charts=MAX_CHARTS):
+    pivot_df, pivot_rows, pivot_columns = table
     new_row = 3
-    pivot_table_2_wide.to_excel(writer, sheet_name=sheet, startrow=new_row, startcol=0, index=False)
-    ws = writer.sheets[sheet]
+    sheet = write_frame(writer, pivot_df, sheet_name, startrow=new_row, startcol=0)
 
     header_row = new_row+1
     first_data_row = header_row+1
-    last_data_row = ws.max_row
+    last_data_row = sheet.max_row
     start_col = 1
-    last_col = pivot_table_2_wide_columns
-
-    ws.auto_filter.ref = f"{get_column_letter(start_col)}{header_row}:{get_column_letter(last_col)}{last_data_row}"
-    hyperlink_cell(ws, first_data_row, last_data_row)
-
-    wb = writer.book
-    ws = wb[sheet]
-    autosize_df_columns(ws, pivot_table_2_wide)
-
-wb = load_workbook(newfile, keep_vba=True)
-sheet = wb[sheet_name]
-
-min_row_table = 4
-max_row_table = min_row_table + pivot_table_2_wide_rows
-pivot_table_2_wide_chart = batch_barchart(
-    sheet=sheet,
-    batch_size=5,
-    chartType="col",
-    variable="Severity and Asset Group",
-    x_title="Asset Group",
-    y_title="Count",
-    min_col=2,
-    max_col=pivot_table_2_wide_columns,
-    min_row=min_row_table,
-    max_row=max_row_table,
-    showVal=True,
-    showSerName=False,
-    showCatName=False,
-    showLeaderLines=False,
-    cell=f"{get_column_letter(pivot_table_2_wide_columns+3)}4",
-    chartGrouping="percentStacked",
-    chartOverlap=100
-)
-
-merge_cells_title(sheet, "A1", f"{get_column_letter(pivot_table_2_wide_columns)}2", 1, 1, f"{sheet_name} Table - Breakdown by Severity", "center", "center", "00FFFF00")
-merge_cells_title(sheet, f"{get_column_letter(pivot_table_2_wide_columns+3)}1", "O2", 1, pivot_table_2_wide_columns+3, "Summary Table Charts", "center", "center", '0000FF00')
-
-wb.save(newfile)
-
-sheet_name = "Overdue"
-book = load_workbook(newfile, keep_vba=True)
-with excel_writer(newfile) as writer:
-    sheet = sheet_name
-    new_row = 3
-    pivot_table_3_wide.to_excel(writer, sheet_name=sheet, startrow=new_row, startcol=0, index=False)
-    ws = writer.sheets[sheet]
+    last_col = pivot_columns
 
-    header_row = new_row+1
-    first_data_row = header_row+1
-    last_data_row = ws.max_row
-    start_col = 1
-    last_col = pivot_table_3_wide_columns
+    sheet.auto_filter.ref = f"{get_column_letter(start_col)}{header_row}:{get_column_letter(last_col)}{last_data_row}"
+    if hyperlink_column is not None:
+        hyperlink_cell(sheet, first_data_row, last_data_row, column_no=hyperlink_column)
+    autosize_df_columns(sheet, pivot_df)
 
-    ws.auto_filter.ref = f"{get_column_letter(start_col)}{header_row}:{get_column_letter(last_col)}{last_data_row}"
-    hyperlink_cell(ws, first_data_row, last_data_row)
+    min_row_table = 4
+    max_row_table = min_row_table + pivot_rows
+    with stage("charts"):
+        batch_barchart(
+            sheet=sheet,
+            batch_size=5,
+            max_charts=max_charts,
+            chartType="col",
+            variable=variable,
+            x_title=x_title,
+            y_title="Count",
+            min_col=chart_min_col,
+            max_col=pivot_columns,
+            min_row=min_row_table,
+            max_row=max_row_table,
+            showVal=True,
+            showSerName=False,
+            showCatName=False,
+            showLeaderLines=False,
+            cell=f"{get_column_letter(pivot_columns+3)}4",
+            chartGrouping="percentStacked",
+            chartOverlap=100
+        )
 
-    wb = writer.book
-    ws = wb[sheet]
-    autosize_df_columns(ws, pivot_table_3_wide)
-
-wb = load_workbook(newfile, keep_vba=True)
-sheet = wb[sheet_name]
-
-min_row_table = 4
-max_row_table = min_row_table + pivot_table_3_wide_rows
-pivot_table_3_wide_chart = batch_barchart(
-    sheet=sheet,
-    batch_size=5,
-    chartType="col",
-    variable="Overdue and Plugin Family",
-    x_title="Overdue",
-    y_title="Count",
-    min_col=2,
-    max_col=pivot_table_3_wide_columns,
-    min_row=min_row_table,
-    max_row=max_row_table,
-    showVal=True,
-    showSerName=False,
-    showCatName=False,
-    showLeaderLines=False,
-    cell=f"{get_column_letter(pivot_table_3_wide_columns+3)}4",
-    chartGrouping="percentStacked",
-    chartOverlap=100
-)
-
-merge_cells_title(sheet, "A1", f"{get_column_letter(pivot_table_3_wide_columns)}2", 1, 1, f"{sheet_name} Table - Breakdown by Severity", "center", "center", "00FFFF00")
-# merge_cells_title(sheet, f"{get_column_letter(pivot_table_3_wide_columns+3)}1", f"{get_column_letter(pivot_table_3_wide_columns+3+round(pivot_table_3_wide_chart.width / 1.7))}2", 1, pivot_table_3_wide_columns+3, "Summary Table Charts", "center", "center", '0000FF00')
-
-wb.save(newfile)
-
-sheet_name = "Asset Grp & Family"
-book = load_workbook(newfile, keep_vba=True)
-with excel_writer(newfile) as writer:
-    sheet = sheet_name
+    merge_cells_title(sheet, "A1", f"{get_column_letter(pivot_columns)}2", 1, 1, f"{sheet_name} Table - Breakdown by Severity", "center", "center", "00FFFF00")
+    if charts_banner:
+        merge_cells_title(sheet, f"{get_column_letter(pivot_columns+3)}1", "O2", 1, pivot_columns+3, "Summary Table Charts", "center", "center", '0000FF00')
+
+# Native pivot tables in place of the static ones: the same sheets, each a PivotTable over one shared pivot
+# cache, with its row fields (columns are always the severities, Critical to Low). Hidden, the Pivot Data
+# sheet holds the findings the cache reads, written once for every pivot table
+PIVOT_DATA = "Pivot Data"
+NATIVE_PIVOT_SHEETS = [
+    ("Plugin Family", ["plugin_family"]),
+    ("Asset Group", ["asset_group"]),
+    ("Overdue", ["overdue"]),
+    ("Asset Grp & Family", ["asset_group", "plugin_family"]),
+]
+
+# The Pivot Data sheet's columns, cut from df
+def pivot_data_view(df):
+    return detail_view({field: df for field in PIVOT_FIELDS})
+
+# The pivot cache over the n_rows findings of a sheet with columns (the Pivot Data sheet unless given),
+# the distinct values of its fields, which the pivot tables list, and the rows each native pivot sheet's
+# table shows, all from the aggregation cube
+def native_pivot_cache(cube, n_rows, sheet_name=PIVOT_DATA, columns=PIVOT_FIELDS):
+    values = shared_values(cube)
+    table_rows = {pivot_sheet: row_count(cube, row_fields) for pivot_sheet, row_fields in NATIVE_PIVOT_SHEETS}
+    return pivot_cache(sheet_name, columns, n_rows, values), values, table_rows
+
+# A native pivot sheet: the title banner and the pivot table below it. Excel fills the table in when the
+# workbook opens, so the row field columns are sized here from the values they will show
+def write_native_pivot_sheet(writer, sheet_name, cache, values, row_fields, n_rows):
+    sheet = writer.book.create_sheet(sheet_name)
+    pivot = pivot_table_definition(f"{sheet_name} Pivot", cache, row_fields, n_rows, cell="A4")
+    sheet.add_pivot(pivot)
+    for i, field in enumerate(row_fields, start=1):
+        sheet.column_dimensions[get_column_letter(i)].width = max([len(field)] + [len(value) for value in values[field][0]]) + 2
+    last_col = len(row_fields) + max(len(values["severity"][0]), 1)
+    merge_cells_title(sheet, "A1", f"{get_column_letter(last_col)}2", 1, 1, f"{sheet_name} Table - Breakdown by Severity", "center", "center", "00FFFF00")
+
+# The Findings sheet, written with step, as an Excel Table over its n_rows findings; the table's own filter
+# replaces the sheet's autofilter. The table columns are named here, from columns, so openpyxl doesn't read
+# them off the sheet (a streamed sheet only holds its first row when it is saved)
+FINDINGS_TABLE_STYLE = "TableStyleLight1"
+
+def write_findings_table(writer, step, columns, n_rows):
+    step(writer)
+    ws = writer.book[FINDINGS]
+    ws.auto_filter.ref = None
+    ref = f"A1:{get_column_letter(len(columns))}{max(n_rows, 1) + 1}"
+    table = Table(displayName=FINDINGS, ref=ref, autoFilter=AutoFilter(ref=ref),
+                  tableStyleInfo=TableStyleInfo(name=FINDINGS_TABLE_STYLE, showRowStripes=False))
+    table.tableColumns = [TableColumn(id=i, name=str(col)) for i, col in enumerate(columns, start=1)]
+    ws.add_table(table)
+
+# Write a sheet with step, then hide it
+def write_hidden(writer, sheet_name, step):
+    step(writer)
+    writer.book[sheet_name].sheet_state = "hidden"
+
+# SLA over time from the history store: findings, overdue and overdue per severity for every recorded scan
+# of the last days, charted as lines
+def write_trends_sheet(writer, trend, days=DEFAULT_HISTORY_DAYS):
+    sheet_name = "Trends"
     new_row = 3
-    pivot_table_4_wide.to_excel(writer, sheet_name=sheet, startrow=new_row, startcol=0, index=False)
-    ws = writer.sheets[sheet]
+    sheet = write_frame(writer, trend, sheet_name, startrow=new_row, startcol=0)
 
     header_row = new_row+1
-    first_data_row = header_row+1
-    last_data_row = ws.max_row
-    start_col = 1
-    last_col = pivot_table_4_wide_columns
-
-    ws.auto_filter.ref = f"{get_column_letter(start_col)}{header_row}:{get_column_letter(last_col)}{last_data_row}"
-    hyperlink_cell(ws, first_data_row, last_data_row, column_no=3)
-
-    wb = writer.book
-    ws = wb[sheet]
-    autosize_df_columns(ws, pivot_table_4_wide)
-
-wb = load_workbook(newfile, keep_vba=True)
-sheet = wb[sheet_name]
-
-min_row_table = 4
-max_row_table = min_row_table + pivot_table_4_wide_rows
-pivot_table_4_wide_chart = batch_barchart(
-    sheet=sheet,
-    batch_size=5,
-    chartType="col",
-    variable="Asset Group, Plugin Family and Severity",
-    x_title="Asset Group - Plugin Family",
-    y_title="Count",
-    min_col=4,
-    max_col=pivot_table_4_wide_columns,
-    min_row=min_row_table,
-    max_row=max_row_table,
-    showVal=True,
-    showSerName=False,
-    showCatName=False,
-    showLeaderLines=False,
-    cell=f"{get_column_letter(pivot_table_4_wide_columns+3)}4",
-    chartGrouping="percentStacked",
-    chartOverlap=100
-)
-
-merge_cells_title(sheet, "A1", f"{get_column_letter(pivot_table_4_wide_columns)}2", 1, 1, f"{sheet_name} Table - Breakdown by Severity", "center", "center", "00FFFF00")
-# merge_cells_title(sheet, f"{get_column_letter(pivot_table_4_wide_columns+3)}1", f"{get_column_letter(pivot_table_4_wide_columns+3+round(pivot_table_4_wide_chart.width / 1.7))}2", 1, pivot_table_4_wide_columns+3, "Summary Table Charts", "center", "center", '0000FF00')
-
-wb.save(newfile)
\ No newline at end of file
+    last_data_row = header_row+len(trend)
+    last_col = trend.shape[1]
+    sheet.auto_filter.ref = f"A{header_row}:{get_column_letter(last_col)}{last_data_row}"
+    for row in range(header_row+1, last_data_row+1):
+        sheet.cell(row=row, column=1).number_format = "yyyy-mm-dd"
+    autosize_df_columns(sheet, trend)
+
+    chart_col = get_column_letter(last_col+2)
+    with stage("charts"):
+        linechart_creation(sheet, "Findings and Overdue", "Count", 2, 3, header_row, last_data_row, f"{chart_col}4")
+        linechart_creation(sheet, "Overdue by Severity", "Count", 4, 7, header_row, last_data_row, f"{chart_col}21")
+
+    merge_cells_title(sheet, "A1", f"{get_column_letter(last_col)}2", 1, 1, f"Trends - last {days} days", "center", "center", "00FFFF00")
+    sheet.sheet_view.showGridLines = False
+
+# Every sheet of the dashboard in workbook order (before Summary is moved to the front), as
+# (sheet name, step, content) where step(writer) writes the sheet and content is everything the
+# sheet's cells depend on, for telling whether a sheet changed between two runs.
+# Also returns the detail frames, for streaming the rest of their rows after the save
+# history: a history store (see history.py) to record this run in, under source, and chart on a Trends sheet.
+# native_pivots writes the pivot sheets as native pivot tables over a hidden Pivot Data sheet (over Findings
+# when compact). compact writes the findings once, as the Findings table, and the detail sheets as index sheets.
+# cube: the aggregation cube of df, when it was already built (e.g. sliced from the cube of a larger frame).
+# approximate takes the Summary's tables and big numbers from a sketch of the findings (see sketches.py)
+def dashboard_sheets(raw_df, today=None, severity_thresholds=SEVERITY_THRESHOLDS, streaming=False, derived=None, max_charts=MAX_CHARTS,
+                     history=None, source=None, native_pivots=False, compact=False, cube=None, approximate=False):
+    if today is None:
+        today = datetime.today()
+    if derived is None:
+        with stage("derive", rows=len(raw_df)):
+            derived = derive_frame(raw_df, today, severity_thresholds)
+    df, sla = derived
+    with stage("split", rows=len(df)):
+        detail_frames, group_start_rows, asset_group_links, asset_group_family_links = split_frames(raw_df, df, sla)
+    sketch = None
+    if approximate:
+        with stage("sketch", rows=len(df)):
+            sketch = frame_sketch(df)
+    with stage("tables", rows=len(df)):
+        if cube is None:
+            cube = aggregate_cube(df)
+        tables, critical_value = build_tables(df, asset_group_links, asset_group_family_links, cube=cube, pivots=not native_pivots,
+                                              link_sheet=FINDINGS if compact else "Original Vulnerabilities", sketch=sketch)
+    trend = None
+    if history is not None:
+        with stage("history", rows=len(df)):
+            with recording(history, source, today) as recorder:
+                record_frame(recorder, df, sla)
+            trend = trend_table(history, source, today)
+    headline_values = (
+        len(df),
+        view_length(detail_frames["Overdue Vulnerabilities"]),
+        view_length(detail_frames["Non-Overdue Vulnerabilities"]),
+        critical_value,
+    )
+    if sketch is not None:
+        headline_values = sketch_headline(sketch, critical_value)
+
+    detail_step = write_detail_stub if streaming else write_detail_sheet
+    banded_sheets = {"Original Vulnerabilities": group_start_rows, FINDINGS: group_start_rows}
+    # every detail sheet is cut from df, so each shared column is measured once
+    width_cache = {}
+    if compact:
+        detail_frames = compact_frames(df, sla, detail_frames, width_cache)
+    sheets = []
+    for sheet_name, view in detail_frames.items():
+        group_rows = banded_sheets.get(sheet_name)
+        step = partial(detail_step, sheet_name=sheet_name, view=view, group_start_rows=group_rows, width_cache=width_cache)
+        if sheet_name == FINDINGS:
+            step = partial(write_findings_table, step=step, columns=list(view["columns"]), n_rows=view_length(view))
+        sheets.append((sheet_name, step, (view, group_rows, view_widths(view, width_cache))))
+    pivots = None
+    if native_pivots and compact:
+        pivots = native_pivot_cache(cube, len(df), FINDINGS, list(detail_frames[FINDINGS]["columns"]))
+    elif native_pivots:
+        pivots = native_pivot_cache(cube, len(df))
+        detail_frames[PIVOT_DATA] = pivot_data_view(df)
+    sheets += summary_sheets(tables, headline_values, max_charts, trend, pivots)
+    if PIVOT_DATA in detail_frames:
+        view = detail_frames[PIVOT_DATA]
+        step = partial(write_hidden, sheet_name=PIVOT_DATA, step=partial(detail_step, sheet_name=PIVOT_DATA, view=view, width_cache=width_cache))
+        sheets.append((PIVOT_DATA, step, (view, None, view_widths(view, width_cache))))
+    return sheets, detail_frames
+
+# (sheet name, step, content) of the Summary and pivot sheets, and of Trends when there is a trend table,
+# as dashboard_sheets lists them. pivots: the (cache, values, table_rows) of native_pivot_cache, for native pivot sheets
+def summary_sheets(tables, headline_values, max_charts=MAX_CHARTS, trend=None, pivots=None):
+    sheets = []
+    summary_tables = {key: tables[key] for key in ("overdue_vul", "severity_vul", "asset_group_vul", "family_vul", "distinct_vul") if key in tables}
+    sheets.append(("Summary", partial(write_summary_sheet, tables=summary_tables, headline_values=headline_values), (summary_tables, headline_values)))
+    if pivots is not None:
+        cache, values, table_rows = pivots
+        for sheet_name, row_fields in NATIVE_PIVOT_SHEETS:
+            step = partial(write_native_pivot_sheet, sheet_name=sheet_name, cache=cache, values=values, row_fields=row_fields,
+                           n_rows=table_rows[sheet_name])
+            sheets.append((sheet_name, step, (values, row_fields, table_rows[sheet_name])))
+    else:
+        for sheet_name, table_key, variable, x_title, hyperlink_column, chart_min_col, charts_banner in PIVOT_SHEETS:
+            step = partial(write_pivot_sheet, sheet_name=sheet_name, table=tables[table_key], variable=variable, x_title=x_title,
+                           hyperlink_column=hyperlink_column, chart_min_col=chart_min_col, charts_banner=charts_banner, max_charts=max_charts)
+            sheets.append((sheet_name, step, (*tables[table_key], max_charts)))
+    if trend is not None:
+        sheets.append(("Trends", partial(write_trends_sheet, trend=trend), (trend,)))
+    return sheets
+
+# Build every sheet of the dashboard. single_pass keeps the workbook in memory and saves it
+# once; otherwise each sheet gets its own load/save cycle (the original flow, kept for comparison).
+# streaming writes the detail sheets row by row into the saved file instead of through openpyxl
+# derived: the (df, sla) pair from derive_frame/load_frames, to skip recomputing it.
+# sheet_workers > 1 streams the detail sheets, serializing them concurrently on that many workers.
+# history: a history store to record the run in and build a Trends sheet from.
+# native_pivots: native pivot tables instead of the static pivot sheets (see NATIVE_PIVOT_SHEETS).
+# compact: every finding written once, in the Findings table, with index sheets for the detail sheets (see FINDINGS).
+# cube: the aggregation cube of the derived frame, to skip rebuilding it.
+# approximate: Summary tables and big numbers estimated by sketches, with distinct plugin ids per asset group
+def build_dashboard(raw_df, newfile, source_file="./template.xlsm", today=None, severity_thresholds=SEVERITY_THRESHOLDS, single_pass=True, streaming=False, derived=None,
+                    max_charts=MAX_CHARTS, sheet_workers=1, history=None, native_pivots=False, compact=False, cube=None, approximate=False):
+    streaming = streaming or sheet_workers > 1
+    sheets, detail_frames = dashboard_sheets(raw_df, today, severity_thresholds, streaming, derived, max_charts, history, history_source(newfile),
+                                             native_pivots, compact, cube, approximate)
+    return write_dashboard(newfile, source_file, sheets, detail_frames, single_pass, streaming, sheet_workers)
+
+# Rows behind a sheet, for instrumentation: a detail view or pivot table comes first in its content
+def sheet_rows(content):
+    if isinstance(content[0], pd.DataFrame):
+        return len(content[0])
+    if isinstance(content[0], dict) and "rows" in content[0]:
+        return view_length(content[0])
+    return None
+
+# What content_digest sees of a sheet: a detail view becomes, per column, the hashes of the rows it
+# shows (each frame column is hashed once and shared between sheets), so no view is materialized
+def digest_content(content, column_hashes):
+    view = content[0]
+    if not (isinstance(view, dict) and "rows" in view):
+        return content
+    columns = []
+    for col, frame in view["columns"].items():
+        key = (id(frame), col)
+        if key not in column_hashes:
+            column_hashes[key] = column_hash(frame[col])
+        hashes = column_hashes[key]
+        columns.append((col, str(frame[col].dtype), hashes if view["rows"] is None else hashes[view["rows"]]))
+    return (columns, *content[1:])
+
+def write_dashboard(newfile, source_file, sheets, detail_frames, single_pass=True, streaming=False, sheet_workers=1, previous=None, kept=()):
+    steps = [(f"write {sheet_name}", step, sheet_rows(content)) for sheet_name, step, content in sheets]
+    # the template's placeholder sheet goes once the detail sheets exist
+    steps.insert(next((i for i, (sheet_name, _, _) in enumerate(sheets) if sheet_name not in detail_frames), len(sheets)), ("remove Sheet1", lambda writer: remove_sheet(writer.book, "Sheet1"), None))
+
+    if single_pass:
+        # built on an in-memory copy of the template and saved once, to a temporary file that
+        # replaces newfile when the dashboard is complete
+        with atomic_output(newfile) as tmp_path:
+            with excel_writer(tmp_path, template_copy(source_file)) as writer:
+                for label, step, rows in steps:
+                    with stage(label, rows):
+                        step(writer)
+            if streaming:
+                stream_details(tmp_path, detail_frames, sheet_workers, previous, kept)
+        return newfile
+
+    with stage("copy template"):
+        if os.path.exists(newfile):
+            os.remove(newfile)
+        shutil.copy(source_file, newfile)
+    for label, step, rows in steps:
+        with excel_writer(newfile) as writer, stage(label, rows):
+            step(writer)
+    if streaming:
+        stream_details(newfile, detail_frames, sheet_workers)
+    return newfile
+
+# Stream the rest of every detail sheet into a saved dashboard whose detail sheets are stubs,
+# serializing the sheets on `workers` workers at once when there is more than one.
+# detail_frames holds views, or the rows after each stub's first as (n_rows, n_cols, chunks).
+# The detail sheets in kept are copied as they are from previous, a dashboard built the same way, where
+# splice_sheets can; only the others are streamed
+def stream_details(newfile, detail_frames, workers=1, previous=None, kept=()):
+    if kept:
+        with stage("splice"):
+            kept = splice_sheets(newfile, previous, kept)
+    # the first row of each sheet went in with the stub
+    rows = {
+        sheet_name: (max(view_length(view) - 1, 0), view_width(view), view_chunks(view, CHUNK_SIZE, start=1)) if isinstance(view, dict) else view
+        for sheet_name, view in detail_frames.items() if sheet_name not in kept
+    }
+    with stage("stream", rows=sum(n_rows for n_rows, _, _ in rows.values())) as record:
+        stream_detail_sheets(newfile, rows, workers=workers)
+        record["bytes"] = os.path.getsize(newfile)
+
+# Bring an existing dashboard up to date, serializing only the detail sheets whose content differs from the
+# snapshot stored by the previous run. The dashboard is built again with streamed detail sheets, the summary
+# and pivot sheets in full (they are small) and the detail sheets as stubs; each unchanged detail sheet is
+# then copied from the previous dashboard as stored, and only the changed ones are streamed. Nothing is
+# written when no sheet changed. Without a usable snapshot (first run, new template, different set of sheets)
+# every detail sheet is streamed. Returns what was done, for reporting
+def refresh_dashboard(raw_df, newfile, source_file="./template.xlsm", today=None, severity_thresholds=SEVERITY_THRESHOLDS, derived=None, max_charts=MAX_CHARTS,
+                      history=None):
+    sheets, detail_frames = dashboard_sheets(raw_df, today, severity_thresholds, streaming=True, derived=derived, max_charts=max_charts,
+                                             history=history, source=history_source(newfile))
+    with stage("fingerprint", rows=len(raw_df)):
+        column_hashes = {}
+        digests = {sheet_name: content_digest(digest_content(content, column_hashes)) for sheet_name, _, content in sheets}
+        rows = row_hashes(raw_df)
+        template = template_digest(source_file)
+        snapshot = load_snapshot(newfile)
+    report = {"output": newfile, "rebuilt": False, "rewritten": [], "added_rows": len(rows), "removed_rows": 0}
+
+    if (snapshot is None or snapshot["template"] != template or snapshot["sheets"].keys() != digests.keys()
+            or not os.path.exists(newfile)):
+        write_dashboard(newfile, source_file, sheets, detail_frames, streaming=True)
+        report.update(rebuilt=True, rewritten=list(digests))
+    else:
+        report["added_rows"], report["removed_rows"] = row_changes(snapshot["rows"], rows)
+        report["rewritten"] = [sheet_name for sheet_name in digests if digests[sheet_name] != snapshot["sheets"][sheet_name]]
+        if report["rewritten"]:
+            # built next to the previous dashboard and swapped in, so a failed refresh leaves the previous one intact
+            kept = [sheet_name for sheet_name in detail_frames if sheet_name not in report["rewritten"]]
+            write_dashboard(newfile, source_file, sheets, detail_frames, streaming=True, previous=newfile, kept=kept)
+
+    save_snapshot(newfile, template, digests, rows)
+    return report
+
+# Dashboard name for a raw export: "<name>_raw.xlsx" -> "<name>.xlsm", next to the input unless output_dir is given
+def dashboard_path(path, output_dir=None):
+    name = os.path.splitext(os.path.basename(path))[0]
+    if name.endswith("_raw"):
+        name = name[:-len("_raw")]
+    return os.path.join(output_dir if output_dir is not None else os.path.dirname(path), name + ".xlsm")
+
+# Start of the current day. Builds compare against the current instant unless given a today; passing this
+# instead (batch --start-of-day) lets every run on the same day share a frame cache entry, with day counts
+# taken at midnight rather than at the time of the run
+def start_of_today():
+    return datetime.combine(date.today(), datetime.min.time())
+
+# Read (or load from the frame cache) one raw export and build its dashboard.
+# chunk_size reads the export that many rows at a time instead, for exports larger than memory
+# (see out_of_core; the frame cache holds whole frames, so it is not used then)
+def build_file(path, newfile=None, source_file="./template.xlsm", today=None, severity_thresholds=SEVERITY_THRESHOLDS, fmt=None,
+               cache_dir=DEFAULT_CACHE_DIR, streaming=False, max_charts=MAX_CHARTS, backend="pandas", sheet_workers=1, chunk_size=None, history=None,
+               native_pivots=False, compact=False, approximate=False):
+    if newfile is None:
+        newfile = dashboard_path(path)
+    if today is None:
+        today = datetime.today()
+    if chunk_size:
+        if backend != "pandas":
+            raise ValueError("Chunked builds read with the pandas backend only")
+        if compact:
+            raise ValueError("Chunked builds write the full detail sheets only, not compact dashboards")
+        from out_of_core import build_out_of_core
+        return build_out_of_core(path, newfile, source_file, today, severity_thresholds, fmt, chunk_size, max_charts, sheet_workers, history,
+                                 native_pivots, approximate)
+    raw_df, df, sla = load_frames(path, today, severity_thresholds, fmt, cache_dir, backend=backend)
+    return build_dashboard(raw_df, newfile, source_file, today, severity_thresholds, streaming=streaming, derived=(df, sla), max_charts=max_charts,
+                           sheet_workers=sheet_workers, history=history, native_pivots=native_pivots,
+                           compact=compact, approximate=approximate)
+
+# build_file, but refreshing the existing dashboard in place (see refresh_dashboard)
+def refresh_file(path, newfile=None, source_file="./template.xlsm", today=None, severity_thresholds=SEVERITY_THRESHOLDS, fmt=None,
+                 cache_dir=DEFAULT_CACHE_DIR, max_charts=MAX_CHARTS, backend="pandas", history=None):
+    if newfile is None:
+        newfile = dashboard_path(path)
+    if today is None:
+        today = datetime.today()
+    raw_df, df, sla = load_frames(path, today, severity_thresholds, fmt, cache_dir, backend=backend)
+    return refresh_dashboard(raw_df, newfile, source_file, today, severity_thresholds, derived=(df, sla), max_charts=max_charts, history=history)
+
+if __name__ == "__main__":
+    from batch import main
+    raise SystemExit(main())
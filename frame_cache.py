@@ -0,0 +1,67 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+DEFAULT_CACHE_DIR = ".dashboard_cache"
+DEFAULT_MAX_BYTES = 1 << 30
+CACHE_SUFFIX = ".pkl"
+
+def file_digest(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Content-addressed key: the raw file's bytes plus any JSON-serializable parameters
+def cache_key(path, **params):
+    digest = hashlib.sha256(file_digest(path).encode())
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+def cache_entries(cache_dir):
+    if not os.path.isdir(cache_dir):
+        return []
+    return [entry for entry in os.scandir(cache_dir) if entry.is_file() and entry.name.endswith(CACHE_SUFFIX)]
+
+# Drop least recently used entries until the cache fits in max_bytes
+def evict(cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+    entries = sorted(cache_entries(cache_dir), key=lambda entry: entry.stat().st_mtime)
+    total = sum(entry.stat().st_size for entry in entries)
+    for entry in entries:
+        if total <= max_bytes:
+            break
+        total -= entry.stat().st_size
+        os.remove(entry.path)
+
+def clear_cache(cache_dir=DEFAULT_CACHE_DIR):
+    for entry in cache_entries(cache_dir):
+        os.remove(entry.path)
+
+# Return the cached value for key, or compute, store and return it. refresh=True ignores
+# (and overwrites) any existing entry. Hits bump the entry's mtime for LRU eviction
+def load_or_compute(key, compute, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, refresh=False):
+    path = os.path.join(cache_dir, key + CACHE_SUFFIX)
+    if not refresh and os.path.exists(path):
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            os.utime(path)
+            return value
+        except (OSError, EOFError, pickle.UnpicklingError):
+            pass
+
+    value = compute()
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=cache_dir)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    evict(cache_dir, max_bytes)
+    return value
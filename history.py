@@ -0,0 +1,123 @@
+import os
+import sqlite3
+from contextlib import closing, contextmanager
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_HISTORY_DAYS = 365
+SEVERITY_ORDER = ["Critical", "High", "Medium", "Low"]
+
+# One row per recorded scan, its aggregates per (asset_group, plugin_family, severity, overdue) and every
+# finding's SLA state. Rows are keyed by the dashboard they were recorded for (source) and the scan date
+# (ISO text, so date ranges are index range scans); several dashboards can share one store
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    source TEXT NOT NULL, scan_date TEXT NOT NULL, findings INTEGER NOT NULL, overdue INTEGER NOT NULL, recorded_at TEXT NOT NULL,
+    PRIMARY KEY (source, scan_date)
+);
+CREATE TABLE IF NOT EXISTS aggregates (
+    source TEXT NOT NULL, scan_date TEXT NOT NULL, asset_group TEXT, plugin_family TEXT, severity TEXT,
+    overdue INTEGER NOT NULL, findings INTEGER NOT NULL, days_overdue INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS aggregates_scan ON aggregates (source, scan_date);
+CREATE TABLE IF NOT EXISTS findings (
+    source TEXT NOT NULL, scan_date TEXT NOT NULL, plugin_id INTEGER, asset_group TEXT, plugin_family TEXT, severity TEXT, port INTEGER,
+    overdue INTEGER NOT NULL, days_overdue INTEGER, days_to_overdue INTEGER
+);
+CREATE INDEX IF NOT EXISTS findings_scan ON findings (source, scan_date);
+"""
+TABLES = ["scans", "aggregates", "findings"]
+
+# History is recorded under the dashboard's name, so a dashboard's trends follow it from run to run
+def history_source(newfile):
+    return os.path.splitext(os.path.basename(newfile))[0]
+
+def scan_date(today):
+    return pd.Timestamp(today).date().isoformat()
+
+# Write-ahead logging, so trend queries never wait on a scan being recorded; writers (batch workers
+# recording their own dashboards) take turns
+def connect(path):
+    conn = sqlite3.connect(path, timeout=600)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+# A column as Python values for sqlite3, None where missing
+def sql_values(series):
+    return series.astype(object).where(series.notna().to_numpy(), None)
+
+# Record one scan in a single transaction: yields a recorder to pass to record_frame once per frame of
+# findings (the whole export, or each chunk of it). The store only grows: rows of other scans are never
+# touched, but recording the same source and date again replaces what that run stored, so a re-run
+# doesn't count its findings twice
+@contextmanager
+def recording(path, source, today):
+    with closing(connect(path)) as conn, conn:
+        key = (source, scan_date(today))
+        for table in TABLES:
+            conn.execute(f"DELETE FROM {table} WHERE source = ? AND scan_date = ?", key)
+        recorder = {"conn": conn, "key": key, "findings": 0, "overdue": 0}
+        yield recorder
+        conn.execute("INSERT INTO scans VALUES (?, ?, ?, ?, ?)",
+                     (*key, recorder["findings"], recorder["overdue"], datetime.now().isoformat(timespec="seconds")))
+
+# Append a frame of derived findings (df and sla from derive_frame) to the scan being recorded
+def record_frame(recorder, df, sla):
+    source, date = recorder["key"]
+    overdue = sla["overdue"].to_numpy()
+    days_overdue = sla["Days Overdued By (Days)"]
+    findings = pd.DataFrame({
+        "plugin_id": sql_values(df["plugin_id"]),
+        "asset_group": sql_values(df["asset_group"]),
+        "plugin_family": sql_values(df["plugin_family"]),
+        "severity": sql_values(df["severity"]),
+        "port": sql_values(df["port"]),
+        "overdue": overdue.astype(int).astype(object),
+        "days_overdue": sql_values(days_overdue),
+        "days_to_overdue": sql_values(sla["Days to Overdue (Days)"]),
+    })
+    recorder["conn"].executemany(
+        "INSERT INTO findings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        ((source, date, *row) for row in findings.itertuples(index=False, name=None)),
+    )
+    keys = pd.DataFrame({col: df[col] for col in ["asset_group", "plugin_family", "severity"]})
+    keys["overdue"] = overdue.astype(int)
+    keys["days_overdue"] = days_overdue.fillna(0).to_numpy(dtype="int64")
+    aggregates = (
+        keys.groupby(["asset_group", "plugin_family", "severity", "overdue"], dropna=False, observed=True)
+        .agg(findings=("days_overdue", "size"), days_overdue=("days_overdue", "sum"))
+        .reset_index()
+    )
+    recorder["conn"].executemany(
+        "INSERT INTO aggregates VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        ((source, date, *row) for row in pd.DataFrame({col: sql_values(aggregates[col]) for col in aggregates.columns}).itertuples(index=False, name=None)),
+    )
+    recorder["findings"] += len(df)
+    recorder["overdue"] += int(overdue.sum())
+
+# Per scan date of source, over the days up to today: findings, overdue findings, overdue findings per
+# severity and the average days overdue. One range scan of the aggregates index, however many findings
+# each scan held
+def trend_table(path, source, today, days=DEFAULT_HISTORY_DAYS):
+    severity_columns = "".join(
+        f", SUM(CASE WHEN overdue AND severity = '{severity}' THEN findings ELSE 0 END) AS \"{severity}\"" for severity in SEVERITY_ORDER
+    )
+    query = f"""
+        SELECT scan_date AS "Scan Date", SUM(findings) AS "Findings", SUM(CASE WHEN overdue THEN findings ELSE 0 END) AS "Overdue"
+               {severity_columns}, SUM(days_overdue) AS days_overdue
+        FROM aggregates
+        WHERE source = ? AND scan_date BETWEEN ? AND ?
+        GROUP BY scan_date
+        ORDER BY scan_date
+    """
+    end = pd.Timestamp(today)
+    with closing(connect(path)) as conn:
+        trend = pd.read_sql_query(query, conn, params=(source, scan_date(end - timedelta(days=days - 1)), scan_date(end)))
+    overdue = trend["Overdue"].to_numpy(dtype="float64")
+    trend["Avg Days Overdue"] = np.round(np.divide(trend.pop("days_overdue").to_numpy(dtype="float64"), overdue,
+                                                   out=np.zeros(len(trend)), where=overdue > 0), 1)
+    trend["Scan Date"] = pd.to_datetime(trend["Scan Date"]).dt.date
+    return trend
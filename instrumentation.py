@@ -0,0 +1,134 @@
+import cProfile
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+PROC_STATUS = "/proc/self/status"
+PROC_CLEAR_REFS = "/proc/self/clear_refs"
+# what stage() hands out while no session is active: one shared no-op context, so disabled
+# instrumentation costs a global lookup and a call. Its dict swallows any rows set on it
+DISABLED = nullcontext({})
+
+_session = None
+
+# Peak resident set size in bytes. VmHWM can be reset between stages (see reset_peak_rss);
+# elsewhere fall back to the process-lifetime ru_maxrss (KiB on Linux, bytes on macOS)
+def peak_rss():
+    try:
+        with open(PROC_STATUS) as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+# Start a new high-water mark at the current RSS; False where the kernel won't let us
+def reset_peak_rss():
+    try:
+        with open(PROC_CLEAR_REFS, "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def new_session():
+    return {"stages": [], "open": [], "marks": {}, "resettable": reset_peak_rss(), "start": time.perf_counter()}
+
+# Time one named stage of the pipeline. Yields a dict; set "rows" on it (or pass rows=) to record how many
+# rows the stage handled, and "bytes" for how much it read or wrote. Stages nest, and each record carries its parent's path. Peak RSS is per stage
+# where VmHWM can be reset and the process peak so far otherwise
+def stage(name, rows=None):
+    if _session is None:
+        return DISABLED
+    return _record_stage(_session, name, rows)
+
+# Note when something first happens in the session (e.g. "first byte" of output), as seconds since it began
+def mark(name):
+    if _session is not None:
+        _session["marks"].setdefault(name, time.perf_counter() - _session["start"])
+
+@contextmanager
+def _record_stage(session, name, rows):
+    open_stages = session["open"]
+    parent = open_stages[-1] if open_stages else None
+    if parent is not None:
+        parent["peak_rss"] = max(parent["peak_rss"], peak_rss())
+    if session["resettable"]:
+        reset_peak_rss()
+    record = {"name": name, "path": f"{parent['path']}/{name}" if parent is not None else name, "rows": rows, "bytes": None, "peak_rss": 0}
+    open_stages.append(record)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield record
+    finally:
+        record["wall_s"] = time.perf_counter() - wall_start
+        record["cpu_s"] = time.process_time() - cpu_start
+        record["peak_rss"] = max(record["peak_rss"], peak_rss())
+        open_stages.pop()
+        if parent is not None:
+            parent["peak_rss"] = max(parent["peak_rss"], record["peak_rss"])
+        session["stages"].append(record)
+
+# Stages in the order they finished, plus totals per stage name (a name can run many times,
+# e.g. one "charts" stage per chart)
+def session_report(session):
+    stages = [
+        {"name": record["name"], "path": record["path"], "wall_s": record["wall_s"], "cpu_s": record["cpu_s"],
+         "peak_rss_mb": record["peak_rss"] / (1 << 20), "rows": record["rows"], "bytes": record["bytes"]}
+        for record in session["stages"]
+    ]
+    totals = {}
+    for record in stages:
+        total = totals.setdefault(record["name"], {"count": 0, "wall_s": 0.0, "cpu_s": 0.0, "peak_rss_mb": 0.0, "rows": None, "bytes": None})
+        total["count"] += 1
+        total["wall_s"] += record["wall_s"]
+        total["cpu_s"] += record["cpu_s"]
+        total["peak_rss_mb"] = max(total["peak_rss_mb"], record["peak_rss_mb"])
+        if record["rows"] is not None:
+            total["rows"] = (total["rows"] or 0) + record["rows"]
+        if record["bytes"] is not None:
+            total["bytes"] = (total["bytes"] or 0) + record["bytes"]
+    return {
+        "wall_s": time.perf_counter() - session["start"],
+        "peak_rss_mb": max([record["peak_rss_mb"] for record in stages], default=peak_rss() / (1 << 20)),
+        "peak_rss_scope": "stage" if session["resettable"] else "process",
+        "marks": session["marks"],
+        "stages": stages,
+        "totals": totals,
+    }
+
+def write_report(report, path):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+# Turn instrumentation on for the duration of the block. Writes the JSON report to report_path and,
+# with profile_path, a cProfile dump readable by pstats/snakeviz. Yields the live session
+@contextmanager
+def instrumented(name="run", report_path=None, profile_path=None):
+    global _session
+    if _session is not None:
+        raise RuntimeError("Instrumentation is already enabled in this process")
+    session = new_session()
+    profiler = cProfile.Profile() if profile_path is not None else None
+    _session = session
+    try:
+        if profiler is not None:
+            profiler.enable()
+        with _record_stage(session, name, None):
+            yield session
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        _session = None
+        if profiler is not None:
+            profiler.dump_stats(profile_path)
+        if report_path is not None:
+            write_report(session_report(session), report_path)
@@ -0,0 +1,69 @@
+import pandas as pd
+
+from dashboard_creation import SEVERITY_THRESHOLDS, add_derived_columns, severity_days, sla_frame
+from readers import CATEGORY_COLUMNS, DATE_COLUMNS, DATE_FORMAT, categorize, input_format, read_xlsx
+
+DAY_US = 86_400_000_000
+
+# polars is optional: only this backend needs it
+def import_polars():
+    try:
+        import polars as pl
+    except ImportError:
+        raise ImportError("The polars backend needs polars installed (pip install polars)") from None
+    return pl
+
+# Lazy scan of a raw export. Category columns are read as text, as read_raw's CSV reader does; Excel
+# has no lazy reader, so workbooks are read by pandas and handed over
+def scan_raw(pl, path, fmt=None):
+    fmt = input_format(path, fmt)
+    if fmt == "csv":
+        header = pl.read_csv(path, n_rows=0).columns
+        return pl.scan_csv(path, schema_overrides={col: pl.String for col in CATEGORY_COLUMNS + DATE_COLUMNS if col in header})
+    if fmt == "parquet":
+        return pl.scan_parquet(path)
+    if fmt == "arrow":
+        return pl.scan_ipc(path)
+    return pl.from_pandas(read_xlsx(path)).lazy()
+
+# Whole days in a duration, rounded down as pandas' .dt.days does
+def whole_days(pl, delta):
+    return delta.dt.total_microseconds() // DAY_US
+
+# One plan from the scan to the derived inputs: dates parsed, the scan flag, days discovered and days
+# elapsed for the SLA, computed in a single pass over the columns they need
+def derive_plan(pl, scan, today):
+    schema = scan.collect_schema()
+    dates = [
+        pl.col(col).str.strptime(pl.Datetime("us"), DATE_FORMAT) if schema[col] == pl.String else pl.col(col)
+        for col in DATE_COLUMNS
+    ]
+    parsed = scan.with_columns(dates)
+    start_date = pl.coalesce(pl.col("patch_publication_date"), pl.col("first_observed_date"))
+    return parsed.with_columns(
+        (pl.col("port") != 0).fill_null(True).alias("__network_scan"),
+        whole_days(pl, pl.col("last_observed_date") - pl.col("first_observed_date")).alias("__days_discovered"),
+        whole_days(pl, pl.lit(pd.Timestamp(today).to_pydatetime(), dtype=pl.Datetime("us")) - start_date).cast(pl.Float64).alias("__difference"),
+    ), list(schema.names())
+
+# read_raw + derive_frame on polars: the export is scanned, parsed and derived as one lazy plan and collected
+# once; the result is handed to pandas and finished with the same code as the pandas path, so (raw_df, df, sla)
+# come out identical to it
+def read_and_derive(path, today, severity_thresholds=SEVERITY_THRESHOLDS, fmt=None):
+    pl = import_polars()
+    plan, raw_columns = derive_plan(pl, scan_raw(pl, path, fmt), today)
+    collected = plan.collect()
+
+    raw_df = collected.select(raw_columns).to_pandas()
+    for col in CATEGORY_COLUMNS:
+        # polars lists categories in order of appearance; pandas sorts them
+        if col in raw_df.columns and isinstance(raw_df[col].dtype, pd.CategoricalDtype):
+            raw_df[col] = raw_df[col].cat.set_categories(sorted(raw_df[col].cat.categories))
+    categorize(raw_df)
+
+    df = raw_df.copy(deep=False)
+    difference = pd.Series(collected["__difference"].to_numpy(), index=df.index)
+    sla = sla_frame(difference, severity_days(df["severity"], severity_thresholds))
+    days_discovered = pd.Series(collected["__days_discovered"].to_numpy(), index=df.index)
+    add_derived_columns(df, collected["__network_scan"].to_numpy(), days_discovered, sla)
+    return raw_df, df, sla
@@ -0,0 +1,120 @@
+import pandas as pd
+from openpyxl.pivot.cache import CacheDefinition, CacheField, CacheSource, SharedItems, WorksheetSource
+from openpyxl.pivot.fields import Missing, Text
+from openpyxl.pivot.table import DataField, FieldItem, Location, PivotField, PivotTableStyle, RowColField, TableDefinition
+from openpyxl.utils import get_column_letter
+
+# The columns a pivot cache needs from its source sheet: what the pivot tables group by, and plugin_id,
+# which they count (as the static pivot tables count non-null plugin ids)
+PIVOT_FIELDS = ["plugin_id", "plugin_family", "severity", "asset_group", "overdue"]
+COUNT_FIELD = "plugin_id"
+GROUP_FIELDS = [field for field in PIVOT_FIELDS if field != COUNT_FIELD]
+SEVERITY_ORDER = ["Critical", "High", "Medium", "Low"]
+CACHE_ID = 1
+# Excel 2010 and later read and refresh the definitions below
+EXCEL_VERSION = 6
+MIN_REFRESHABLE_VERSION = 3
+PIVOT_STYLE = "PivotStyleLight16"
+
+# Distinct values of every grouping field, in the order the pivot tables show them: severities Critical to Low
+# (then any other severity), everything else sorted. A missing value comes last, as a blank item.
+# cube: the aggregation cube (see dashboard_creation.aggregate_cube), which holds every distinct combination
+def shared_values(cube):
+    values = {}
+    for field in GROUP_FIELDS:
+        column = cube[field]
+        present = sorted(str(value) for value in pd.unique(column.dropna()))
+        if field == "severity":
+            present = [level for level in SEVERITY_ORDER if level in present] + [level for level in present if level not in SEVERITY_ORDER]
+        values[field] = (present, bool(column.isna().any()))
+    return values
+
+# Rows a pivot table with row_fields shows: the combinations of their values that occur (a missing value
+# being a blank item of its own), from the aggregation cube
+def row_count(cube, row_fields):
+    return len(cube[row_fields].drop_duplicates())
+
+def cache_field(name, values=None):
+    if values is None:
+        return CacheField(name=name, numFmtId=0, sharedItems=SharedItems())
+    present, blank = values
+    items = [Text(v=value) for value in present] + ([Missing()] if blank else [])
+    return CacheField(name=name, numFmtId=0, sharedItems=SharedItems(_fields=items, count=len(items), containsBlank=blank or None))
+
+# One cache over the n_rows findings of a sheet whose columns (header in row 1) are columns, which must
+# include PIVOT_FIELDS. It holds no records: saveData off and refreshOnLoad on, so Excel reads the findings
+# from the sheet when the workbook opens and every pivot table sharing the cache is computed from that one read
+def pivot_cache(sheet_name, columns, n_rows, values):
+    ref = f"A1:{get_column_letter(len(columns))}{n_rows + 1}"
+    return CacheDefinition(
+        refreshOnLoad=True,
+        saveData=False,
+        createdVersion=EXCEL_VERSION,
+        refreshedVersion=EXCEL_VERSION,
+        minRefreshableVersion=MIN_REFRESHABLE_VERSION,
+        recordCount=0,
+        cacheSource=CacheSource(type="worksheet", worksheetSource=WorksheetSource(ref=ref, sheet=sheet_name)),
+        cacheFields=[cache_field(str(col), values.get(col)) for col in columns],
+    )
+
+def field_names(cache):
+    return [field.name for field in cache.cacheFields]
+
+def shared_count(cache, field):
+    return len(cache.cacheFields[field_names(cache).index(field)].sharedItems._fields)
+
+# The cache's items of a field in display order (their positions in its shared items) and, with subtotals,
+# the default subtotal item Excel expects after them
+def field_items(cache, field, subtotals):
+    return [FieldItem(x=i) for i in range(shared_count(cache, field))] + ([FieldItem(t="default")] if subtotals else [])
+
+# A pivot table on cache with one row per combination of row_fields (n_rows of them, see row_count) and one
+# column per severity, counting plugin ids, anchored at cell. Laid out like the static tables: tabular (one
+# column per row field), no subtotals and no grand totals
+def pivot_table_definition(name, cache, row_fields, n_rows, cell="A4"):
+    fields = field_names(cache)
+    pivot_fields = []
+    for field in fields:
+        if field in row_fields or field == "severity":
+            axis = "axisRow" if field in row_fields else "axisCol"
+            pivot_fields.append(PivotField(axis=axis, showAll=False, compact=False, outline=False, defaultSubtotal=False,
+                                           items=field_items(cache, field, subtotals=False)))
+        else:
+            pivot_fields.append(PivotField(dataField=field == COUNT_FIELD, showAll=False, compact=False, outline=False))
+    severities = shared_count(cache, "severity")
+    # the area Excel recomputes on refresh; what is written here is only its starting size
+    first_col, first_row = cell.rstrip("0123456789"), int(cell.lstrip("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    last_col = get_column_letter(len(row_fields) + max(severities, 1))
+    ref = f"{first_col}{first_row}:{last_col}{first_row + 1 + max(n_rows, 1)}"
+    pivot = TableDefinition(
+        name=name,
+        cacheId=CACHE_ID,
+        dataCaption="Values",
+        updatedVersion=EXCEL_VERSION,
+        minRefreshableVersion=MIN_REFRESHABLE_VERSION,
+        createdVersion=EXCEL_VERSION,
+        applyNumberFormats=False,
+        applyBorderFormats=False,
+        applyFontFormats=False,
+        applyPatternFormats=False,
+        applyAlignmentFormats=False,
+        applyWidthHeightFormats=True,
+        useAutoFormatting=True,
+        itemPrintTitles=True,
+        indent=0,
+        compact=False,
+        compactData=False,
+        outline=True,
+        outlineData=True,
+        rowGrandTotals=False,
+        colGrandTotals=False,
+        location=Location(ref=ref, firstHeaderRow=1, firstDataRow=2, firstDataCol=len(row_fields)),
+        pivotFields=pivot_fields,
+        rowFields=[RowColField(x=fields.index(field)) for field in row_fields],
+        colFields=[RowColField(x=fields.index("severity"))],
+        dataFields=[DataField(name=f"Count of {COUNT_FIELD}", fld=fields.index(COUNT_FIELD), subtotal="count", baseField=0, baseItem=0)],
+        pivotTableStyleInfo=PivotTableStyle(name=PIVOT_STYLE, showRowHeaders=True, showColHeaders=True, showRowStripes=False,
+                                            showColStripes=False, showLastColumn=True),
+    )
+    pivot.cache = cache
+    return pivot
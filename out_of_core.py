@@ -0,0 +1,223 @@
+import os
+import pickle
+import tempfile
+from contextlib import nullcontext
+from functools import partial
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+from dashboard_creation import (
+    DETAIL_SHEETS, MAX_CHARTS, PIVOT_DATA, SEVERITY_THRESHOLDS, aggregate_cube, build_tables, derive_frame, group_links, group_starts,
+    merge_cubes, native_pivot_cache, pivot_data_view, sketch_headline, split_frames, summary_sheets, view_frame, view_widths, write_dashboard,
+    write_hidden, write_stub,
+)
+from history import history_source, record_frame, recording, trend_table
+from instrumentation import stage
+from readers import read_raw_chunks
+from sketches import frame_sketch, merge_sketches
+from streaming_export import CHUNK_SIZE
+
+DEFAULT_CHUNK_ROWS = 100000
+# Original Vulnerabilities is the export sorted by these, ties in input order
+SORT_KEYS = ["asset_group", "plugin_family"]
+ORIGINAL = "Original Vulnerabilities"
+# rows per block of a sorted run, and how many runs one merge reads at once: a merge holds at most
+# MERGE_FAN_IN blocks, more runs are merged in several passes
+MERGE_BLOCK_ROWS = 10000
+MERGE_FAN_IN = 16
+ROW = "__row"
+RUN = "__run"
+
+# Frames appended to a file one after another and read back in the same order, so a sheet's rows can be
+# collected as chunks arrive without being held in memory
+def new_spool(path):
+    return {"path": path, "file": open(path, "wb"), "rows": 0}
+
+def spool_append(spool, frame):
+    if len(frame):
+        pickle.dump(frame, spool["file"], protocol=pickle.HIGHEST_PROTOCOL)
+        spool["rows"] += len(frame)
+
+def close_spool(spool):
+    spool["file"].close()
+    return spool
+
+# The spooled frames, without the first skip rows
+def spool_frames(spool, skip=0):
+    with open(spool["path"], "rb") as f:
+        while True:
+            try:
+                frame = pickle.load(f)
+            except EOFError:
+                return
+            if skip:
+                frame, skip = frame.iloc[skip:], max(skip - len(frame), 0)
+            if len(frame):
+                yield frame
+
+# frames cut into slices of at most size rows, the pieces the sheet writer turns into XML at a time
+def rechunk(frames, size=CHUNK_SIZE):
+    for frame in frames:
+        for start in range(0, len(frame), size):
+            yield frame.iloc[start:start + size]
+
+# Rows in Original's order: by the sort keys, missing keys last, then by position in the export
+def sort_rows(frame):
+    return frame.sort_values(SORT_KEYS + [ROW], na_position="last", kind="stable", ignore_index=True)
+
+# k-way merge of sorted runs (iterators of sorted frames carrying ROW), as sorted frames. The loaded
+# blocks are sorted together and everything up to the earliest last row of a run that has more blocks
+# is emitted: that run's next block sorts after it, so nothing still to come can go before those rows
+def merge_runs(runs):
+    runs = list(runs)
+    live = set(range(len(runs)))
+    pending = None
+    while True:
+        blocks = [] if pending is None else [pending]
+        loaded = set() if pending is None else set(pending[RUN].unique())
+        for i in sorted(live - loaded):
+            block = next(runs[i], None)
+            if block is None:
+                live.discard(i)
+            else:
+                blocks.append(block.assign(**{RUN: i}))
+        if not blocks:
+            return
+        merged = sort_rows(pd.concat(blocks, ignore_index=True))
+        if not live:
+            yield merged.drop(columns=RUN)
+            return
+        run_ids = merged[RUN].to_numpy()
+        bound = min(np.flatnonzero(run_ids == i)[-1] for i in live)
+        yield merged.iloc[:bound + 1].drop(columns=RUN)
+        pending = merged.iloc[bound + 1:]
+
+# External merge sort over the spooled runs: merge passes of MERGE_FAN_IN runs into new runs until one
+# merge can take them all, then that merge as an iterator of sorted frames
+def external_sort(runs, directory, fan_in=MERGE_FAN_IN):
+    level = 0
+    while len(runs) > fan_in:
+        merged_runs = []
+        for start in range(0, len(runs), fan_in):
+            spool = new_spool(os.path.join(directory, f"merge{level}_{start}.pkl"))
+            for frame in merge_runs(spool_frames(run) for run in runs[start:start + fan_in]):
+                spool_append(spool, frame)
+            merged_runs.append(close_spool(spool))
+        for run in runs:
+            os.remove(run["path"])
+        runs, level = merged_runs, level + 1
+    return merge_runs(spool_frames(run) for run in runs)
+
+# One pass over the export a chunk at a time: derive each chunk, fold it into the aggregation cube and
+# the column widths, append its rows to each detail sheet's spool and its sorted Original rows to a run
+# of its own, and to the history store's recorder if there is one. Only one chunk's frames exist at a time.
+# native_pivots spools the Pivot Data sheet's rows as well; approximate merges each chunk's sketch into one
+# (None when not approximate)
+def scan_chunks(path, today, severity_thresholds, fmt, chunk_size, directory, recorder=None, native_pivots=False, approximate=False):
+    cube = None
+    sketch = None
+    sheet_names = DETAIL_SHEETS + ([PIVOT_DATA] if native_pivots else [])
+    spools = {sheet_name: new_spool(os.path.join(directory, f"sheet{i}.pkl")) for i, sheet_name in enumerate(sheet_names) if sheet_name != ORIGINAL}
+    runs = []
+    firsts = {}
+    widths = {}
+    n_rows = 0
+    for raw_chunk in read_raw_chunks(path, fmt, chunk_size):
+        with stage("chunk", rows=len(raw_chunk)):
+            df, sla = derive_frame(raw_chunk, today, severity_thresholds)
+            detail_frames = split_frames(raw_chunk, df, sla)[0]
+            if native_pivots:
+                detail_frames[PIVOT_DATA] = pivot_data_view(df)
+            if recorder is not None:
+                record_frame(recorder, df, sla)
+            chunk_cube = aggregate_cube(df, offset=n_rows)
+            cube = chunk_cube if cube is None else merge_cubes([cube, chunk_cube])
+            if approximate:
+                chunk_sketch = frame_sketch(df)
+                sketch = chunk_sketch if sketch is None else merge_sketches(sketch, chunk_sketch)
+            width_cache = {}
+            for sheet_name, view in detail_frames.items():
+                chunk_widths = view_widths(view, width_cache)
+                widths[sheet_name] = np.maximum(widths.get(sheet_name, chunk_widths), chunk_widths)
+                frame = view_frame(view)
+                if sheet_name not in firsts or (firsts[sheet_name].empty and len(frame)):
+                    firsts[sheet_name] = frame.iloc[:1]
+                if sheet_name == ORIGINAL:
+                    # this chunk's rows in Original's order are one sorted run
+                    frame[ROW] = view["rows"] + n_rows
+                    run = new_spool(os.path.join(directory, f"run{len(runs)}.pkl"))
+                    for start in range(0, len(frame), MERGE_BLOCK_ROWS):
+                        spool_append(run, frame.iloc[start:start + MERGE_BLOCK_ROWS])
+                    runs.append(close_spool(run))
+                else:
+                    spool_append(spools[sheet_name], frame)
+            n_rows += len(raw_chunk)
+    if cube is None:
+        raise ValueError(f"{path} holds no findings")
+    return cube, {sheet_name: close_spool(spool) for sheet_name, spool in spools.items()}, runs, firsts, widths, n_rows, sketch
+
+# Original's hyperlink targets and banding rows from the size of each (asset_group, plugin_family) group,
+# without the sorted rows: a group starts after every group that sorts before it
+def sorted_groups(cube):
+    sizes = cube.groupby(SORT_KEYS, dropna=False, observed=True, sort=True)["rows"].sum()
+    keys = sizes.index.to_frame(index=False)
+    positions = np.concatenate([[0], np.cumsum(sizes.to_numpy())[:-1]])
+    links = []
+    for columns in (["asset_group"], SORT_KEYS):
+        starts = keys[columns].ne(keys[columns].shift()).any(axis=1).to_numpy()
+        links.append(group_links(keys[starts], positions[starts], columns))
+    asset_group_links, asset_group_family_links = links
+    # as in split_frames, the findings with no asset group (sorted last) are one band
+    return asset_group_links, asset_group_family_links, positions[group_starts(keys["asset_group"])] + 2
+
+# Build a dashboard from an export that need not fit in memory: it is read chunk_size rows at a time and
+# memory stays bounded by the chunk size (and the number of distinct groups), not the export's size.
+# The detail rows wait in spool files next to newfile until the workbook's stubs are saved, then are
+# streamed into it; Original's order comes from an external merge sort of per-chunk sorted runs
+def build_out_of_core(path, newfile, source_file="./template.xlsm", today=None, severity_thresholds=SEVERITY_THRESHOLDS, fmt=None,
+                      chunk_size=DEFAULT_CHUNK_ROWS, max_charts=MAX_CHARTS, sheet_workers=1, history=None, native_pivots=False, approximate=False):
+    with tempfile.TemporaryDirectory(prefix=".spool", dir=os.path.dirname(os.path.abspath(newfile))) as directory:
+        source = history_source(newfile)
+        with stage("scan") as record, (recording(history, source, today) if history is not None else nullcontext()) as recorder:
+            cube, spools, runs, firsts, widths, n_rows, sketch = scan_chunks(path, today, severity_thresholds, fmt, chunk_size, directory,
+                                                                                recorder, native_pivots, approximate)
+            record["rows"] = n_rows
+        trend = trend_table(history, source, today) if history is not None else None
+        with stage("tables", rows=n_rows):
+            asset_group_links, asset_group_family_links, group_start_rows = sorted_groups(cube)
+            tables, critical_value = build_tables(None, asset_group_links, asset_group_family_links, cube=cube, pivots=not native_pivots,
+                                                  sketch=sketch)
+        with stage("sort", rows=n_rows):
+            original = external_sort(runs, directory)
+            first_block = next(original, None)
+        spools[ORIGINAL] = {"rows": n_rows}
+        original_chunks = iter([])
+        if first_block is not None:
+            first_block = first_block.drop(columns=ROW)
+            firsts[ORIGINAL] = first_block.iloc[:1]
+            original_chunks = chain([first_block.iloc[1:]], (frame.drop(columns=ROW) for frame in original))
+
+        headline_values = (n_rows, spools["Overdue Vulnerabilities"]["rows"], spools["Non-Overdue Vulnerabilities"]["rows"], critical_value)
+        if sketch is not None:
+            headline_values = sketch_headline(sketch, critical_value)
+        sheets = []
+        detail_rows = {}
+        for sheet_name in DETAIL_SHEETS:
+            sheet_rows = spools[sheet_name]["rows"]
+            group_rows = group_start_rows if sheet_name == ORIGINAL else None
+            step = partial(write_stub, sheet_name=sheet_name, first_rows=firsts[sheet_name], n_rows=sheet_rows,
+                           widths=widths[sheet_name], group_start_rows=group_rows)
+            sheets.append((sheet_name, step, (firsts[sheet_name], group_rows, widths[sheet_name])))
+            chunks = original_chunks if sheet_name == ORIGINAL else spool_frames(spools[sheet_name], skip=1)
+            detail_rows[sheet_name] = (max(sheet_rows - 1, 0), firsts[sheet_name].shape[1], rechunk(chunks))
+        pivots = native_pivot_cache(cube, n_rows) if native_pivots else None
+        sheets += summary_sheets(tables, headline_values, max_charts, trend, pivots)
+        if native_pivots:
+            sheet_rows = spools[PIVOT_DATA]["rows"]
+            step = partial(write_hidden, sheet_name=PIVOT_DATA, step=partial(write_stub, sheet_name=PIVOT_DATA, first_rows=firsts[PIVOT_DATA],
+                                                                              n_rows=sheet_rows, widths=widths[PIVOT_DATA]))
+            sheets.append((PIVOT_DATA, step, (firsts[PIVOT_DATA], None, widths[PIVOT_DATA])))
+            detail_rows[PIVOT_DATA] = (max(sheet_rows - 1, 0), firsts[PIVOT_DATA].shape[1], rechunk(spool_frames(spools[PIVOT_DATA], skip=1)))
+        return write_dashboard(newfile, source_file, sheets, detail_rows, streaming=True, sheet_workers=sheet_workers)
@@ -0,0 +1,118 @@
+import os
+import re
+import secrets
+import time
+import traceback
+from datetime import datetime
+
+import pandas as pd
+
+from dashboard_creation import SEVERITY_THRESHOLDS, aggregate_cube, build_dashboard, dashboard_path, load_frames
+from frame_cache import DEFAULT_CACHE_DIR
+from instrumentation import stage
+from streaming_export import part_pool
+from templates import template_entry
+
+PARTITION_COLUMN = "asset_group"
+# the partition of findings with no asset group
+UNASSIGNED = "Unassigned"
+
+# Frames being partitioned, by run: (raw_df, df, sla), the finding positions of each partition and the slice
+# of the aggregation cube each one gets. Set before the pool forks, so workers inherit them and no frame is pickled
+_partitioned = {}
+
+# Dashboard of one partition: the export's dashboard name with the group appended, reduced to characters
+# that are safe in a file name
+def partition_path(path, group, output_dir=None):
+    base, extension = os.path.splitext(dashboard_path(path, output_dir))
+    label = re.sub(r"[^\w.-]+", "_", group).strip("_") or "_"
+    return f"{base}_{label}{extension}"
+
+# Partition name of an asset group value
+def group_label(key):
+    key = key[0] if isinstance(key, tuple) else key
+    return UNASSIGNED if pd.isna(key) else str(key)
+
+# Finding positions and cube slice of every asset group, in group order (UNASSIGNED last). The cube is the
+# one grouped pass over all findings; each partition's roll-ups come from its slice of it. Raises if two groups
+# share a label (an asset group named UNASSIGNED next to findings with none), rather than drop one of them
+def partition_groups(df, cube):
+    # factorized rather than grouped: groupby(...).indices leaves out a categorical column's missing values
+    codes, keys = pd.factorize(df[PARTITION_COLUMN], use_na_sentinel=False)
+    positions = {group_label(keys[code]): rows for code, rows in pd.Series(codes).groupby(codes).indices.items()}
+    if len(positions) < len(keys):
+        labels = [group_label(key) for key in keys]
+        clashes = sorted({label for label in labels if labels.count(label) > 1})
+        raise ValueError(f"Several asset groups would be the same partition: {', '.join(clashes)}")
+    return {
+        group_label(key): (positions[group_label(key)], cube_part.reset_index(drop=True))
+        for key, cube_part in cube.groupby([PARTITION_COLUMN], dropna=False, observed=True, sort=True)
+    }
+
+# Build the dashboard of one partition from the inherited frames, reporting how it went instead of raising
+# (as batch.build_one does), so one partition can't take down the others
+def build_partition(run, group, newfile, **options):
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    frames, groups, path = _partitioned[run]
+    result = {"input": f"{path} [{group}]", "output": newfile, "ok": True, "error": None}
+    try:
+        rows, cube = groups[group]
+        raw_df, df, sla = (frame.iloc[rows].reset_index(drop=True) for frame in frames)
+        build_dashboard(raw_df, newfile, derived=(df, sla), cube=cube, **options)
+    except Exception as exc:
+        result.update(ok=False, error=f"{type(exc).__name__}: {exc}", traceback=traceback.format_exc())
+    result["seconds"] = time.perf_counter() - start
+    result["cpu_seconds"] = time.process_time() - cpu_start
+    return result
+
+# One dashboard per asset group of a raw export, each written from template.xlsm next to the export (or in
+# output_dir) as partition_path names it. The export is read and derived once (through the frame cache) and
+# aggregated in one grouped pass; the partitions are cut from those frames and written on a pool of workers
+# (every core when None; 1 writes them in this process), so an extra partition costs about its own write.
+# options go to build_dashboard. Returns one result per partition, in group order, as batch.build_many does
+def build_partitions(path, output_dir=None, workers=None, source_file="./template.xlsm", today=None, severity_thresholds=SEVERITY_THRESHOLDS,
+                     fmt=None, cache_dir=DEFAULT_CACHE_DIR, backend="pandas", on_result=None, **options):
+    if today is None:
+        today = datetime.today()
+    raw_df, df, sla = load_frames(path, today, severity_thresholds, fmt, cache_dir, backend=backend)
+    with stage("partition", rows=len(df)) as record:
+        groups = partition_groups(df, aggregate_cube(df))
+        record["partitions"] = len(groups)
+    outputs = {group: partition_path(path, group, output_dir) for group in groups}
+    duplicates = sorted({output for output in outputs.values() if list(outputs.values()).count(output) > 1})
+    if duplicates:
+        raise ValueError(f"Several asset groups would write the same dashboard: {', '.join(duplicates)}")
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+    options.update(source_file=source_file, today=today, severity_thresholds=severity_thresholds)
+    # read the template now, so forked workers inherit it instead of each reading it again
+    template_entry(source_file)
+
+    run = secrets.token_hex(8)
+    _partitioned[run] = ((raw_df, df, sla), groups, path)
+    results = []
+    try:
+        workers = min(workers or os.cpu_count() or 1, len(groups) or 1)
+        if workers == 1:
+            for group, newfile in outputs.items():
+                results.append(build_partition(run, group, newfile, **options))
+                if on_result is not None:
+                    on_result(results[-1])
+            return results
+        with part_pool(workers) as pool:
+            # largest first, so the pool isn't left waiting on one big partition at the end
+            order = sorted(outputs, key=lambda group: -len(groups[group][0]))
+            futures = {group: pool.submit(build_partition, run, group, outputs[group], **options) for group in order}
+            for group in outputs:
+                try:
+                    results.append(futures[group].result())
+                except Exception as exc:
+                    # the worker itself died (e.g. killed for memory); build_partition never raises
+                    results.append({"input": f"{path} [{group}]", "output": outputs[group], "ok": False, "error": f"{type(exc).__name__}: {exc}",
+                                    "seconds": None, "cpu_seconds": None})
+                if on_result is not None:
+                    on_result(results[-1])
+        return results
+    finally:
+        del _partitioned[run]
@@ -0,0 +1,115 @@
+import os
+from itertools import islice
+
+import pandas as pd
+
+DATE_COLUMNS = ["patch_publication_date", "first_observed_date", "last_observed_date"]
+DATE_FORMAT = "%d/%m/%Y %H:%M:%S"
+CATEGORY_COLUMNS = ["severity", "asset_group", "plugin_family"]
+
+# time columns conversion; columns the reader already parsed are left as they are
+def parse_dates(df, date_format=DATE_FORMAT):
+    for col in DATE_COLUMNS:
+        if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], format=date_format)
+    return df
+
+def categorize(df):
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    return df
+
+def read_xlsx(path):
+    return pd.read_excel(path)
+
+def read_csv(path):
+    return pd.read_csv(path, dtype={col: "category" for col in CATEGORY_COLUMNS})
+
+# Parquet and Arrow IPC (Feather v2) need pyarrow installed
+def read_parquet(path):
+    return pd.read_parquet(path)
+
+def read_arrow(path):
+    return pd.read_feather(path)
+
+READERS = {
+    "xlsx": read_xlsx,
+    "csv": read_csv,
+    "parquet": read_parquet,
+    "arrow": read_arrow,
+}
+EXTENSIONS = {
+    ".xlsx": "xlsx",
+    ".xlsm": "xlsx",
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+}
+
+def input_format(path, fmt=None):
+    if fmt is None:
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in EXTENSIONS:
+            raise ValueError(f"Cannot tell the input format of {path}; pass one of {sorted(READERS)}")
+        fmt = EXTENSIONS[extension]
+    if fmt not in READERS:
+        raise ValueError(f"Unknown input format {fmt!r}; expected one of {sorted(READERS)}")
+    return fmt
+
+# Load a raw scan export as a frame with parsed dates and categorical severity/asset_group/plugin_family.
+# fmt overrides the format picked from the file extension
+def read_raw(path, fmt=None):
+    df = READERS[input_format(path, fmt)](path)
+    return categorize(parse_dates(df))
+
+# Chunked readers: the export as consecutive frames of at most chunk_size rows, so a file larger than
+# memory can be processed a piece at a time
+def read_xlsx_chunks(path, chunk_size):
+    from openpyxl import load_workbook
+    # first sheet, as pd.read_excel reads it; read-only mode parses rows as they are asked for
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = list(next(rows, []))
+        while True:
+            block = list(islice(rows, chunk_size))
+            if not block:
+                break
+            yield pd.DataFrame(block, columns=header).infer_objects()
+    finally:
+        wb.close()
+
+def read_csv_chunks(path, chunk_size):
+    with pd.read_csv(path, dtype={col: "category" for col in CATEGORY_COLUMNS}, chunksize=chunk_size) as reader:
+        yield from reader
+
+def read_parquet_chunks(path, chunk_size):
+    import pyarrow.parquet as pq
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+        yield batch.to_pandas()
+
+def read_arrow_chunks(path, chunk_size):
+    import pyarrow as pa
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            for start in range(0, batch.num_rows, chunk_size):
+                yield batch.slice(start, chunk_size).to_pandas()
+
+CHUNK_READERS = {
+    "xlsx": read_xlsx_chunks,
+    "csv": read_csv_chunks,
+    "parquet": read_parquet_chunks,
+    "arrow": read_arrow_chunks,
+}
+
+# read_raw a chunk at a time: each chunk is parsed as read_raw parses a whole file and indexed from 0.
+# Categories are those of the chunk, so they differ between chunks
+def read_raw_chunks(path, fmt=None, chunk_size=100000):
+    for chunk in CHUNK_READERS[input_format(path, fmt)](path, chunk_size):
+        yield categorize(parse_dates(chunk.reset_index(drop=True)))
@@ -0,0 +1,415 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from functools import partial
+from urllib.parse import parse_qs, urlsplit
+
+from batch import build_one
+from dashboard_creation import MAX_CHARTS, dashboard_path
+from frame_cache import DEFAULT_CACHE_DIR
+from readers import input_format
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "template.xlsm")
+DEFAULT_WORKERS = 2
+# jobs waiting for a worker; past this, uploads are turned away with 503 until the queue drains
+DEFAULT_QUEUE_SIZE = 16
+DEFAULT_MAX_UPLOAD = 512 << 20
+# finished jobs kept, with their files, for dedupe and download; the oldest go first
+DEFAULT_KEEP_JOBS = 64
+RETRY_AFTER_S = 5
+LATENCY_WINDOW = 1000
+# ids of pruned jobs remembered, so their links answer 410 rather than 404
+PRUNED_WINDOW = 1000
+STREAM_BLOCK = 1 << 20
+MAX_HEADER_LINES = 100
+UPLOAD_EXTENSIONS = {"xlsx": ".xlsx", "csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+XLSM_TYPE = "application/vnd.ms-excel.sheet.macroEnabled.12"
+REASONS = {
+    200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 410: "Gone",
+    411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+# Local HTTP service around build_one: upload a raw export, get the dashboard back.
+#   POST /dashboards?filename=export.csv   upload, wait for the build, stream the .xlsm back
+#   POST /jobs?filename=export.csv         upload and return the queued job at once (202)
+#   GET  /jobs/<id>                        job status and latency metrics
+#   GET  /jobs/<id>/dashboard              the .xlsm once the job is done (202 with the status until then)
+#   GET  /metrics                          queue depth, job counts and latency percentiles
+# format= can stand in for filename=. The same bytes with the same options map to the same job, so an
+# identical upload joins the job already queued, running or finished instead of building again
+def new_state(work_dir, template, workers, queue_size, max_upload, keep_jobs, cache_dir, max_charts, executor):
+    return {
+        "work_dir": work_dir,
+        "template": template,
+        "workers": workers,
+        "max_upload": max_upload,
+        "keep_jobs": keep_jobs,
+        "build_options": {"source_file": template, "cache_dir": cache_dir, "max_charts": max_charts},
+        "executor": executor,
+        "queue": asyncio.Queue(queue_size),
+        "jobs": {},
+        "latencies": deque(maxlen=LATENCY_WINDOW),
+        "pruned": deque(maxlen=PRUNED_WINDOW),
+        "counts": {"submitted": 0, "deduplicated": 0, "rejected": 0, "done": 0, "failed": 0},
+        "started": time.time(),
+    }
+
+def new_job(job_id, input_path, fmt, today, download_name, input_bytes):
+    return {
+        "id": job_id,
+        "status": "queued",
+        "input": input_path,
+        "output": dashboard_path(input_path),
+        "fmt": fmt,
+        "today": today,
+        "download_name": download_name,
+        "error": None,
+        "submitted": time.time(),
+        "started": None,
+        "finished": None,
+        "metrics": {"input_bytes": input_bytes},
+        "done": asyncio.Event(),
+        # handlers waiting on or sending the job; its files stay until they are done
+        "readers": 0,
+    }
+
+def job_view(job):
+    return {
+        "id": job["id"],
+        "status": job["status"],
+        "submitted": datetime.fromtimestamp(job["submitted"]).isoformat(timespec="seconds"),
+        "error": job["error"],
+        "metrics": job["metrics"],
+        "dashboard": f"/jobs/{job['id']}/dashboard",
+    }
+
+# Same upload, same options, same day -> same job id; the job compares against the time it was first submitted
+def job_key(upload_digest, fmt, today, build_options):
+    digest = hashlib.sha256(upload_digest.encode())
+    digest.update(json.dumps({"fmt": fmt, "today": today.date().isoformat(), **build_options}, sort_keys=True, default=str).encode())
+    return digest.hexdigest()[:24]
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def server_metrics(state):
+    latencies = list(state["latencies"])
+    statuses = {}
+    for job in state["jobs"].values():
+        statuses[job["status"]] = statuses.get(job["status"], 0) + 1
+    return {
+        "uptime_s": time.time() - state["started"],
+        "workers": state["workers"],
+        "queue_depth": state["queue"].qsize(),
+        "queue_size": state["queue"].maxsize,
+        "jobs": statuses,
+        "counts": state["counts"],
+        "latency_s": {
+            "samples": len(latencies),
+            "p50": percentile(latencies, 0.5),
+            "p95": percentile(latencies, 0.95),
+            "max": max(latencies, default=None),
+        },
+    }
+
+def remove_job_files(job):
+    for path in (job["input"], job["output"]):
+        if os.path.exists(path):
+            os.remove(path)
+
+# Drop the oldest finished jobs past keep_jobs; queued and running jobs are never dropped, nor are jobs
+# a handler is still waiting on or sending (they go once it is done, see reading)
+def prune_jobs(state):
+    finished = [job for job in state["jobs"].values() if job["finished"] is not None]
+    excess = len(finished) - state["keep_jobs"]
+    for job in finished:
+        if excess <= 0:
+            break
+        if job["readers"]:
+            continue
+        del state["jobs"][job["id"]]
+        state["pruned"].append(job["id"])
+        remove_job_files(job)
+        excess -= 1
+
+# Hold job for a handler that waits on it or sends its dashboard, then prune what it held back
+@contextmanager
+def reading(state, job):
+    job["readers"] += 1
+    try:
+        yield job
+    finally:
+        job["readers"] -= 1
+        prune_jobs(state)
+
+def finish_job(state, job, result):
+    job["finished"] = time.time()
+    job["status"] = "done" if result["ok"] else "failed"
+    job["error"] = result["error"]
+    job["metrics"].update(
+        queue_s=job["started"] - job["submitted"],
+        build_s=result["seconds"],
+        cpu_s=result["cpu_seconds"],
+        total_s=job["finished"] - job["submitted"],
+        output_bytes=os.path.getsize(job["output"]) if result["ok"] else None,
+    )
+    state["counts"][job["status"]] += 1
+    state["latencies"].append(job["metrics"]["total_s"])
+    job["done"].set()
+    print(f"{job['metrics']['total_s']:8.2f}s  job {job['id']}  {job['status']}"
+          + (f" {job['error'].splitlines()[0]}" if job["error"] else ""), flush=True)
+    prune_jobs(state)
+
+# One of `workers` consumers: builds run in the executor, so the event loop only ever waits on them
+async def run_jobs(state):
+    loop = asyncio.get_running_loop()
+    while True:
+        job = await state["queue"].get()
+        job["status"] = "running"
+        job["started"] = time.time()
+        build = partial(build_one, job["input"], job["output"], today=job["today"], fmt=job["fmt"], **state["build_options"])
+        try:
+            result = await loop.run_in_executor(state["executor"], build)
+        except Exception as exc:
+            # the pool itself failed (e.g. a worker was killed); build_one never raises
+            result = {"ok": False, "error": f"{type(exc).__name__}: {exc}", "seconds": None, "cpu_seconds": None}
+        finish_job(state, job, result)
+        state["queue"].task_done()
+
+# Request line and headers; None when the client closed the connection before sending anything
+async def read_request(reader):
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split()
+    except ValueError:
+        raise ValueError(f"Malformed request line {line[:100]!r}")
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise ValueError("Too many header lines")
+    url = urlsplit(target)
+    query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+    return method.upper(), url.path, query, headers
+
+# Copy length bytes of request body to path, hashing as they arrive
+async def receive_upload(reader, length, path):
+    digest = hashlib.sha256()
+    remaining = length
+    with open(path, "wb") as f:
+        while remaining:
+            block = await reader.read(min(STREAM_BLOCK, remaining))
+            if not block:
+                raise ValueError(f"Upload ended {remaining} bytes short")
+            digest.update(block)
+            f.write(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+async def send_response(writer, status, body=b"", content_type="application/json", headers=None):
+    head = [f"HTTP/1.1 {status} {REASONS[status]}", f"Content-Type: {content_type}", f"Content-Length: {len(body)}", "Connection: close"]
+    head += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+async def send_json(writer, status, payload, headers=None):
+    await send_response(writer, status, json.dumps(payload, indent=2).encode(), headers=headers)
+
+# Stream a finished dashboard in blocks, so a large file never sits in memory; 410 if the file is gone
+async def send_dashboard(writer, job):
+    try:
+        f = open(job["output"], "rb")
+    except FileNotFoundError:
+        return await send_json(writer, 410, {"error": f"The dashboard of job {job['id']} is no longer kept"})
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        head = [
+            "HTTP/1.1 200 OK", f"Content-Type: {XLSM_TYPE}", f"Content-Length: {size}", "Connection: close",
+            f'Content-Disposition: attachment; filename="{job["download_name"]}"', f"X-Job-Id: {job['id']}",
+        ]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+        for block in iter(lambda: f.read(STREAM_BLOCK), b""):
+            writer.write(block)
+            await writer.drain()
+
+async def send_job_result(writer, job):
+    if job["status"] == "done":
+        await send_dashboard(writer, job)
+    elif job["status"] == "failed":
+        await send_json(writer, 500, job_view(job))
+    else:
+        await send_json(writer, 202, job_view(job))
+
+# Take an upload and queue its job, or hand back the job an identical upload already has.
+# Returns (job, None) or (None, (status, payload, headers)) when the upload is refused
+async def submit_job(state, reader, headers, query):
+    filename = os.path.basename(query.get("filename", ""))
+    try:
+        fmt = input_format(filename, query.get("format"))
+    except ValueError as exc:
+        return None, (400, {"error": str(exc)}, None)
+    if "content-length" not in headers:
+        return None, (411, {"error": "Content-Length is required"}, None)
+    length = headers["content-length"]
+    if not length.isdecimal():
+        return None, (400, {"error": f"Content-Length must be a non-negative integer, not {length[:20]!r}"}, None)
+    length = int(length)
+    if length > state["max_upload"]:
+        return None, (413, {"error": f"Uploads are limited to {state['max_upload']} bytes"}, None)
+    # backpressure: refuse before reading the body, so a saturated server does no work for the request
+    if state["queue"].full():
+        state["counts"]["rejected"] += 1
+        return None, (503, {"error": "Build queue is full", **server_metrics(state)}, {"Retry-After": RETRY_AFTER_S})
+
+    fd, upload_path = tempfile.mkstemp(suffix=".upload", dir=state["work_dir"])
+    os.close(fd)
+    try:
+        upload_digest = await receive_upload(reader, length, upload_path)
+        today = datetime.today()
+        job_id = job_key(upload_digest, fmt, today, state["build_options"])
+        job = state["jobs"].get(job_id)
+        if job is not None and job["status"] != "failed":
+            state["counts"]["deduplicated"] += 1
+            return job, None
+        if state["queue"].full():
+            state["counts"]["rejected"] += 1
+            return None, (503, {"error": "Build queue is full", **server_metrics(state)}, {"Retry-After": RETRY_AFTER_S})
+        input_path = os.path.join(state["work_dir"], f"{job_id}_raw{UPLOAD_EXTENSIONS[fmt]}")
+        os.replace(upload_path, input_path)
+        download_name = os.path.basename(dashboard_path(filename)) if filename else f"{job_id}.xlsm"
+        job = new_job(job_id, input_path, fmt, today, download_name, length)
+        state["jobs"][job_id] = job
+        state["queue"].put_nowait(job)
+        state["counts"]["submitted"] += 1
+        return job, None
+    finally:
+        if os.path.exists(upload_path):
+            os.remove(upload_path)
+
+async def handle_request(state, reader, writer, method, path, query, headers):
+    parts = [part for part in path.split("/") if part]
+    if parts in (["jobs"], ["dashboards"]):
+        if method != "POST":
+            return await send_json(writer, 405, {"error": f"{path} takes POST"})
+        job, refused = await submit_job(state, reader, headers, query)
+        if refused is not None:
+            return await send_json(writer, *refused)
+        if parts == ["jobs"]:
+            return await send_json(writer, 202 if job["finished"] is None else 200, job_view(job))
+        with reading(state, job):
+            await job["done"].wait()
+            return await send_job_result(writer, job)
+    if method != "GET":
+        return await send_json(writer, 405, {"error": f"{path} takes GET"})
+    if parts == ["metrics"]:
+        return await send_json(writer, 200, server_metrics(state))
+    if len(parts) in (2, 3) and parts[0] == "jobs" and parts[1] in state["jobs"]:
+        job = state["jobs"][parts[1]]
+        if len(parts) == 2:
+            return await send_json(writer, 200, job_view(job))
+        if parts[2] == "dashboard":
+            with reading(state, job):
+                return await send_job_result(writer, job)
+    if len(parts) in (2, 3) and parts[0] == "jobs" and parts[1] in state["pruned"]:
+        return await send_json(writer, 410, {"error": f"Job {parts[1]} finished and is no longer kept"})
+    await send_json(writer, 404, {"error": f"Nothing at {path}"})
+
+# One request per connection
+async def handle_connection(state, reader, writer):
+    try:
+        request = await read_request(reader)
+        if request is not None:
+            await handle_request(state, reader, writer, *request)
+    except ValueError as exc:
+        await send_json(writer, 400, {"error": str(exc)})
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+# Start listening and start the consumers; returns (server, state). For embedding and local testing;
+# serve() runs it until interrupted. executor is "process" or "thread"
+async def start_server(host=DEFAULT_HOST, port=DEFAULT_PORT, work_dir=None, template=DEFAULT_TEMPLATE, workers=DEFAULT_WORKERS,
+                       queue_size=DEFAULT_QUEUE_SIZE, max_upload=DEFAULT_MAX_UPLOAD, keep_jobs=DEFAULT_KEEP_JOBS,
+                       cache_dir=DEFAULT_CACHE_DIR, max_charts=MAX_CHARTS, executor="process"):
+    if not os.path.exists(template):
+        raise FileNotFoundError(f"Template {template} does not exist")
+    if work_dir is None:
+        work_dir = tempfile.mkdtemp(prefix="dashboard-jobs-")
+    os.makedirs(work_dir, exist_ok=True)
+    pool = (ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor)(max_workers=workers)
+    state = new_state(os.path.abspath(work_dir), os.path.abspath(template), workers, queue_size, max_upload, keep_jobs,
+                      os.path.abspath(cache_dir), max_charts, pool)
+    state["consumers"] = [asyncio.create_task(run_jobs(state)) for _ in range(workers)]
+    server = await asyncio.start_server(partial(handle_connection, state), host, port)
+    return server, state
+
+async def stop_server(server, state, remove_work_dir=False):
+    server.close()
+    await server.wait_closed()
+    for consumer in state["consumers"]:
+        consumer.cancel()
+    await asyncio.gather(*state["consumers"], return_exceptions=True)
+    state["executor"].shutdown(cancel_futures=True)
+    if remove_work_dir:
+        shutil.rmtree(state["work_dir"], ignore_errors=True)
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, **options):
+    server, state = await start_server(host, port, **options)
+    print(f"listening on http://{host}:{server.sockets[0].getsockname()[1]}  ({state['workers']} workers, jobs in {state['work_dir']})", flush=True)
+    try:
+        await server.serve_forever()
+    finally:
+        await stop_server(server, state)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve dashboard builds over HTTP on this machine.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="(default: %(default)s)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="(default: %(default)s)")
+    parser.add_argument("-j", "--workers", type=int, default=DEFAULT_WORKERS, help="concurrent builds (default: %(default)s)")
+    parser.add_argument("--executor", choices=["process", "thread"], default="process", help="(default: %(default)s)")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE, help="queued builds before uploads get 503 (default: %(default)s)")
+    parser.add_argument("--max-upload", type=int, default=DEFAULT_MAX_UPLOAD, help="largest upload in bytes (default: %(default)s)")
+    parser.add_argument("--keep-jobs", type=int, default=DEFAULT_KEEP_JOBS, help="finished jobs kept for download (default: %(default)s)")
+    parser.add_argument("--work-dir", help="where uploads and dashboards are kept (default: a new temporary directory)")
+    parser.add_argument("--template", default=DEFAULT_TEMPLATE, help="macro-enabled template to copy (default: %(default)s)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="parsed frame cache (default: %(default)s)")
+    parser.add_argument("--max-charts", type=int, default=MAX_CHARTS, help="most bar charts per pivot sheet, 0 for no limit (default: %(default)s)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, work_dir=args.work_dir, template=args.template, workers=args.workers,
+                          queue_size=args.queue_size, max_upload=args.max_upload, keep_jobs=args.keep_jobs,
+                          cache_dir=args.cache_dir, max_charts=args.max_charts or None, executor=args.executor))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
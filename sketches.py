@@ -0,0 +1,205 @@
+import math
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+# Approximate statistics in memory bounded by the sketch sizes below, not by the number of findings or of
+# distinct values. Every sketch is a dict of arrays and Series, built from any frame of findings, and two
+# sketches built with the same sizes merge into the sketch of both frames: chunks of an export, or frames
+# sketched in different processes, combine without ever meeting. N below is the number of values counted.
+#
+# Count-Min, width ceil(e / epsilon) and depth ceil(ln(1 / delta)): an estimate is never below the true
+# count and, with probability at least 1 - delta, at most epsilon * N above it.
+# Space-Saving with k counters: keeps every value counted more than N / k times (so the top values of any
+# table shorter than k rows are all present), and a kept value's count is at most N / k above its true count;
+# the sketch records that bound per value as its error. Merging keeps both guarantees.
+# HyperLogLog with 2**p registers: a distinct count with relative standard error about 1.04 / sqrt(2**p)
+# (1.6% at p=12), from 2**p bytes.
+# Values are counted SKETCH_BLOCK_ROWS at a time (each block's exact counts are a Space-Saving sketch with no
+# error, merged in), so no table of counts holds more than one block's distinct values.
+DEFAULT_EPSILON = 0.001
+DEFAULT_DELTA = 0.01
+DEFAULT_COUNTERS = 64
+DEFAULT_PRECISION = 12
+SKETCH_BLOCK_ROWS = 65536
+# the columns the Summary tables count, the column distinct plugins are counted per value of, and what is counted
+SKETCHED = ["overdue", "severity", "asset_group", "plugin_family"]
+DISTINCT_BY = "asset_group"
+DISTINCT_OF = "plugin_id"
+
+# 64-bit hashes of values, equal for equal values whatever the dtype (numbers are hashed as float64, so a
+# chunk where a column holds missing values hashes its integers as the other chunks do)
+def value_hashes(values):
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        values = values.astype("float64")
+    return pd.util.hash_pandas_object(values, index=False).to_numpy()
+
+def count_min(epsilon=DEFAULT_EPSILON, delta=DEFAULT_DELTA):
+    depth, width = math.ceil(math.log(1 / delta)), math.ceil(math.e / epsilon)
+    return {"table": np.zeros((depth, width), dtype="int64"), "total": 0}
+
+# The cell of each hash in every row of a Count-Min table, by double hashing the hash's two halves
+def count_min_cells(table, hashes):
+    depth, width = table.shape
+    low, high = hashes & np.uint64(0xFFFFFFFF), hashes >> np.uint64(32)
+    return [((low + np.uint64(i) * high) % np.uint64(width)).astype("int64") for i in range(depth)]
+
+def count_min_add(sketch, hashes):
+    table = sketch["table"]
+    for i, cells in enumerate(count_min_cells(table, hashes)):
+        table[i] += np.bincount(cells, minlength=table.shape[1])
+    sketch["total"] += len(hashes)
+
+def count_min_estimate(sketch, hashes):
+    table = sketch["table"]
+    return np.min([table[i, cells] for i, cells in enumerate(count_min_cells(table, hashes))], axis=0)
+
+def count_min_merge(a, b):
+    if a["table"].shape != b["table"].shape:
+        raise ValueError("Count-Min sketches of different sizes don't merge")
+    return {"table": a["table"] + b["table"], "total": a["total"] + b["total"]}
+
+def space_saving(k=DEFAULT_COUNTERS):
+    return {"k": k, "counts": pd.Series(dtype="int64"), "errors": pd.Series(dtype="int64"), "total": 0}
+
+# Merge two Space-Saving sketches: a value one of them doesn't keep may have been counted there up to its
+# smallest kept count (0 if it has room left), so that much is added to the value's count and error.
+# The merged sketch keeps k values, the smaller k of the two unless given
+def space_saving_merge(a, b, k=None):
+    if k is None:
+        k = min(a["k"], b["k"])
+    floors = [int(s["counts"].min()) if len(s["counts"]) >= s["k"] else 0 for s in (a, b)]
+    values = a["counts"].index.union(b["counts"].index, sort=False)
+    counts = a["counts"].reindex(values, fill_value=floors[0]) + b["counts"].reindex(values, fill_value=floors[1])
+    errors = a["errors"].reindex(values, fill_value=floors[0]) + b["errors"].reindex(values, fill_value=floors[1])
+    # most counted first, ties by value, so the same input always keeps the same values
+    kept = pd.DataFrame({"count": counts, "value": values.astype(str)}).sort_values(["count", "value"], ascending=[False, True]).index[:k]
+    return {"k": k, "counts": counts[kept].astype("int64"), "errors": errors[kept].astype("int64"), "total": a["total"] + b["total"]}
+
+# Count values (missing values left out), a block at a time: the exact counts of a block's values are a
+# sketch with no error
+def space_saving_add(sketch, values):
+    values = pd.Series(values).dropna()
+    for start in range(0, len(values), SKETCH_BLOCK_ROWS):
+        counts = values.iloc[start:start + SKETCH_BLOCK_ROWS].value_counts(sort=False)
+        # a categorical column counts its unobserved categories too, at 0
+        counts = counts[counts > 0]
+        counts.index = counts.index.astype(object)
+        exact = {"k": len(counts) + 1, "counts": counts.astype("int64"), "errors": pd.Series(0, index=counts.index, dtype="int64"),
+                 "total": int(counts.sum())}
+        sketch = space_saving_merge(sketch, exact, sketch["k"])
+    return sketch
+
+def hyperloglog(p=DEFAULT_PRECISION):
+    return {"registers": np.zeros(1 << p, dtype="uint8")}
+
+# Bits needed to write each value (0 for 0), exactly, by halving in six vectorized steps
+def bit_lengths(values):
+    values = values.copy()
+    lengths = np.zeros(len(values), dtype="uint8")
+    for shift in (32, 16, 8, 4, 2, 1):
+        wide = values >= np.uint64(1 << shift)
+        lengths[wide] += shift
+        values[wide] >>= np.uint64(shift)
+    return lengths + (values > 0)
+
+def hyperloglog_add(sketch, hashes):
+    registers = sketch["registers"]
+    p = int(registers.size).bit_length() - 1
+    rest_bits = 64 - p
+    rest = hashes & np.uint64((1 << rest_bits) - 1)
+    ranks = (rest_bits - bit_lengths(rest) + 1).astype("uint8")
+    np.maximum.at(registers, (hashes >> np.uint64(rest_bits)).astype("int64"), ranks)
+
+def hyperloglog_merge(a, b):
+    if a["registers"].size != b["registers"].size:
+        raise ValueError("HyperLogLog sketches of different precisions don't merge")
+    return {"registers": np.maximum(a["registers"], b["registers"])}
+
+# The distinct count estimate, with linear counting while many registers are still empty
+def hyperloglog_count(sketch):
+    registers = sketch["registers"]
+    m = registers.size
+    estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(np.ldexp(1.0, -registers.astype("int64")))
+    empty = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and empty:
+        estimate = m * math.log(m / empty)
+    return int(round(estimate))
+
+# The sketch of a frame of findings (df from derive_frame): per SKETCHED column a Space-Saving and a Count-Min
+# sketch of its values, and HyperLogLog sketches of the distinct DISTINCT_OF values overall and per DISTINCT_BY
+# value. Only the DISTINCT_BY values Space-Saving keeps get a HyperLogLog of their own; the findings of every
+# other value go into one more, "distinct_rest", so there are never more than k + 2 of them.
+# Merge the sketches of several frames with merge_sketches
+def frame_sketch(df, k=DEFAULT_COUNTERS, epsilon=DEFAULT_EPSILON, delta=DEFAULT_DELTA, p=DEFAULT_PRECISION):
+    sketch = {"rows": len(df), "top": {}, "counts": {}, "distinct": hyperloglog(p), "distinct_by": {}, "distinct_rest": hyperloglog(p)}
+    for col in SKETCHED:
+        values = df[col].dropna()
+        sketch["top"][col] = space_saving_add(space_saving(k), values)
+        sketch["counts"][col] = count_min(epsilon, delta)
+        count_min_add(sketch["counts"][col], value_hashes(values))
+    present = df[DISTINCT_OF].notna().to_numpy()
+    hashes = value_hashes(df[DISTINCT_OF][present])
+    hyperloglog_add(sketch["distinct"], hashes)
+    # findings with no DISTINCT_BY value count only towards the overall sketch, as they count in no Summary row
+    groups = pd.Series(df[DISTINCT_BY].to_numpy()[present], dtype=object)
+    kept = groups.isin(sketch["top"][DISTINCT_BY]["counts"].index).to_numpy()
+    hyperloglog_add(sketch["distinct_rest"], hashes[~kept & groups.notna().to_numpy()])
+    kept_groups, kept_hashes = groups[kept], hashes[kept]
+    for group, positions in kept_groups.groupby(kept_groups).indices.items():
+        sketch["distinct_by"][group] = hyperloglog(p)
+        hyperloglog_add(sketch["distinct_by"][group], kept_hashes[positions])
+    return sketch
+
+# Merge the sketches of two frames. The merged Space-Saving sketch of DISTINCT_BY decides which values keep
+# a HyperLogLog of their own; the others' are folded into distinct_rest. A value kept only after the merge
+# misses the findings that went into the rest sketch before it was kept, so its distinct count is low by them
+def merge_sketches(a, b):
+    top = {col: space_saving_merge(a["top"][col], b["top"][col]) for col in SKETCHED}
+    kept = set(top[DISTINCT_BY]["counts"].index)
+    distinct_by = {}
+    rest = hyperloglog_merge(a["distinct_rest"], b["distinct_rest"])
+    for group, hll in chain(a["distinct_by"].items(), b["distinct_by"].items()):
+        if group not in kept:
+            rest = hyperloglog_merge(rest, hll)
+        else:
+            distinct_by[group] = hyperloglog_merge(distinct_by[group], hll) if group in distinct_by else hll
+    return {
+        "rows": a["rows"] + b["rows"],
+        "top": top,
+        "counts": {col: count_min_merge(a["counts"][col], b["counts"][col]) for col in SKETCHED},
+        "distinct": hyperloglog_merge(a["distinct"], b["distinct"]),
+        "distinct_by": distinct_by,
+        "distinct_rest": rest,
+    }
+
+# Estimated counts of the values Space-Saving kept for col, most frequent first (ties by value): each the
+# smaller of its two overestimates, Space-Saving's and Count-Min's
+def sketch_counts(sketch, col):
+    top = sketch["top"][col]["counts"]
+    counts = pd.Series(np.minimum(top.to_numpy(), count_min_estimate(sketch["counts"][col], value_hashes(pd.Series(top.index, dtype=object)))),
+                       index=top.index, name="count")
+    counts.index.name = col
+    return counts.sort_values(ascending=False, kind="stable")
+
+# How many non-missing values of col were counted (exact)
+def sketch_total(sketch, col):
+    return sketch["counts"][col]["total"]
+
+# Estimated distinct DISTINCT_OF values for each of groups (DISTINCT_BY values) the sketch kept, for the rest of
+# them together ("Misc", the union of their sketches and the rest sketch) and for all findings ("All")
+def distinct_table(sketch, groups):
+    rows = []
+    rest = sketch["distinct_rest"]
+    for group, hll in sketch["distinct_by"].items():
+        if group not in groups:
+            rest = hyperloglog_merge(rest, hll)
+    for group in groups:
+        if group in sketch["distinct_by"]:
+            rows.append((group, hyperloglog_count(sketch["distinct_by"][group])))
+    if rest["registers"].any():
+        rows.append(("Misc", hyperloglog_count(rest)))
+    rows.append(("All", hyperloglog_count(sketch["distinct"])))
+    return pd.DataFrame(rows, columns=[DISTINCT_BY, f"distinct {DISTINCT_OF} (approx.)"])
@@ -0,0 +1,74 @@
+import hashlib
+import os
+import pickle
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = ".snapshot"
+
+# Stable digest of what a sheet is written from: frames (values, columns and dtypes, not the index,
+# which is never written), arrays, and nested tuples/lists/dicts of them and of plain values
+def content_digest(value, digest=None):
+    top = digest is None
+    if top:
+        digest = hashlib.sha256()
+    if isinstance(value, pd.DataFrame):
+        digest.update(repr((list(value.columns), [str(dtype) for dtype in value.dtypes], value.shape)).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=False).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(repr((value.dtype.str, value.shape)).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"{type(value).__name__}[{len(value)}]".encode())
+        for item in value:
+            content_digest(item, digest)
+    elif isinstance(value, dict):
+        digest.update(f"dict[{len(value)}]".encode())
+        for key in sorted(value, key=repr):
+            content_digest(key, digest)
+            content_digest(value[key], digest)
+    else:
+        digest.update(repr(value).encode())
+    return digest.hexdigest() if top else None
+
+# One 64-bit hash per finding, for counting what a new export added and dropped
+def row_hashes(df):
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+# One 64-bit hash per value of a column, aligned with its rows
+def column_hash(series):
+    return pd.util.hash_pandas_object(series, index=False).to_numpy()
+
+def row_changes(old_hashes, new_hashes):
+    added = int((~np.isin(new_hashes, old_hashes)).sum())
+    removed = int((~np.isin(old_hashes, new_hashes)).sum())
+    return added, removed
+
+def snapshot_path(newfile):
+    return newfile + SNAPSHOT_SUFFIX
+
+# The snapshot stored next to a dashboard, or None if there is none we can use
+def load_snapshot(newfile):
+    try:
+        with open(snapshot_path(newfile), "rb") as f:
+            snapshot = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+        return None
+    return snapshot
+
+def save_snapshot(newfile, template, sheets, rows):
+    path = snapshot_path(newfile)
+    snapshot = {"version": SNAPSHOT_VERSION, "template": template, "sheets": sheets, "rows": rows}
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
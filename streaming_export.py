@@ -0,0 +1,280 @@
+import multiprocessing
+import os
+import posixpath
+import re
+import shutil
+import struct
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+import pandas as pd
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.utils import get_column_letter
+
+MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+EXCEL_EPOCH = pd.Timestamp("1899-12-30")
+ONE_DAY = pd.Timedelta(days=1)
+CHUNK_SIZE = 10000
+
+EXCEL_DATETIME_FORMAT = "YYYY-MM-DD HH:MM:SS"
+STYLES_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"
+FIRST_CUSTOM_FORMAT = 164
+
+# Relationship id -> (type, part name) of the workbook's relationships
+def workbook_rels(archive):
+    rels = ElementTree.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    targets = {}
+    for rel in rels.iter(f"{PKG_REL_NS}Relationship"):
+        target = rel.get("Target")
+        if target.startswith("/"):
+            target = target[1:]
+        else:
+            target = posixpath.normpath(posixpath.join("xl", target))
+        targets[rel.get("Id")] = (rel.get("Type"), target)
+    return targets
+
+# Sheet title -> worksheet part name inside the saved .xlsx/.xlsm package
+def sheet_parts(archive):
+    workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+    targets = workbook_rels(archive)
+    return {sheet.get("name"): targets[sheet.get(f"{REL_NS}id")][1] for sheet in workbook.iter(f"{MAIN_NS}sheet")}
+
+# Style id of a plain cell with number format code in a styles part, as (style id, styles part), the part
+# with the format and the cell style added when it had no such style yet
+def number_format_style(styles_xml, code):
+    styles = ElementTree.fromstring(styles_xml)
+    formats = {fmt.get("formatCode"): int(fmt.get("numFmtId")) for fmt in styles.iter(f"{MAIN_NS}numFmt")}
+    xfs = list(styles.find(f"{MAIN_NS}cellXfs"))
+    format_id = formats.get(code)
+    if format_id is not None:
+        for style_id, xf in enumerate(xfs):
+            plain = all(xf.get(attr, "0") == "0" for attr in ("fontId", "fillId", "borderId")) and len(xf) == 0
+            if plain and xf.get("numFmtId") == str(format_id):
+                return style_id, styles_xml
+    else:
+        format_id = max([FIRST_CUSTOM_FORMAT - 1, *formats.values()]) + 1
+        numfmt = f'<numFmt numFmtId="{format_id}" formatCode="{escape(code, {chr(34): "&quot;"})}"/>'
+        if formats:
+            styles_xml = styles_xml.replace("</numFmts>", numfmt + "</numFmts>", 1)
+            styles_xml = re.sub(r'<numFmts count="\d+"', f'<numFmts count="{len(formats) + 1}"', styles_xml, count=1)
+        else:
+            styles_xml = re.sub(r"<styleSheet\b[^>]*>", lambda m: f'{m.group()}<numFmts count="1">{numfmt}</numFmts>', styles_xml, count=1)
+    xf = f'<xf numFmtId="{format_id}" fontId="0" fillId="0" borderId="0" applyNumberFormat="1"/>'
+    styles_xml = styles_xml.replace("</cellXfs>", xf + "</cellXfs>", 1)
+    styles_xml = re.sub(r'<cellXfs count="\d+"', f'<cellXfs count="{len(xfs) + 1}"', styles_xml, count=1)
+    return len(xfs), styles_xml
+
+def _escape(text):
+    text = text.str.replace(ILLEGAL_CHARACTERS_RE, "", regex=True)
+    return text.str.replace("&", "&amp;", regex=False).str.replace("<", "&lt;", regex=False).str.replace(">", "&gt;", regex=False)
+
+def _number_text(values):
+    return values.astype(str).str.replace(r"\.0$", "", regex=True)
+
+# One column of a chunk as <c> elements, "" where the value is missing
+def column_cells(series, refs, style_id=None):
+    style = f' s="{style_id}"' if style_id else ""
+    missing = series.isna().to_numpy()
+    if pd.api.types.is_bool_dtype(series):
+        cells = f'{style} t="b"><v>' + series.astype(int).astype(str) + "</v></c>"
+    elif pd.api.types.is_datetime64_any_dtype(series):
+        cells = f'{style} t="n"><v>' + _number_text((series - EXCEL_EPOCH) / ONE_DAY) + "</v></c>"
+    elif pd.api.types.is_numeric_dtype(series):
+        cells = f'{style} t="n"><v>' + _number_text(series) + "</v></c>"
+    else:
+        text = series.astype(str)
+        formula = text.str.startswith("=").to_numpy()
+        text = _escape(text)
+        space = text.str.match(r"^\s|.*\s$").map({True: ' xml:space="preserve"', False: ""})
+        cells = (f'{style} t="inlineStr"><is><t' + space + ">" + text + "</t></is></c>").where(~formula, f"{style}><f>" + text.str[1:] + "</f><v></v></c>")
+    # str columns keep missing values as NaN through the concatenations above, so blank them first
+    cells = '<c r="' + refs + cells.fillna("").to_numpy(dtype=object)
+    cells[missing] = ""
+    return cells
+
+# Consecutive chunk_size-row slices of df
+def frame_chunks(df, chunk_size=CHUNK_SIZE):
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start:start + chunk_size]
+
+# Write consecutive row chunks (DataFrames) as <row> elements starting at first_row, datetime columns
+# in style date_style
+def write_rows(out, chunks, first_row, date_style=None):
+    letters = None
+    row_no = first_row
+    for chunk in chunks:
+        if letters is None:
+            letters = [get_column_letter(i) for i in range(1, chunk.shape[1] + 1)]
+        row_numbers = pd.Series(range(row_no, row_no + len(chunk))).astype(str).to_numpy(dtype=object)
+        columns = [
+            column_cells(series, letter + row_numbers + '"', date_style if pd.api.types.is_datetime64_any_dtype(series) else None)
+            for letter, series in zip(letters, (chunk.iloc[:, i].reset_index(drop=True) for i in range(len(letters))))
+        ]
+        rows = ['<row r="' + row + '">' + "".join(cells) + "</row>" for row, *cells in zip(row_numbers, *columns)]
+        out.write("".join(rows).encode("utf-8"))
+        row_no += len(chunk)
+
+# Rows still to write to a sheet as (n_rows, n_cols, chunks); a DataFrame is cut into chunk_size slices
+def sheet_rows(rows, chunk_size=CHUNK_SIZE):
+    if isinstance(rows, pd.DataFrame):
+        return len(rows), rows.shape[1], frame_chunks(rows, chunk_size)
+    return rows
+
+# Splice rows into a stub worksheet part: keep everything up to and including style_row,
+# stream the rows after it, then fix the sheet dimension to the final extent
+def write_sheet_part(out, stub_xml, rows, style_row=2, chunk_size=CHUNK_SIZE, date_style=None):
+    n_rows, n_cols, chunks = sheet_rows(rows, chunk_size)
+    stub_xml = re.sub(r"<sheetData\s*/>", "<sheetData></sheetData>", stub_xml, count=1)
+    head, tail = stub_xml.split("</sheetData>", 1)
+    if n_rows:
+        last_row = style_row + n_rows
+        last_col = get_column_letter(n_cols)
+        head = re.sub(r'<dimension ref="[^"]*"\s*/>', f'<dimension ref="A1:{last_col}{last_row}" />', head, count=1)
+    out.write(head.encode("utf-8"))
+    write_rows(out, chunks, style_row + 1, date_style)
+    out.write(("</sheetData>" + tail).encode("utf-8"))
+
+# Rows of the parts being serialized in workers, by (package being written, part name). Forked workers
+# inherit it, so no frame is pickled to reach them
+_pending_parts = {}
+
+# Pool for serializing sheet parts: forked processes, which inherit the rows to write, or threads where the
+# platform can't fork (zlib releases the GIL, so threads still overlap the compression)
+def part_pool(workers):
+    if "fork" in multiprocessing.get_all_start_methods():
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+    return ThreadPoolExecutor(max_workers=workers)
+
+# Serialize and deflate one worksheet part on its own, as the only member of a zip file at part_path
+def serialize_part(key, part_path, style_row=2, chunk_size=CHUNK_SIZE, date_style=None):
+    stub_xml, rows = _pending_parts[key]
+    with zipfile.ZipFile(part_path, "w", zipfile.ZIP_DEFLATED) as zpart:
+        with zpart.open(key[1], "w", force_zip64=True) as out:
+            write_sheet_part(out, stub_xml, rows, style_row, chunk_size, date_style)
+    return part_path
+
+# Append member info of zin to zout as it is stored, compressed data copied byte for byte, under filename if given.
+# zipfile has no public way to add data that is already compressed, so this does what ZipFile.open("w")
+# does around the write
+def copy_member(zin, info, zout, buffer_size=1 << 20, filename=None):
+    zin.fp.seek(info.header_offset)
+    name_length, extra_length = struct.unpack("<HH", zin.fp.read(zipfile.sizeFileHeader)[26:30])
+    zin.fp.seek(info.header_offset + zipfile.sizeFileHeader + name_length + extra_length)
+    member = zipfile.ZipInfo(filename or info.filename, info.date_time)
+    member.compress_type = info.compress_type
+    member.external_attr = info.external_attr
+    member.CRC, member.compress_size, member.file_size = info.CRC, info.compress_size, info.file_size
+    zout.fp.seek(zout.start_dir)
+    member.header_offset = zout.fp.tell()
+    zout._didModify = True
+    zout.fp.write(member.FileHeader())
+    remaining = info.compress_size
+    while remaining:
+        data = zin.fp.read(min(buffer_size, remaining))
+        zout.fp.write(data)
+        remaining -= len(data)
+    zout.start_dir = zout.fp.tell()
+    zout.filelist.append(member)
+    zout.NameToInfo[member.filename] = member
+
+# Rewrite the saved workbook, streaming the remaining rows of each detail sheet into its part.
+# sheets maps sheet title -> rows still to write (everything after style_row of the stub), as a DataFrame
+# or as (n_rows, n_cols, chunks) where chunks yields consecutive DataFrames, so the rows never need to
+# exist as one frame.
+# With workers > 1 the sheet parts are serialized and compressed concurrently, largest first, each into a
+# file of its own, and copied into the package in the order the package lists them; every other part
+# (workbook, VBA project, the other sheets) is copied unchanged, so sheet order and macros are kept.
+# Streamed datetime cells take a style of their own with EXCEL_DATETIME_FORMAT, added to the styles part
+# if the stub didn't already bring one
+def stream_detail_sheets(path, sheets, style_row=2, chunk_size=CHUNK_SIZE, workers=1):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=directory)
+    os.close(fd)
+    part_paths = []
+    try:
+        with zipfile.ZipFile(path) as zin, zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as zout:
+            parts = sheet_parts(zin)
+            streamed = {parts[name]: sheet_rows(rows, chunk_size) for name, rows in sheets.items()}
+            styles_part = next(target for kind, target in workbook_rels(zin).values() if kind == STYLES_TYPE)
+            styles_xml = zin.read(styles_part).decode("utf-8")
+            date_style, new_styles_xml = number_format_style(styles_xml, EXCEL_DATETIME_FORMAT)
+            rewritten = {} if new_styles_xml == styles_xml else {styles_part: new_styles_xml.encode("utf-8")}
+            if workers > 1 and len(streamed) > 1:
+                stubs = {part: zin.read(part).decode("utf-8") for part in streamed}
+                for part, rows in streamed.items():
+                    _pending_parts[(tmp_path, part)] = (stubs[part], rows)
+                with part_pool(min(workers, len(streamed))) as pool:
+                    pending = {}
+                    for i, part in enumerate(sorted(streamed, key=lambda part: -streamed[part][0])):
+                        part_paths.append(f"{tmp_path}.{i}")
+                        pending[part] = pool.submit(serialize_part, (tmp_path, part), part_paths[-1], style_row, chunk_size, date_style)
+                    for item in zin.infolist():
+                        if item.filename in pending:
+                            with zipfile.ZipFile(pending[item.filename].result()) as zpart:
+                                copy_member(zpart, zpart.infolist()[0], zout)
+                        elif item.filename in rewritten:
+                            zout.writestr(item, rewritten[item.filename])
+                        else:
+                            copy_member(zin, item, zout)
+            else:
+                for item in zin.infolist():
+                    if item.filename in streamed:
+                        stub_xml = zin.read(item.filename).decode("utf-8")
+                        with zout.open(item.filename, "w", force_zip64=True) as out:
+                            write_sheet_part(out, stub_xml, streamed[item.filename], style_row, chunk_size, date_style)
+                    elif item.filename in rewritten:
+                        zout.writestr(item, rewritten[item.filename])
+                    else:
+                        with zin.open(item) as src, zout.open(item.filename, "w", force_zip64=True) as dst:
+                            shutil.copyfileobj(src, dst)
+        os.replace(tmp_path, path)
+    finally:
+        for key in [key for key in _pending_parts if key[0] == tmp_path]:
+            del _pending_parts[key]
+        for part_path in part_paths + [tmp_path]:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+# Relationships part of a package part
+def rels_part(part):
+    directory, name = posixpath.split(part)
+    return posixpath.join(directory, "_rels", name + ".rels")
+
+# Replace the worksheet parts of sheet_names in the saved workbook at path with the same sheets' parts in the
+# package at source, copied as they are stored. A sheet is copied only if its part has no relationships in
+# either package and both packages have the same styles part, so the copied cells' style ids mean what they
+# meant in source. Returns the titles of the sheets copied
+def splice_sheets(path, source, sheet_names):
+    with zipfile.ZipFile(source) as zsource:
+        with zipfile.ZipFile(path) as zin:
+            parts, source_parts = sheet_parts(zin), sheet_parts(zsource)
+            styles_part = next(target for kind, target in workbook_rels(zin).values() if kind == STYLES_TYPE)
+            source_styles_part = next(target for kind, target in workbook_rels(zsource).values() if kind == STYLES_TYPE)
+            if zin.read(styles_part) != zsource.read(source_styles_part):
+                return []
+            names, source_names = set(zin.namelist()), set(zsource.namelist())
+            copied = {
+                parts[name]: zsource.getinfo(source_parts[name]) for name in sheet_names
+                if name in parts and name in source_parts and rels_part(parts[name]) not in names and rels_part(source_parts[name]) not in source_names
+            }
+            if not copied:
+                return []
+            fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(os.path.abspath(path)))
+            os.close(fd)
+            try:
+                with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as zout:
+                    for item in zin.infolist():
+                        if item.filename in copied:
+                            copy_member(zsource, copied[item.filename], zout, filename=item.filename)
+                        else:
+                            copy_member(zin, item, zout)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+    os.replace(tmp_path, path)
+    return [name for name in sheet_names if parts.get(name) in copied]
@@ -0,0 +1,55 @@
+import hashlib
+import io
+import os
+import secrets
+from contextlib import contextmanager
+
+from openpyxl import load_workbook
+
+from instrumentation import stage
+
+# Templates read by this process, by absolute path: the file's bytes, parsed once for reading. An entry is
+# reused while the file's size and modification time are unchanged, so a batch or a server reads each
+# template from disk once
+_templates = {}
+
+def template_entry(path):
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    signature = (stat.st_size, stat.st_mtime_ns)
+    entry = _templates.get(path)
+    if entry is None or entry["signature"] != signature:
+        with stage("load template") as record:
+            with open(path, "rb") as f:
+                data = f.read()
+            record["bytes"] = len(data)
+            entry = {"signature": signature, "data": data, "digest": hashlib.sha256(data).hexdigest()}
+        _templates[path] = entry
+    return entry
+
+# sha256 of the template file, as frame_cache.file_digest would give it
+def template_digest(path):
+    return template_entry(path)["digest"]
+
+# A workbook of the template to build on (VBA project included), parsed from the bytes held in memory.
+# A deepcopy of a parsed workbook would be cheaper, but openpyxl's style tables and dimension holders
+# don't survive one
+def template_copy(path):
+    entry = template_entry(path)
+    with stage("copy template"):
+        return load_workbook(io.BytesIO(entry["data"]), keep_vba=True)
+
+# Path of a temporary file next to path, moved over path when the block completes, so readers of path
+# see the old file or the finished new one and never a partial write. The temporary file keeps path's
+# extension (pandas picks its writer from it) and is created with the usual permissions, unlike mkstemp's 0600
+@contextmanager
+def atomic_output(path):
+    directory, name = os.path.split(os.path.abspath(path))
+    tmp_path = os.path.join(directory, f".{os.path.splitext(name)[0]}.{secrets.token_hex(4)}{os.path.splitext(name)[1]}")
+    open(tmp_path, "xb").close()
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
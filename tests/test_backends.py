@@ -0,0 +1,38 @@
+# The polars backend against the pandas path: read_and_derive gives the same raw frame, derived frame and SLA
+# columns as read_raw + derive_frame, dtypes included, for every input format and for exports with missing
+# dates, ports and asset groups. Skipped when polars isn't installed.
+# Run from the repository root: python -m pytest tests
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard_creation import derive_frame
+from lazy_backend import read_and_derive
+from readers import read_raw
+from benchmarks.synthetic import make_raw_frame, write_raw_frame
+
+pytest.importorskip("polars")
+
+TODAY = datetime(2026, 3, 1, 10, 30)
+
+def export_frame():
+    raw_df = make_raw_frame(3000, n_asset_groups=12, patch_null_rate=0.2)
+    rng = np.random.default_rng(2)
+    raw_df.loc[rng.random(len(raw_df)) < 0.05, "first_observed_date"] = pd.NaT
+    raw_df.loc[rng.random(len(raw_df)) < 0.05, "asset_group"] = np.nan
+    raw_df["port"] = raw_df["port"].astype("float64")
+    raw_df.loc[rng.random(len(raw_df)) < 0.05, "port"] = np.nan
+    return raw_df
+
+@pytest.mark.parametrize("extension", [".csv", ".parquet", ".arrow", ".xlsx"])
+def test_polars_frames_match_pandas(tmp_path, extension):
+    path = write_raw_frame(export_frame(), os.path.join(tmp_path, "export_raw" + extension))
+    raw_df = read_raw(path)
+    df, sla = derive_frame(raw_df, TODAY)
+    lazy_raw_df, lazy_df, lazy_sla = read_and_derive(path, TODAY)
+    pd.testing.assert_frame_equal(lazy_raw_df, raw_df)
+    pd.testing.assert_frame_equal(lazy_df, df)
+    pd.testing.assert_frame_equal(lazy_sla, sla)
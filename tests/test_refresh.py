@@ -0,0 +1,39 @@
+# Incremental refresh: after one finding changes, the detail sheets that don't list it are copied from the
+# previous dashboard as stored, and the refreshed dashboard holds what a fresh build of the new export holds.
+# Run from the repository root: python -m pytest tests
+import os
+import zipfile
+from datetime import datetime
+
+from openpyxl import load_workbook
+
+from dashboard_creation import build_dashboard, refresh_dashboard
+from streaming_export import sheet_parts
+from benchmarks.bench_streaming import TEMPLATE
+from benchmarks.synthetic import make_raw_frame
+
+TODAY = datetime(2026, 3, 1)
+
+def stored_sheets(path):
+    with zipfile.ZipFile(path) as archive:
+        return {name: archive.read(part) for name, part in sheet_parts(archive).items()}
+
+def sheet_values(path):
+    return {ws.title: [row for row in ws.iter_rows(values_only=True)] for ws in load_workbook(path).worksheets}
+
+def test_refresh_copies_unchanged_detail_sheets(tmp_path):
+    raw_df = make_raw_frame(3000, patch_null_rate=0.3)
+    newfile = os.path.join(tmp_path, "dashboard.xlsm")
+    assert refresh_dashboard(raw_df, newfile, TEMPLATE, today=TODAY)["rebuilt"]
+    before = stored_sheets(newfile)
+
+    changed_df = raw_df.copy()
+    changed_df.loc[0, "port"] = changed_df["port"].max() + 1
+    report = refresh_dashboard(changed_df, newfile, TEMPLATE, today=TODAY)
+    assert not report["rebuilt"] and "Original Vulnerabilities" in report["rewritten"]
+    after = stored_sheets(newfile)
+    unchanged = [name for name in before if name.endswith("Vulnerabilities") and name not in report["rewritten"]]
+    assert unchanged and all(after[name] == before[name] for name in unchanged)
+
+    rebuilt = build_dashboard(changed_df, os.path.join(tmp_path, "rebuilt.xlsm"), TEMPLATE, today=TODAY)
+    assert sheet_values(newfile) == sheet_values(rebuilt)
@@ -0,0 +1,82 @@
+# The job server on this machine: identical uploads share one build, a full queue answers 503, a pruned
+# job's dashboard answers 410 and a bad Content-Length answers 400 before anything is queued.
+# Run from the repository root: python -m pytest tests
+import asyncio
+import json
+import os
+
+from server import start_server, stop_server
+from benchmarks.synthetic import make_raw_frame, write_raw_frame
+
+ROWS = 200
+
+# One request on its own connection; returns (status, headers, body). length overrides Content-Length
+async def request(port, method, path, body=b"", length=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    length = len(body) if length is None else length
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {length}\r\n\r\n".encode("latin-1") + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    status_line, *header_lines = head.decode("latin-1").split("\r\n")
+    headers = {name.lower(): value.strip() for name, _, value in (line.partition(":") for line in header_lines)}
+    return int(status_line.split()[1]), headers, payload
+
+def export(tmp_path, seed=0):
+    return open(write_raw_frame(make_raw_frame(ROWS, seed=seed), os.path.join(tmp_path, f"export{seed}_raw.csv")), "rb").read()
+
+# Run test(port, state) against a server started for it, with builds on threads
+def serve(tmp_path, test, **options):
+    async def run():
+        server, state = await start_server(port=0, work_dir=os.path.join(tmp_path, "jobs"), cache_dir=os.path.join(tmp_path, "cache"),
+                                           workers=1, executor="thread", **options)
+        try:
+            await test(server.sockets[0].getsockname()[1], state)
+        finally:
+            await stop_server(server, state)
+    asyncio.run(run())
+
+def test_identical_uploads_share_a_job(tmp_path):
+    body = export(tmp_path)
+    async def test(port, state):
+        first, second = await asyncio.gather(*[request(port, "POST", "/dashboards?filename=export_raw.csv", body) for _ in range(2)])
+        assert first[0] == second[0] == 200
+        assert first[1]["x-job-id"] == second[1]["x-job-id"]
+        assert first[2] == second[2] and first[2][:2] == b"PK"
+        assert state["counts"]["submitted"] == 1 and state["counts"]["deduplicated"] == 1 and state["counts"]["done"] == 1
+    serve(tmp_path, test)
+
+def test_full_queue_answers_503(tmp_path):
+    bodies = [export(tmp_path, seed) for seed in range(2)]
+    async def test(port, state):
+        # no consumers, so queued jobs stay queued
+        for consumer in state["consumers"]:
+            consumer.cancel()
+        status, _, payload = await request(port, "POST", "/jobs?filename=a.csv", bodies[0])
+        assert status == 202 and json.loads(payload)["status"] == "queued"
+        status, headers, _ = await request(port, "POST", "/jobs?filename=b.csv", bodies[1])
+        assert status == 503 and "retry-after" in headers
+        assert state["counts"]["rejected"] == 1 and state["queue"].qsize() == 1
+    serve(tmp_path, test, queue_size=1)
+
+def test_pruned_dashboard_answers_410(tmp_path):
+    body = export(tmp_path)
+    async def test(port, state):
+        status, headers, payload = await request(port, "POST", "/dashboards?filename=export_raw.csv", body)
+        # pruned as soon as it finished, but not before it was sent
+        assert status == 200 and payload[:2] == b"PK"
+        assert state["jobs"] == {} and os.listdir(state["work_dir"]) == []
+        status, _, _ = await request(port, "GET", f"/jobs/{headers['x-job-id']}/dashboard")
+        assert status == 410
+        status, _, _ = await request(port, "GET", "/jobs/unknown/dashboard")
+        assert status == 404
+    serve(tmp_path, test, keep_jobs=0)
+
+def test_bad_content_length_answers_400(tmp_path):
+    async def test(port, state):
+        for length in ("-1", "abc"):
+            status, _, _ = await request(port, "POST", "/jobs?filename=a.csv", b"x" * 10, length=length)
+            assert status == 400
+        assert state["jobs"] == {} and state["queue"].qsize() == 0
+    serve(tmp_path, test)
@@ -0,0 +1,40 @@
+# Sketch memory stays bounded however many asset groups there are, and an approximate Summary table's
+# Misc row never goes below 0.
+# Run from the repository root: python -m pytest tests
+from datetime import datetime
+
+from dashboard_creation import derive_frame, univariate_table
+from sketches import DEFAULT_COUNTERS, DISTINCT_BY, DISTINCT_OF, distinct_table, frame_sketch, merge_sketches
+from benchmarks.synthetic import make_raw_frame
+
+TODAY = datetime(2026, 3, 1)
+
+def chunked_sketch(df, chunk_rows):
+    sketch = None
+    for offset in range(0, len(df), chunk_rows):
+        chunk_sketch = frame_sketch(df.iloc[offset:offset + chunk_rows])
+        sketch = chunk_sketch if sketch is None else merge_sketches(sketch, chunk_sketch)
+    return sketch
+
+def test_distinct_sketches_are_bounded_by_the_counters():
+    df, _ = derive_frame(make_raw_frame(20000, n_asset_groups=2000), TODAY)
+    sketch = chunked_sketch(df, 2500)
+    assert len(sketch["distinct_by"]) <= DEFAULT_COUNTERS
+    table = distinct_table(sketch, list(sketch["distinct_by"])).set_index(DISTINCT_BY).iloc[:, 0]
+    exact_total = df[DISTINCT_OF].nunique()
+    assert abs(table["All"] / exact_total - 1) < 0.05 and table["Misc"] <= table["All"] * 1.05
+
+def test_few_groups_keep_their_distinct_counts():
+    df, _ = derive_frame(make_raw_frame(20000, n_asset_groups=20), TODAY)
+    exact =df.groupby(DISTINCT_BY, observed=True)[DISTINCT_OF].nunique()
+    table = distinct_table(chunked_sketch(df, 2500), list(exact.index)).set_index(DISTINCT_BY).iloc[:, 0]
+    assert "Misc" not in table.index
+    assert ((table[exact.index] - exact).abs() / exact).max() < 0.05
+
+def test_misc_is_never_negative():
+    df, _ = derive_frame(make_raw_frame(2000, n_asset_groups=200), TODAY)
+    sketch = frame_sketch(df)
+    # as if the estimates of the groups shown added up to more than were counted
+    sketch["counts"]["asset_group"]["total"] = 10
+    table = univariate_table(None, "asset_group", sketch=sketch)[0]
+    assert table.iloc[-1]["asset_group"] == "Misc" and table.iloc[-1]["count"] == 0
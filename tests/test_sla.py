@@ -0,0 +1,63 @@
+# compute_sla against the row-by-row loop it replaced (kept below as the reference): the iterrows loop for
+# difference, with its fallback to first_observed_date, the row-wise apply for the overdue flag and the two
+# day columns, on findings with missing dates and on either side of every threshold.
+# Run from the repository root: python -m pytest tests
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard_creation import SEVERITY_THRESHOLDS, compute_sla
+from benchmarks.synthetic import make_raw_frame
+
+TODAY = datetime(2026, 3, 1, 10, 30)
+
+# The loop as the original script ran it, on a copy of df
+def reference_sla(df, today, severity_thresholds):
+    df = df.copy()
+    df['comparison_date'] = pd.to_datetime(today, format="%d/%m/%Y %H:%M:%S")
+    for idx, row in df.iterrows():
+        if pd.isnull(row['patch_publication_date']):
+            df.at[idx, "difference"] = (row['comparison_date'] - row['first_observed_date']).days
+        else:
+            df.at[idx, "difference"] = (row['comparison_date'] - row['patch_publication_date']).days
+    df["overdue"] = df.apply(
+        lambda row: "Y" if row["difference"] > severity_thresholds[row["severity"]] else "N",
+        axis=1
+    )
+    overdue_df = df.loc[df['overdue'] == 'Y']
+    non_overdue_df = df.loc[df['overdue'] == 'N']
+    df.loc[overdue_df.index, "Days Overdued By (Days)"] = overdue_df['difference'] - overdue_df['severity'].map(severity_thresholds)
+    df.loc[non_overdue_df.index, "Days to Overdue (Days)"] = non_overdue_df['severity'].map(severity_thresholds) - non_overdue_df['difference']
+    return df
+
+# Findings whose start date is 0 to 2 days either side of each threshold, at midnight and at other times of day,
+# with the patch date, the first observed date or both missing
+def boundary_frame(severity_thresholds):
+    rows = []
+    for severity, days in severity_thresholds.items():
+        for offset in (-2, -1, 0, 1, 2):
+            for time_of_day in ("00:00", "10:30", "10:31", "23:59"):
+                start = pd.Timestamp(TODAY.date()) - pd.Timedelta(days=days + offset) + pd.Timedelta(time_of_day + ":00")
+                rows.append((severity, start, start - pd.Timedelta(days=3)))
+                rows.append((severity, pd.NaT, start))
+                rows.append((severity, pd.NaT, pd.NaT))
+    return pd.DataFrame(rows, columns=["severity", "patch_publication_date", "first_observed_date"])
+
+def assert_matches_reference(df, severity_thresholds):
+    sla = compute_sla(df, TODAY, severity_thresholds)
+    reference = reference_sla(df, TODAY, severity_thresholds)
+    assert list(np.where(sla["overdue"], "Y", "N")) == list(reference["overdue"])
+    for column in ("difference", "Days Overdued By (Days)", "Days to Overdue (Days)"):
+        actual = sla[column].to_numpy(dtype="float64", na_value=np.nan)
+        np.testing.assert_array_equal(actual, reference[column].to_numpy(dtype="float64"), err_msg=column)
+
+@pytest.mark.parametrize("severity_thresholds", [SEVERITY_THRESHOLDS, {"Critical": 7, "High": 30, "Medium": 0, "Low": 365}])
+def test_sla_matches_the_row_loop_at_the_thresholds(severity_thresholds):
+    assert_matches_reference(boundary_frame(severity_thresholds), severity_thresholds)
+
+def test_sla_matches_the_row_loop_on_an_export():
+    df = make_raw_frame(2000, patch_null_rate=0.3)
+    df.loc[df.sample(frac=0.05, random_state=0).index, "first_observed_date"] = pd.NaT
+    assert_matches_reference(df, SEVERITY_THRESHOLDS)
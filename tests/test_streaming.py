@@ -0,0 +1,42 @@
+# The streaming export's peak-memory ceiling: a streamed build of a synthetic export stays under
+# MAX_PEAK_MB of traced memory (about 32 MB at these rows; the in-memory build peaks near 220 MB), and
+# streamed date columns keep their date format when a sheet's first row, which goes in with the stub, has no date.
+# Run from the repository root: python -m pytest tests
+import os
+from datetime import datetime
+
+import pytest
+from openpyxl import load_workbook
+
+from dashboard_creation import build_dashboard, build_file
+from benchmarks.bench_streaming import TEMPLATE, measure_peak
+from benchmarks.synthetic import make_raw_frame, write_raw_frame
+from streaming_export import EXCEL_DATETIME_FORMAT
+
+ROWS = 20000
+MAX_PEAK_MB = 64
+
+def test_streamed_build_stays_under_peak_ceiling(tmp_path):
+    raw_df = make_raw_frame(ROWS)
+    newfile = os.path.join(tmp_path, "streamed.xlsm")
+    _, peak = measure_peak(build_dashboard, raw_df, newfile, TEMPLATE, today=datetime(2026, 3, 1), streaming=True)
+    assert peak <= MAX_PEAK_MB, f"streaming peak {peak:.1f} MB exceeds {MAX_PEAK_MB} MB at {ROWS} rows"
+    ws = load_workbook(newfile, read_only=True)["Original Vulnerabilities"]
+    assert ws.max_row == ROWS + 1
+
+@pytest.mark.parametrize("options", [{"streaming": True}, {"sheet_workers": 2}, {"chunk_size": 500}], ids=["streaming", "sheet_workers", "chunk_size"])
+def test_streamed_dates_keep_their_format_after_a_blank_first_row(tmp_path, options):
+    raw = write_raw_frame(make_raw_frame(2000, patch_null_rate=0.5), os.path.join(tmp_path, "export_raw.csv"))
+    newfile = build_file(raw, os.path.join(tmp_path, "dashboard.xlsm"), TEMPLATE, today=datetime(2026, 3, 1),
+                         cache_dir=os.path.join(tmp_path, "cache"), **options)
+    blank_first_rows = 0
+    for ws in load_workbook(newfile).worksheets:
+        header = [cell.value for cell in ws[1]]
+        if "patch_publication_date" not in header:
+            continue
+        column = header.index("patch_publication_date") + 1
+        cells = [row[0] for row in ws.iter_rows(min_row=2, min_col=column, max_col=column)]
+        blank_first_rows += cells[0].value is None
+        dates = [cell for cell in cells if cell.value is not None]
+        assert dates and all(cell.is_date and cell.number_format == EXCEL_DATETIME_FORMAT for cell in dates), ws.title
+    assert blank_first_rows
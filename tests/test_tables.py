@@ -0,0 +1,82 @@
+# The Summary and pivot tables rolled up from the aggregation cube against the separate value_counts and
+# pivot_table scans they replaced (kept below as the reference), on findings with missing groups and plugin ids:
+# the same rows in the same order (ties in order of first appearance), the top 5 + Misc folding and the
+# Critical/High/Medium/Low order, from one cube or from the merged cubes of chunks as out_of_core builds it.
+# Run from the repository root: python -m pytest tests
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard_creation import aggregate_cube, derive_frame, merge_cubes, pivot_table_wide, univariate_table
+from benchmarks.synthetic import make_raw_frame
+
+TODAY = datetime(2026, 3, 1)
+
+def reference_univariate_table(df, variable, top_n=5):
+    counts = df[variable].value_counts().reset_index()
+    counts.columns = [variable, 'count']
+    if variable == 'severity':
+        severity_order = ['Critical', 'High', 'Medium', 'Low']
+        counts[variable] = pd.Categorical(counts[variable], categories=severity_order, ordered=True)
+        counts = counts.sort_values(by=variable)
+    if len(counts) > top_n:
+        sub_df = counts.head(top_n).copy()
+        misc_count = counts.iloc[top_n:]['count'].sum()
+        misc_row = pd.DataFrame({variable: ['Misc'], 'count': [misc_count]})
+        sub_df = pd.concat([sub_df, misc_row], ignore_index=True)
+    else:
+        sub_df = counts
+    return sub_df
+
+def reference_pivot_table_wide(df, index_col, col, val):
+    column_order = ["Critical", "High", "Medium", "Low"]
+    pivot_df = pd.pivot_table(df, index=index_col, columns=col, values=val, aggfunc="count", fill_value=0).stack().reset_index()
+    pivot_df.columns = (index_col if isinstance(index_col, list) else [index_col]) + [col, "count"]
+    pivot_df_wide = pivot_df.pivot(index=index_col, columns=col, values="count").fillna(0)
+    pivot_df_wide = pivot_df_wide.reindex(columns=[c for c in column_order if c in pivot_df_wide.columns]).reset_index()
+    if isinstance(index_col, list):
+        pivot_df_wide.insert(2, 'Label', pivot_df_wide[index_col[0]].astype(str).str.strip() + " - " + pivot_df_wide[index_col[1]].astype(str).str.strip())
+    return pivot_df_wide
+
+# A derived export, and the same findings as the original script saw them: every column of plain objects.
+# "tied" repeats 14 families in a fixed order, so every family count ties and the top 5 cut through a tie
+@pytest.fixture(scope="module", params=["random", "tied"])
+def frames(request):
+    raw_df = make_raw_frame(5000, n_families=14, n_asset_groups=9, patch_null_rate=0.2)
+    rng = np.random.default_rng(1)
+    if request.param == "tied":
+        families = raw_df["plugin_family"].drop_duplicates().tolist()[::-1]
+        raw_df["plugin_family"] = np.resize(families, len(raw_df))
+    raw_df.loc[rng.random(len(raw_df)) < 0.03, "asset_group"] = np.nan
+    raw_df["plugin_id"] = raw_df["plugin_id"].astype("float64")
+    raw_df.loc[rng.random(len(raw_df)) < 0.03, "plugin_id"] = np.nan
+    df, _ = derive_frame(raw_df, TODAY)
+    plain = df.astype({col: object for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)})
+    return df, plain
+
+# The cube of df in one pass, or merged from the cubes of 750-row chunks, last chunk first
+def cube_of(df, chunked):
+    if not chunked:
+        return aggregate_cube(df)
+    return merge_cubes([aggregate_cube(df.iloc[start:start + 750], offset=start) for start in range(0, len(df), 750)][::-1])
+
+# Values as plain objects, so tables compare whatever dtypes the two ways leave them in
+def plain_values(table):
+    return table.astype(object).reset_index(drop=True)
+
+@pytest.mark.parametrize("chunked", [False, True], ids=["cube", "merged"])
+@pytest.mark.parametrize("variable", ["plugin_family", "severity", "asset_group", "overdue"])
+def test_univariate_tables_match_value_counts(frames, variable, chunked):
+    df, plain = frames
+    table = univariate_table(df, variable, cube=cube_of(df, chunked))[0]
+    pd.testing.assert_frame_equal(plain_values(table), plain_values(reference_univariate_table(plain, variable)))
+
+@pytest.mark.parametrize("chunked", [False, True], ids=["cube", "merged"])
+@pytest.mark.parametrize("index_col", ["plugin_family", "asset_group", "overdue", ["asset_group", "plugin_family"]])
+def test_pivot_tables_match_pivot_table(frames, index_col, chunked):
+    df, plain = frames
+    table = pivot_table_wide(df, index_col, "severity", "plugin_id", cube=cube_of(df, chunked))[0]
+    reference = reference_pivot_table_wide(plain, index_col, "severity", "plugin_id")
+    pd.testing.assert_frame_equal(plain_values(table), plain_values(reference), check_names=False)